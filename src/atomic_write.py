@@ -0,0 +1,45 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+def temp_path(path: str, suffix: str = '') -> str:
+    """
+    a temp file name next to path, unique per process and thread
+
+    :param path: str, the file that will be replaced
+    :param suffix: str, kept at the end, e.g. '.npz' since np.savez appends it to names without it
+    :return: str
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp{suffix}"
+
+@contextmanager
+def atomic_write(path: str, suffix: str = ''):
+    """
+    yields a temp path to write to, moved over path once the block finishes
+
+    readers see either the old file or the new one, never a half-written one, and two
+    threads writing the same file each use their own temp file. the temp file is removed
+    if the block raises.
+
+    :param path: str, destination
+    :param suffix: str, see temp_path
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = temp_path(path, suffix)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_json(path: str, data, **dump_args):
+    """
+    :param path: str, destination
+    :param data: json-serializable object
+    :param dump_args: extra json.dump arguments, e.g. sort_keys=True
+    """
+    with atomic_write(path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, **dump_args)
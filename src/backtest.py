@@ -0,0 +1,238 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from game_log_store import read_player_log
+from player_features import log_columns
+from schema import GAME_DATA_SCHEMA, read_csv
+from over_under_model import build_training_data
+from team_features import form_features
+from train_scheduler import read_jobs
+from data_generation import GAME_DATA_PATH
+
+# fixed hyperparameters for backtest refits, a grid search per refit would dominate the run
+BACKTEST_PARAMS = {'n_estimators': 100, 'max_depth': 3, 'learning_rate': 0.1}
+
+def calibration_report(y_true, p, n_bins: int = 10) -> dict:
+    """
+    accuracy, brier score, log loss and a reliability table for predicted probabilities
+
+    :param y_true: array of 0/1 outcomes
+    :param p: array of predicted probabilities of a 1
+    :param n_bins: int, equal-width probability bins
+    :return: dict with n, accuracy, brier, log_loss and bins (list of dicts)
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    p = np.asarray(p, dtype=float)
+    clipped = np.clip(p, 1e-6, 1 - 1e-6)
+
+    bins = []
+    bin_index = np.minimum((p * n_bins).astype(int), n_bins - 1)
+    for b in range(n_bins):
+        in_bin = bin_index == b
+        if in_bin.any():
+            bins.append({
+                'range': f"{b / n_bins:.1f}-{(b + 1) / n_bins:.1f}",
+                'n': int(in_bin.sum()),
+                'predicted': float(p[in_bin].mean()),
+                'observed': float(y_true[in_bin].mean()),
+            })
+
+    return {
+        'n': len(y_true),
+        'accuracy': float(((p > 0.5) == y_true).mean()) if len(y_true) else float('nan'),
+        'brier': float(((p - y_true) ** 2).mean()) if len(y_true) else float('nan'),
+        'log_loss': float(-(y_true * np.log(clipped) + (1 - y_true) * np.log(1 - clipped)).mean()) if len(y_true) else float('nan'),
+        'bins': bins,
+    }
+
+def walk_forward(dates: np.ndarray, X: np.ndarray, y: np.ndarray, fit, evaluate: np.ndarray = None,
+                 refit_days: int = 7, min_train: int = 30) -> np.ndarray:
+    """
+    replays games in date order, refitting on everything already played every `refit_days`
+
+    the model fitted at the start of a window scores every game in that window in one call;
+    features are computed from earlier games only, so nothing a game's prediction uses is
+    from the future
+
+    :param dates: array of datetime64, date of the game each row predicts, ascending
+    :param X: array (n_rows x n_features), features known before each game
+    :param y: array of 0/1 outcomes
+    :param fit: callable(X, y) -> fitted classifier with predict_proba
+    :param evaluate: optional bool array, rows to score, defaults to all
+    :param refit_days: int, days between refits
+    :param min_train: int, games required before the first fit
+    :return: array of probabilities, NaN for rows not scored
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    evaluate = np.ones(len(dates), bool) if evaluate is None else np.asarray(evaluate)
+    p = np.full(len(dates), np.nan)
+
+    days = np.unique(dates[evaluate])
+    model = None
+    i = 0
+    while i < len(days):
+        day = days[i]
+        window_end = day + np.timedelta64(refit_days, 'D')
+
+        # only games finished before the window opens are known at refit time
+        train = dates < day
+        if train.sum() >= min_train and len(np.unique(y[train])) == 2:
+            model = fit(X[train], y[train])
+
+        window = evaluate & (dates >= day) & (dates < window_end)
+        if model is not None:
+            p[window] = model.predict_proba(X[window])[:, 1]
+        i = np.searchsorted(days, window_end)
+    return p
+
+def _fit_xgboost(params: dict):
+    def fit(X, y):
+        from xgboost import XGBClassifier
+        model = XGBClassifier(eval_metric='logloss', random_state=42, n_jobs=1,
+                              scale_pos_weight=(y == 0).sum() / (y == 1).sum(), **params)
+        return model.fit(X, y)
+    return fit
+
+def backtest_player(player_name: str, stat_expr: str, line: float, games: int = 10, seasons=None,
+                    refit_days: int = 7, min_train: int = 30, params: dict = None) -> pd.DataFrame:
+    """
+    walk-forward over/under predictions for one player, stat expression and line
+
+    rolling features are computed once for the whole log with the shared feature engine,
+    each row from games up to that point only, so refits just take a longer prefix
+
+    :param player_name: str, full player name like 'LeBron James'
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param line: float, over/under line
+    :param games: int, rolling window
+    :param seasons: optional list of seasons to score, earlier games still train
+    :param refit_days: int, days between refits
+    :param min_train: int, games required before the first fit
+    :param params: optional dict, XGBClassifier hyperparameters, defaults to BACKTEST_PARAMS
+    :return: DataFrame with one row per scored game
+    """
+    player_data = read_player_log(player_name, log_columns(stat_expr))
+    X, y = build_training_data(player_data, stat_expr, line, games)
+
+    # row t predicts game t+1
+    next_game = player_data.shift(-1).loc[X.index]
+    dates = next_game['GAME_DATE'].to_numpy()
+    evaluate = next_game['SEASON'].isin(seasons).to_numpy() if seasons else None
+
+    p = walk_forward(dates, X.to_numpy(np.float32), y.to_numpy(), _fit_xgboost(params or BACKTEST_PARAMS),
+                     evaluate, refit_days, min_train)
+    scored = ~np.isnan(p)
+    return pd.DataFrame({
+        'player_name': player_name,
+        'stat_expr': stat_expr,
+        'line': line,
+        'GAME_DATE': dates[scored],
+        'actual': next_game.eval(stat_expr).to_numpy()[scored],
+        'p_over': p[scored],
+        'over': y.to_numpy()[scored],
+    })
+
+def _run_player(job: dict) -> pd.DataFrame:
+    try:
+        return backtest_player(job['player_name'], job['stat_expr'], job['line'], job.get('games', 10),
+                               job.get('seasons'), job.get('refit_days', 7), job.get('min_train', 30))
+    except (FileNotFoundError, ValueError) as e:
+        print(f"skipping {job['player_name']} {job['stat_expr']}: {e}")
+        return pd.DataFrame()
+
+def backtest_props(jobs: list, seasons=None, refit_days: int = 7, workers: int = None) -> tuple:
+    """
+    walk-forward backtests of many over/under props across a process pool
+
+    :param jobs: list of dicts with player_name, stat_expr, line and optional games
+    :param seasons: optional list of seasons to score
+    :param refit_days: int, days between refits
+    :param workers: int, worker processes, defaults to all cores
+    :return: tuple of (predictions DataFrame, report dict with calibration and games/sec)
+    """
+    jobs = [dict(job, seasons=seasons, refit_days=refit_days) for job in jobs]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = list(pool.map(_run_player, jobs))
+    elapsed = time.perf_counter() - start
+
+    results = [r for r in results if not r.empty]
+    predictions = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=['over', 'p_over'])
+    report = calibration_report(predictions['over'], predictions['p_over'])
+    report['seconds'] = elapsed
+    report['games_per_sec'] = report['n'] / elapsed if elapsed else float('nan')
+    return predictions, report
+
+def backtest_winner(game_data_path: str = GAME_DATA_PATH, refit_days: int = 7, min_train: int = 100) -> tuple:
+    """
+    walk-forward home-win predictions from each team's form going into the game
+
+    :param game_data_path: str, csv from fetch_game_data, must include GAME_DATE
+    :param refit_days: int, days between refits
+    :param min_train: int, games required before the first fit
+    :return: tuple of (predictions DataFrame, report dict with calibration and games/sec)
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    game_data = read_csv(game_data_path, GAME_DATA_SCHEMA)
+    if 'GAME_DATE' not in game_data:
+        raise ValueError(f"{game_data_path} has no GAME_DATE column, refetch it with fetch_game_data")
+    game_data = game_data.sort_values('GAME_DATE', kind='stable').reset_index(drop=True)
+
+    start = time.perf_counter()
+    # the same point-in-time features train_model.py trains on
+    X, known = form_features(game_data)
+    game_data, X = game_data[known].reset_index(drop=True), X[known].to_numpy()
+    y = game_data['HOME_WIN'].to_numpy()
+
+    def fit(X_train, y_train):
+        # same model train_model.py uses, on point-in-time features
+        return RandomForestClassifier(random_state=42, n_jobs=-1).fit(X_train, y_train)
+
+    p = walk_forward(game_data['GAME_DATE'].to_numpy(), X, y, fit, refit_days=refit_days, min_train=min_train)
+    elapsed = time.perf_counter() - start
+
+    scored = ~np.isnan(p)
+    predictions = game_data.loc[scored, ['GAME_ID', 'GAME_DATE', 'TEAM_ID_HOME', 'TEAM_ID_AWAY', 'HOME_WIN']].assign(p_home_win=p[scored])
+    report = calibration_report(predictions['HOME_WIN'], predictions['p_home_win'])
+    report['seconds'] = elapsed
+    report['games_per_sec'] = report['n'] / elapsed if elapsed else float('nan')
+    return predictions, report
+
+def print_report(name: str, report: dict):
+    print(f"\n{name}: {report['n']} games in {report['seconds']:.1f}s ({report['games_per_sec']:.0f} games/sec)")
+    print(f"accuracy {report['accuracy']:.3f}  brier {report['brier']:.4f}  log loss {report['log_loss']:.4f}")
+    print("calibration (predicted -> observed):")
+    for b in report['bins']:
+        print(f"  {b['range']}: {b['predicted']:.2f} -> {b['observed']:.2f}  (n={b['n']})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="walk-forward backtests of the winner and over/under models")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    winner_parser = subparsers.add_parser('winner', help="replay game_data.csv day by day")
+    winner_parser.add_argument('--refit-days', type=int, default=7)
+
+    props_parser = subparsers.add_parser('props', help="replay player props day by day")
+    props_parser.add_argument('jobs', help="csv or jsonl with player_name, stat_expr, line and optional games")
+    props_parser.add_argument('--seasons', nargs='+', default=None, help="seasons to score, earlier games still train")
+    props_parser.add_argument('--refit-days', type=int, default=7)
+    props_parser.add_argument('--workers', type=int, default=None)
+    props_parser.add_argument('--out', help="write every prediction to this csv")
+    args = parser.parse_args()
+
+    if args.command == 'winner':
+        predictions, report = backtest_winner(refit_days=args.refit_days)
+        print_report('winner', report)
+    else:
+        jobs = [job for job in read_jobs(args.jobs) if job['line'] is not None]
+        predictions, report = backtest_props(jobs, args.seasons, args.refit_days, args.workers)
+        print_report(f"{len(jobs)} props", report)
+
+    if getattr(args, 'out', None):
+        predictions.to_csv(args.out, index=False)
@@ -0,0 +1,307 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+STATS = ['PTS', 'REB', 'AST', 'STL', 'BLK', 'TOV']
+
+# realistic is one league season, scaled stresses the same code paths about 10x
+SIZES = {
+    'realistic': {'teams': 30, 'games': 1230, 'player_games': 164, 'bracket_teams': 8, 'draws': 100_000},
+    'scaled': {'teams': 300, 'games': 12_300, 'player_games': 820, 'bracket_teams': 64, 'draws': 1_000_000},
+}
+
+CASES = ['predict_winner', 'simulate_bracket', 'generate_player_model', 'predict_over_under']
+
+def synthetic_team_stats(n_teams: int = 30, seed: int = 0) -> pd.DataFrame:
+    """
+    team stats shaped like fetch_team_data's team_data.csv, per-game averages
+
+    :param n_teams: int, number of teams
+    :param seed: int, random seed
+    :return: DataFrame with TEAM_ID, TEAM_NAME, GP, W, L and the model's stats
+    """
+    rng = np.random.default_rng(seed)
+    wins = rng.integers(10, 72, n_teams)
+    return pd.DataFrame({
+        'TEAM_ID': 1610612700 + np.arange(n_teams),
+        'TEAM_NAME': [f"Team {i}" for i in range(n_teams)],
+        'GP': 82,
+        'W': wins,
+        'L': 82 - wins,
+        'PTS': rng.normal(113, 5, n_teams).round(1),
+        'REB': rng.normal(44, 2.5, n_teams).round(1),
+        'AST': rng.normal(26, 2.5, n_teams).round(1),
+        'STL': rng.normal(8, 1, n_teams).round(1),
+        'BLK': rng.normal(5, 1, n_teams).round(1),
+        'TOV': rng.normal(14, 1.5, n_teams).round(1),
+    })
+
+def synthetic_game_data(team_stats: pd.DataFrame, n_games: int = 1230, seed: int = 0,
+                        start: str = '2024-10-22') -> pd.DataFrame:
+    """
+    games shaped like fetch_game_data's game_data.csv, box scores drawn around each team's averages
+
+    :param team_stats: DataFrame from synthetic_team_stats
+    :param n_games: int, number of games
+    :param seed: int, random seed
+    :param start: str, date of the first game, about eight games are played a day
+    :return: DataFrame with GAME_ID, GAME_DATE, home and away stats and HOME_WIN
+    """
+    rng = np.random.default_rng(seed)
+    n_teams = len(team_stats)
+    home = rng.integers(0, n_teams, n_games)
+    away = (home + rng.integers(1, n_teams, n_games)) % n_teams
+
+    data = pd.DataFrame({
+        'GAME_ID': [f"00224{g:05d}" for g in range(n_games)],
+        'GAME_DATE': (pd.Timestamp(start) + pd.to_timedelta(np.arange(n_games) // 8, unit='D')).strftime('%Y-%m-%d'),
+        'TEAM_ID_HOME': team_stats['TEAM_ID'].to_numpy()[home],
+    })
+    for stat in STATS:
+        data[f'{stat}_HOME'] = rng.normal(team_stats[stat].to_numpy()[home], 4).round().astype(int)
+    data['TEAM_ID_AWAY'] = team_stats['TEAM_ID'].to_numpy()[away]
+    for stat in STATS:
+        data[f'{stat}_AWAY'] = rng.normal(team_stats[stat].to_numpy()[away], 4).round().astype(int)
+    data['HOME_WIN'] = (data['PTS_HOME'] + 2 > data['PTS_AWAY']).astype(int)
+    return data
+
+def synthetic_game_log(n_games: int = 164, seed: int = 0, player_id: int = 1, start: str = '2023-10-24') -> pd.DataFrame:
+    """
+    a player's game log shaped like playergamelog's, newest game first, with a SEASON column
+
+    :param n_games: int, number of games, 82 per season
+    :param seed: int, random seed
+    :param player_id: int, value of the Player_ID column
+    :param start: str, date of the first game, one game every two or three days
+    :return: DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    minutes = rng.normal(32, 4, n_games).clip(10, 44)
+    fga = rng.poisson(minutes * 0.55)
+    fgm = rng.binomial(fga, 0.48)
+    fg3a = rng.poisson(minutes * 0.15)
+    fg3m = np.minimum(rng.binomial(fg3a, 0.36), fgm)
+    fta = rng.poisson(5, n_games)
+    ftm = rng.binomial(fta, 0.8)
+    oreb = rng.poisson(1.5, n_games)
+    dreb = rng.poisson(5.5, n_games)
+    dates = pd.Timestamp(start) + pd.to_timedelta(np.cumsum(rng.integers(2, 4, n_games)), unit='D')
+    season_start = pd.Timestamp(start).year + np.arange(n_games) // 82
+
+    log = pd.DataFrame({
+        'SEASON_ID': [f"2{y}" for y in season_start],
+        'Player_ID': player_id,
+        'Game_ID': [f"002{y % 100:02d}{g:05d}" for y, g in zip(season_start, range(n_games))],
+        'GAME_DATE': dates.strftime('%b %d, %Y'),
+        'MATCHUP': np.where(np.arange(n_games) % 2, 'LAL vs. BOS', 'LAL @ NYK'),
+        'WL': rng.choice(['W', 'L'], n_games),
+        'MIN': minutes.round().astype(int),
+        'FGM': fgm, 'FGA': fga, 'FG_PCT': (fgm / np.maximum(fga, 1)).round(3),
+        'FG3M': fg3m, 'FG3A': fg3a, 'FG3_PCT': (fg3m / np.maximum(fg3a, 1)).round(3),
+        'FTM': ftm, 'FTA': fta, 'FT_PCT': (ftm / np.maximum(fta, 1)).round(3),
+        'OREB': oreb, 'DREB': dreb, 'REB': oreb + dreb,
+        'AST': rng.poisson(6, n_games), 'STL': rng.poisson(1, n_games), 'BLK': rng.poisson(0.7, n_games),
+        'TOV': rng.poisson(3, n_games), 'PF': rng.poisson(2, n_games),
+    })
+    log['PTS'] = 2 * (fgm - fg3m) + 3 * fg3m + ftm
+    log['PLUS_MINUS'] = rng.integers(-20, 21, n_games)
+    log['VIDEO_AVAILABLE'] = 1
+    log['SEASON'] = [f"{y}-{(y + 1) % 100:02d}" for y in season_start]
+    return log.iloc[::-1].reset_index(drop=True)
+
+def sandbox(root: str) -> str:
+    """
+    points the pipeline's relative ../data and ../models paths at a scratch directory
+
+    must run before the pipeline modules are imported, the registry resolves its
+    directory at import
+
+    :param root: str, scratch directory
+    :return: str, the working directory the pipeline runs from
+    """
+    for name in ('data', 'models', 'run'):
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+    os.environ['NBA_MODELS_DIR'] = os.path.join(root, 'models')
+    os.chdir(os.path.join(root, 'run'))
+    return os.getcwd()
+
+@contextlib.contextmanager
+def _quiet():
+    # training prints classification reports, keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def _time(func, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with _quiet():
+            func()
+        times.append(time.perf_counter() - start)
+    return {'repeats': repeats, 'median_s': statistics.median(times), 'min_s': min(times)}
+
+def _winner_model(game_data: pd.DataFrame, team_stats: pd.DataFrame):
+    """
+    the same random forest train_model.py fits, on synthetic data
+
+    :return: fitted RandomForestClassifier
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    stats = team_stats.set_index('TEAM_ID')[STATS]
+    diffs = stats.loc[game_data['TEAM_ID_HOME']].to_numpy() - stats.loc[game_data['TEAM_ID_AWAY']].to_numpy()
+    X = pd.DataFrame(diffs, columns=[f'{stat}_diff' for stat in STATS])
+    return RandomForestClassifier(random_state=42).fit(X, game_data['HOME_WIN'])
+
+def run_benchmarks(size: str = 'realistic', cases=None, repeats: int = 3, seed: int = 0) -> dict:
+    """
+    times each pipeline entry point on synthetic data and records its stage breakdown
+
+    call sandbox() first, everything is written under ../data and ../models
+
+    :param size: str, key of SIZES
+    :param cases: optional list of names from CASES, defaults to all
+    :param repeats: int, timed runs per case, training runs once
+    :param seed: int, random seed for the synthetic data
+    :return: dict of case name -> timings, stage profile and the sizes used
+    """
+    from compiled_model import CompiledModel, export_model
+    from game_log_store import write_player_log
+    from over_under_model import generate_player_model
+    from predict_over_under import predict_over_under
+    from predict_winner import predict_winner, predict_matchups, MODEL_PATH
+    import joblib
+    from simulate_bracket import monte_carlo_bracket, exact_bracket
+
+    config = SIZES[size]
+    cases = cases or CASES
+    instrumentation.enable()
+
+    team_stats = synthetic_team_stats(config['teams'], seed)
+    game_data = synthetic_game_data(team_stats, config['games'], seed)
+    team_stats.to_csv('../data/team_data.csv', index=False)
+    game_data.to_csv('../data/game_data.csv', index=False)
+    model = _winner_model(game_data, team_stats)
+    compiled = CompiledModel(export_model(model, '../models/benchmark_winner.npz'))
+    # the unregistered default model, so calls without a model read the snapshot's cached matrix
+    joblib.dump(model, MODEL_PATH)
+
+    names = team_stats['TEAM_NAME'].tolist()
+    bracket = [(names[i], names[i + 1]) for i in range(0, config['bracket_teams'], 2)]
+    pairs = [(a, b) for a in names for b in names if a != b]
+
+    player_name = 'Benchmark Player'
+    write_player_log(1, player_name, synthetic_game_log(config['player_games'], seed))
+    line = 19.5
+
+    benchmarks = {}
+    def bench(name, func, n=repeats, **extra):
+        instrumentation.reset()
+        result = _time(func, n)
+        result.update(extra, profile=instrumentation.snapshot())
+        benchmarks[name] = result
+        print(f"{name:<34}{result['median_s'] * 1e3:>12.2f} ms  (min {result['min_s'] * 1e3:.2f} ms, n={n})")
+
+    print(f"\n{size}: {config}")
+    if 'predict_winner' in cases:
+        bench('predict_winner_single', lambda: [predict_winner(*pair, team_stats, model) for pair in pairs[:100]],
+              calls=100)
+        bench('predict_winner_single_compiled', lambda: [predict_winner(*pair, team_stats, compiled) for pair in pairs[:100]],
+              calls=100)
+        bench('predict_winner_single_cached', lambda: [predict_winner(*pair) for pair in pairs[:100]], calls=100)
+        bench('predict_matchups_all_pairs', lambda: predict_matchups(pairs, team_stats, model), pairs=len(pairs))
+        bench('predict_matchups_all_pairs_compiled', lambda: predict_matchups(pairs, team_stats, compiled),
+              pairs=len(pairs))
+    if 'simulate_bracket' in cases:
+        bench('monte_carlo_bracket', lambda: monte_carlo_bracket(bracket, team_stats, model, n_draws=config['draws'], seed=seed),
+              draws=config['draws'], bracket_teams=config['bracket_teams'])
+        bench('exact_bracket', lambda: exact_bracket(bracket, team_stats, model), bracket_teams=config['bracket_teams'])
+    if 'generate_player_model' in cases:
+        bench('generate_player_model', lambda: generate_player_model(player_name, line, 'PTS', force_retrain=True), n=1,
+              player_games=config['player_games'])
+    if 'predict_over_under' in cases:
+        with _quiet():
+            generate_player_model(player_name, line, 'PTS')
+        bench('predict_over_under', lambda: predict_over_under(player_name, 'PTS', line), n=max(repeats, 10),
+              player_games=config['player_games'])
+
+    return {'size': size, 'config': config, 'python': sys.version.split()[0], 'benchmarks': benchmarks}
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """
+    cases whose median time grew by more than `tolerance` over a baseline run
+
+    :param results: dict from run_benchmarks
+    :param baseline: dict from an earlier run_benchmarks, e.g. loaded from --out
+    :param tolerance: float, allowed relative slowdown
+    :return: list of (case, baseline seconds, current seconds)
+    """
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if previous and current['median_s'] > previous['median_s'] * (1 + tolerance):
+            regressions.append((name, previous['median_s'], current['median_s']))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="offline benchmarks of the prediction pipeline on synthetic data")
+    parser.add_argument('--size', choices=list(SIZES), nargs='+', default=['realistic'])
+    parser.add_argument('--cases', choices=CASES, nargs='+', default=None)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--workdir', help="scratch directory, defaults to a temporary one")
+    parser.add_argument('--out', help="write results as json, e.g. to use as a later --baseline")
+    parser.add_argument('--baseline', help="json from an earlier --out, exit 1 if a case got slower")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument('--profile', action='store_true', help="print the stage breakdown of every case")
+    args = parser.parse_args()
+
+    # resolve output paths before moving into the sandbox
+    out = os.path.abspath(args.out) if args.out else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    start_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        sandbox(args.workdir or scratch)
+        try:
+            runs = {size: run_benchmarks(size, args.cases, args.repeats) for size in args.size}
+        finally:
+            os.chdir(start_dir)
+
+    if args.profile:
+        for size, results in runs.items():
+            for name, result in results['benchmarks'].items():
+                print(f"\n[{size}] {name}")
+                for stage_name, s in result['profile']['stages'].items():
+                    print(f"  {stage_name:<22}{s['calls']:>7}{s['total_s']:>10.3f}s{s['mean_ms']:>10.2f} ms")
+                for counter, value in result['profile']['counters'].items():
+                    print(f"  {counter:<22}{value:>7}")
+
+    if out:
+        with open(out, 'w') as f:
+            json.dump(runs, f, indent=2)
+        print(f"\nresults written to {out}")
+
+    if baseline:
+        regressions = []
+        for size, results in runs.items():
+            if size in baseline:
+                regressions += [(f"[{size}] {name}", *times) for name, *times in compare(results, baseline[size], args.tolerance)]
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1e3:.2f} ms -> {after * 1e3:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"\nno case slower than the baseline by more than {args.tolerance:.0%}")
@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from nba_api.stats.static import players
+from atomic_write import write_json
+from data_generation import fetch_player_season, refresh_player, current_season, resolve_player
+
+CHECKPOINT_PATH = '../data/game_logs/ingest_checkpoint.json'
+
+class TokenBucket:
+    """
+    thread-safe token bucket limiting how fast workers hit the stats api.
+
+    tokens refill at `rate` per second up to `capacity`, each request takes one.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def with_retries(fn, retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0):
+    """
+    wraps fn so failed calls are retried with exponential backoff and jitter
+
+    :param fn: callable to wrap
+    :param retries: int, retries after the first attempt
+    :param base_delay: float, seconds before the first retry
+    :param max_delay: float, longest wait between attempts
+    :return: wrapped callable
+    """
+    def wrapped(*args, **kwargs):
+        for attempt in range(retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    return wrapped
+
+def run_id(seasons, incremental: bool, day=None) -> str:
+    """
+    identity of an ingest run, a checkpoint only resumes the run it was written by
+
+    :param seasons: list of seasons in "YYYY-YY" format
+    :param incremental: bool, whether the run fetches only new games
+    :param day: date of the run, defaults to today
+    :return: str, like '2024-11-02|2024-25|incremental'
+    """
+    day = day or date.today()
+    return f"{day.isoformat()}|{','.join(sorted(seasons))}|{'incremental' if incremental else 'full'}"
+
+class Checkpoint:
+    """
+    records which players finished so an interrupted run can resume where it stopped.
+
+    a checkpoint left by a different run, another day's or other seasons', is dropped, so
+    players done then are refreshed again instead of skipped for good.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, run: str = None):
+        self.path = path
+        self.run = run
+        self._lock = threading.Lock()
+        self.state = {'run': run, 'completed': {}, 'failed': {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                stored = json.load(f)
+            if run is None or stored.get('run') == run:
+                self.state = stored
+            else:
+                print(f"ignoring checkpoint of run {stored.get('run')}, this is {run}")
+
+    def is_done(self, player_id) -> bool:
+        return str(player_id) in self.state['completed']
+
+    def mark(self, player_id, error=None):
+        with self._lock:
+            key = str(player_id)
+            if error is None:
+                self.state['completed'][key] = time.strftime('%Y-%m-%dT%H:%M:%S')
+                self.state['failed'].pop(key, None)
+            else:
+                self.state['failed'][key] = str(error)
+            self._save()
+
+    def _save(self):
+        write_json(self.path, self.state)
+
+    def clear(self):
+        with self._lock:
+            self.state = {'run': self.run, 'completed': {}, 'failed': {}}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+def resolve_roster(names=None) -> list:
+    """
+    turns player names into api player records, or returns every active player
+
+    :param names: optional list of player names, None for all active players
+    :return: list of dicts with 'id' and 'full_name'
+    """
+    if names is None:
+        return players.get_active_players()
+
+    roster = []
+    for name in names:
+        try:
+            roster.append(resolve_player(name))
+        except ValueError as e:
+            print(f"{e}, skipping")
+    return roster
+
+def ingest_players(roster, seasons=None, incremental=True, workers: int = 8, rate: float = 2.0,
+                   retries: int = 4, checkpoint_path: str = CHECKPOINT_PATH, fetch=fetch_player_season,
+                   day=None) -> dict:
+    """
+    fetches game logs for many players concurrently into the game log store
+
+    every api call goes through a shared token bucket and is retried with backoff.
+    finished players are checkpointed, so rerunning after a crash only fetches the rest.
+    the checkpoint belongs to one run (day, seasons and mode) and is cleared once that run
+    finishes without failures, a later run starts over even if players failed.
+
+    :param roster: list of dicts with 'id' and 'full_name', see resolve_roster
+    :param seasons: list of seasons in "YYYY-YY" format, defaults to the current season
+    :param incremental: bool, fetch only games newer than what is stored
+    :param workers: int, concurrent fetch threads
+    :param rate: float, most api requests per second across all workers
+    :param retries: int, retries per api call
+    :param checkpoint_path: str, where progress is recorded
+    :param fetch: callable(player_id, season, date_from) -> DataFrame, the api call
+    :param day: date of the run, defaults to today
+    :return: dict with completed, skipped and failed counts
+    """
+    seasons = seasons or [current_season()]
+    bucket = TokenBucket(rate, capacity=max(1, int(rate)))
+
+    def limited_fetch(player_id, season, date_from):
+        # every attempt takes a token, retries included, so backing off never outpaces the limit
+        bucket.acquire()
+        return fetch(player_id, season, date_from)
+
+    retrying_fetch = with_retries(limited_fetch, retries=retries)
+
+    checkpoint = Checkpoint(checkpoint_path, run_id(seasons, incremental, day))
+    pending = [p for p in roster if not checkpoint.is_done(p['id'])]
+    skipped = len(roster) - len(pending)
+    if skipped:
+        print(f"resuming: {skipped} players already done")
+
+    def ingest_one(player):
+        refresh_player(player['id'], player['full_name'], seasons,
+                       incremental=incremental, fetch=retrying_fetch, strict=True)
+
+    completed = 0
+    failed = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ingest_one, player): player for player in pending}
+        for future in as_completed(futures):
+            player = futures[future]
+            try:
+                future.result()
+                checkpoint.mark(player['id'])
+                completed += 1
+            except Exception as e:
+                checkpoint.mark(player['id'], error=e)
+                failed += 1
+                print(f"failed to ingest {player['full_name']}: {e}")
+
+    elapsed = time.perf_counter() - start
+    print(f"ingested {completed} players in {elapsed:.1f}s ({failed} failed, {skipped} skipped)")
+
+    if failed == 0:
+        checkpoint.clear()
+    return {'completed': completed, 'skipped': skipped, 'failed': failed, 'seconds': elapsed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bulk fetch player game logs into the game log store")
+    parser.add_argument('players', nargs='*', help="player names, defaults to every active player")
+    parser.add_argument('--roster-file', help="file with one player name per line")
+    parser.add_argument('--seasons', nargs='+', default=None, help="seasons like 2024-25, defaults to the current one")
+    parser.add_argument('--full', action='store_true', help="refetch every season instead of only new games")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=2.0, help="max api requests per second")
+    parser.add_argument('--retries', type=int, default=4)
+    parser.add_argument('--fresh', action='store_true', help="ignore the checkpoint from an interrupted run")
+    args = parser.parse_args()
+
+    names = list(args.players)
+    if args.roster_file:
+        with open(args.roster_file) as f:
+            names += [line.strip() for line in f if line.strip()]
+
+    if args.fresh:
+        Checkpoint().clear()
+
+    ingest_players(resolve_roster(names or None), seasons=args.seasons, incremental=not args.full,
+                   workers=args.workers, rate=args.rate, retries=args.retries)
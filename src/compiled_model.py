@@ -0,0 +1,321 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from atomic_write import atomic_write
+from instrumentation import timed
+
+# tree ensembles flattened into node arrays, scored with numpy alone.
+#
+# every tree's nodes are concatenated into one set of arrays; children are absolute
+# node indices and leaves point back at themselves, so walking all trees for a batch
+# is a fixed number of vectorized gathers (the deepest tree's depth).
+
+def compiled_path(model_path: str) -> str:
+    return f"{os.path.splitext(model_path)[0]}.npz"
+
+def _forest_arrays(model) -> dict:
+    """
+    node arrays for a fitted sklearn RandomForestClassifier
+
+    :param model: fitted RandomForestClassifier
+    :return: dict of arrays and metadata for the npz
+    """
+    features, thresholds, lefts, rights, missing_left, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        leaf = tree.children_left < 0
+        node_ids = np.arange(tree.node_count) + offset
+
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        lefts.append(np.where(leaf, node_ids, tree.children_left + offset))
+        rights.append(np.where(leaf, node_ids, tree.children_right + offset))
+        missing = getattr(tree, 'missing_go_to_left', None)
+        missing_left.append(np.ones(tree.node_count, bool) if missing is None else missing.astype(bool))
+
+        # per-tree class proportions, averaged across trees like predict_proba does
+        counts = tree.value[:, 0, :]
+        values.append(counts / counts.sum(axis=1, keepdims=True))
+
+        roots.append(offset)
+        offset += tree.node_count
+        depth = max(depth, tree.max_depth)
+
+    return {
+        'kind': 'forest',
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'missing_left': np.concatenate(missing_left),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'depth': depth,
+        'base_margin': 0.0,
+        'classes': np.asarray(model.classes_),
+        'feature_names': np.asarray(getattr(model, 'feature_names_in_', [f"f{i}" for i in range(model.n_features_in_)]), dtype=str),
+    }
+
+def _booster_arrays(model) -> dict:
+    """
+    node arrays for a fitted binary XGBClassifier
+
+    :param model: fitted XGBClassifier with a binary:logistic objective
+    :return: dict of arrays and metadata for the npz
+    """
+    booster = model.get_booster()
+    config = json.loads(booster.save_config())
+    objective = config['learner']['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Only binary:logistic boosters can be compiled, got {objective}")
+
+    # base_score is stored as a probability, the trees add to its log-odds
+    base_score = float(config['learner']['learner_model_param']['base_score'].strip('[]'))
+    base_margin = np.log(base_score / (1 - base_score))
+
+    feature_names = booster.feature_names or [f"f{i}" for i in range(booster.num_features())]
+    feature_index = {name: i for i, name in enumerate(feature_names)}
+
+    dumps = booster.get_dump(dump_format='json')
+    try:
+        # only the trees predict_proba uses when training stopped early
+        dumps = dumps[:(model.best_iteration + 1) * max(1, int(model.get_params().get('num_parallel_tree') or 1))]
+    except AttributeError:
+        pass
+
+    features, thresholds, lefts, rights, missing_left, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    depth = 0
+    for dump in dumps:
+        nodes = {}
+        stack = [(json.loads(dump), 0)]
+        while stack:
+            node, node_depth = stack.pop()
+            nodes[node['nodeid']] = node
+            depth = max(depth, node_depth)
+            stack.extend((child, node_depth + 1) for child in node.get('children', []))
+
+        n_nodes = max(nodes) + 1
+        feature = np.zeros(n_nodes, np.int32)
+        threshold = np.full(n_nodes, np.inf, np.float32)
+        left = np.arange(n_nodes, dtype=np.int32) + offset
+        right = left.copy()
+        missing = np.ones(n_nodes, bool)
+        value = np.zeros(n_nodes, np.float64)
+        for node_id, node in nodes.items():
+            if 'leaf' in node:
+                value[node_id] = node['leaf']
+                continue
+            feature[node_id] = feature_index[node['split']]
+            threshold[node_id] = node['split_condition']
+            left[node_id] = node['yes'] + offset
+            right[node_id] = node['no'] + offset
+            missing[node_id] = node['missing'] == node['yes']
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left)
+        rights.append(right)
+        missing_left.append(missing)
+        values.append(value[:, None])
+        roots.append(offset)
+        offset += n_nodes
+
+    return {
+        'kind': 'boosted',
+        'feature': np.concatenate(features),
+        # xgboost splits go left when x < threshold in float32
+        'threshold': np.nextafter(np.concatenate(thresholds), np.float32(-np.inf)),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'missing_left': np.concatenate(missing_left),
+        'value': np.concatenate(values),
+        'roots': np.array(roots, dtype=np.int32),
+        'depth': depth,
+        'base_margin': base_margin,
+        'classes': np.asarray(model.classes_),
+        'feature_names': np.asarray(feature_names, dtype=str),
+    }
+
+def export_model(model, path: str) -> str:
+    """
+    writes a fitted random forest or xgboost classifier as flattened node arrays
+
+    :param model: fitted RandomForestClassifier or binary XGBClassifier
+    :param path: str, destination .npz
+    :return: str, the written path
+    """
+    if hasattr(model, 'get_booster'):
+        arrays = _booster_arrays(model)
+    elif hasattr(model, 'estimators_'):
+        arrays = _forest_arrays(model)
+    else:
+        raise TypeError(f"Can't compile a {type(model).__name__}")
+
+    # np.savez appends .npz to names without it, so the temp file keeps the suffix
+    with atomic_write(path, suffix='.npz') as tmp_path:
+        np.savez(tmp_path, **arrays)
+    return path
+
+class CompiledModel:
+    """
+    numpy-only stand-in for a tree ensemble, with predict_proba, classes_ and feature_names_in_.
+    """
+
+    def __init__(self, path: str):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        self.kind = str(arrays['kind'])
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        # left and right child of node i at 2i and 2i + 1, one gather per step
+        self.children = np.column_stack([self.left, self.right]).ravel()
+        self.missing_left = arrays['missing_left']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.depth = int(arrays['depth'])
+        self.base_margin = float(arrays['base_margin'])
+        self.classes_ = arrays['classes']
+        # object array of python strings, like sklearn's own feature_names_in_
+        self.feature_names_in_ = arrays['feature_names'].astype(object)
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """
+        :param X: float32 array (n_rows x n_features)
+        :return: leaf node index per row and tree (n_rows x n_trees)
+        """
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        values = X.ravel()
+        has_missing = np.isnan(values).any()
+
+        nodes = np.tile(self.roots, n_rows)
+        offsets = np.repeat(np.arange(n_rows) * n_features, n_trees)
+
+        # deep forests advance only the (row, tree) pairs still on a split node, so the work
+        # follows the actual path lengths; shallow boosters are cheaper to step all at once
+        compact = self.depth > 10
+        active = np.arange(len(nodes))
+        for _ in range(self.depth):
+            current = nodes[active] if compact else nodes
+            x = values[(offsets[active] if compact else offsets) + self.feature[current]]
+            go_right = ~(x <= self.threshold[current])
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.missing_left[current], go_right)
+            current = self.children[2 * current + go_right]
+            if not compact:
+                nodes = current
+                continue
+            nodes[active] = current
+            active = active[self.children[2 * current] != current]
+            if not len(active):
+                break
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        :param X: array (n_rows x n_features) in feature_names_in_ order, or a DataFrame with those columns
+        :return: array (n_rows x n_classes)
+        """
+        if hasattr(X, 'columns'):
+            X = X[list(self.feature_names_in_)].to_numpy()
+        # both libraries compare float32 inputs against their thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, len(self.feature_names_in_))
+
+        leaf_values = self.value[self._leaves(X)]
+        if self.kind == 'forest':
+            return leaf_values.mean(axis=1)
+
+        margin = self.base_margin + leaf_values[..., 0].sum(axis=1)
+        p = 1 / (1 + np.exp(-margin))
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+@timed('model_load')
+def load_model(model_path: str):
+    """
+    loads a model, preferring its compiled export when that is at least as new as the pickle
+
+    :param model_path: str, path to the pickled model
+    :return: CompiledModel or the unpickled model
+    """
+    npz_path = compiled_path(model_path)
+    if os.path.exists(npz_path) and (not os.path.exists(model_path)
+                                     or os.path.getmtime(npz_path) >= os.path.getmtime(model_path)):
+        return CompiledModel(npz_path)
+    import joblib
+    return joblib.load(model_path)
+
+def _sample_inputs(model: CompiledModel, n_rows: int, seed: int = 0) -> np.ndarray:
+    # inputs spread over each feature's split thresholds, so every branch gets exercised
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, len(model.feature_names_in_)), dtype=np.float32)
+    internal = model.left != np.arange(len(model.left))
+    for j in range(X.shape[1]):
+        splits = model.threshold[internal & (model.feature == j)]
+        low, high = (splits.min(), splits.max()) if len(splits) else (0.0, 1.0)
+        pad = (high - low) * 0.1 + 1e-3
+        X[:, j] = rng.uniform(low - pad, high + pad, n_rows)
+    return X
+
+def check_model(model_path: str, n_rows: int = 2000, repeats: int = 200):
+    """
+    exports a pickled model, then compares its probabilities and latency with the compiled one
+
+    :param model_path: str, path to a pickled RandomForestClassifier or XGBClassifier
+    :param n_rows: int, rows in the parity and batch latency checks
+    :param repeats: int, single-row predictions timed per implementation
+    """
+    import joblib
+    import pandas as pd
+
+    original = joblib.load(model_path)
+    compiled = CompiledModel(export_model(original, compiled_path(model_path)))
+    columns = list(compiled.feature_names_in_)
+
+    X = _sample_inputs(compiled, n_rows)
+    if compiled.kind == 'boosted':
+        # xgboost routes missing values down a learned default branch, check those too
+        X[np.random.default_rng(1).random(X.shape) < 0.05] = np.nan
+    expected = original.predict_proba(pd.DataFrame(X, columns=columns))
+    actual = compiled.predict_proba(X)
+    print(f"{model_path}: max |p - p_compiled| = {np.abs(expected - actual).max():.2e} over {n_rows} rows")
+
+    row = dict(zip(columns, X[0]))
+    start = time.perf_counter()
+    for _ in range(repeats):
+        original.predict_proba(pd.DataFrame([row])[columns])
+    original_single = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        compiled.predict_proba(np.array([[row[c] for c in columns]]))
+    compiled_single = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    original.predict_proba(pd.DataFrame(X, columns=columns))
+    original_batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled.predict_proba(X)
+    compiled_batch = time.perf_counter() - start
+
+    print(f"  single row: {original_single * 1e3:.3f} ms -> {compiled_single * 1e3:.3f} ms")
+    print(f"  {n_rows} rows:  {original_batch * 1e3:.3f} ms -> {compiled_batch * 1e3:.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compile pickled tree models and check parity and latency")
+    parser.add_argument('models', nargs='+', help="pickled models, e.g. ../models/nba_prediction_model.pkl")
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+
+    for path in args.models:
+        check_model(path, n_rows=args.rows)
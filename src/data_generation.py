@@ -1,17 +1,50 @@
 import os
+from datetime import date
 import pandas as pd
 from nba_api.stats.endpoints import leaguegamelog, leaguedashteamstats, playergamelog
 from nba_api.stats.static import players
+from instrumentation import timed
+from schema import GAME_DATA_SCHEMA, TEAM_DATA_SCHEMA, apply_schema, read_csv
+from game_log_store import has_player, write_player_log, append_player_log, player_log_path, player_entry
 
-def fetch_game_data(season):
+GAME_DATA_PATH = "../data/game_data.csv"
+
+def current_season(today=None) -> str:
+    """
+    the NBA season in progress (or most recently finished) on a given day
+
+    :param today: date, defaults to today
+    :return: str, season in "YYYY-YY" format
+    """
+    today = today or date.today()
+    # seasons tip off in october
+    start_year = today.year if today.month >= 10 else today.year - 1
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+def _api_date(game_date: str) -> str:
+    # nba_api date filters take MM/DD/YYYY
+    return pd.Timestamp(game_date).strftime('%m/%d/%Y')
+
+def fetch_game_data(season, incremental=False):
     """
     Fetches NBA game data for a given season, processes it to merge home and away stats,
     and saves it as a CSV file.
 
     :param season: str, the NBA season in "YYYY-YY" format (e.g., "2024-25").
+    :param incremental: bool, only fetch games on or after the last stored GAME_DATE and append them.
     """
+    existing = None
+    date_from = ''
+    if incremental and os.path.exists(GAME_DATA_PATH):
+        existing = read_csv(GAME_DATA_PATH, GAME_DATA_SCHEMA)
+        if 'GAME_DATE' in existing and not existing.empty:
+            date_from = _api_date(existing['GAME_DATE'].max())
+        else:
+            # written before GAME_DATE was stored, nothing to resume from
+            existing = None
+
     # fetch game data
-    gamelog = leaguegamelog.LeagueGameLog(season=season)
+    gamelog = leaguegamelog.LeagueGameLog(season=season, date_from_nullable=date_from)
     data = gamelog.get_data_frames()[0]
 
     # split data into home and away teams
@@ -24,18 +57,27 @@ def fetch_game_data(season):
     # select relevant columns for analysis
     # keep stats for home and away teams, and any additional metadata
     combined = combined[[
-        'GAME_ID',
+        'GAME_ID', 'GAME_DATE_HOME',
         'TEAM_ID_HOME', 'PTS_HOME', 'REB_HOME', 'AST_HOME', 'STL_HOME', 'BLK_HOME',     'TOV_HOME',
         'TEAM_ID_AWAY', 'PTS_AWAY', 'REB_AWAY', 'AST_AWAY', 'STL_AWAY', 'BLK_AWAY',     'TOV_AWAY',
         'WL_HOME'
     ]]
 
     # rename the column
-    combined = combined.rename(columns={'WL_HOME': 'HOME_WIN'})
+    combined = combined.rename(columns={'WL_HOME': 'HOME_WIN', 'GAME_DATE_HOME': 'GAME_DATE'})
 
     combined['HOME_WIN'] = combined['HOME_WIN'].apply(lambda x: 1 if x == 'W' else  0)
 
-    combined.to_csv("../data/game_data.csv", index=False)
+    # numbers coerced and narrowed once here, readers load the csv with the same schema
+    combined = apply_schema(combined, GAME_DATA_SCHEMA)
+
+    # append new games, refetched games replace their stored rows
+    if existing is not None:
+        print(f"fetched {len(combined)} games since {date_from}")
+        combined = pd.concat([existing, combined], ignore_index=True)
+        combined = combined.drop_duplicates(subset='GAME_ID', keep='last')
+
+    combined.to_csv(GAME_DATA_PATH, index=False)
     print('game_data.csv saved')
 
 def fetch_team_data(season):
@@ -45,55 +87,122 @@ def fetch_team_data(season):
     :param season: str, the NBA season in "YYYY-YY" format (e.g., "2024-25").
     """
 
-    # fetch team stats from the current NBA season
-    team_stats = leaguedashteamstats.LeagueDashTeamStats(season=season)
+    # fetch per-game team stats from the current NBA season, the same scale as the
+    # point-in-time averages the winner model is trained on
+    team_stats = leaguedashteamstats.LeagueDashTeamStats(season=season, per_mode_detailed='PerGame')
     data = team_stats.get_data_frames()[0]
 
+    # keep only the columns the winner model and bracket read
+    data = apply_schema(data, TEAM_DATA_SCHEMA)
     data.to_csv("../data/team_data.csv", index=False)
     print('team_data.csv saved')
 
-def fetch_player_data(player_name: str, seasons=['2024-25'], force_refresh=False) -> str:
+def fetch_player_season(player_id, season: str, date_from=None) -> pd.DataFrame:
     """
-    fetch individual nba player data for a given season and save to a csv
+    fetch one season of a player's game log from the api
 
-    :param season: str
-    :param player: str, in the form of an id (Nikola Jokić = '203999')
-    :return: player full name
+    :param player_id: int or str, nba player id
+    :param season: str, the NBA season in "YYYY-YY" format
+    :param date_from: optional str date, only games on or after it are returned
+    :return: DataFrame of games with a SEASON column
     """
-    file_safe_name = player_name.replace(" ", "_")
-    file_path = f"../data/{file_safe_name}_data.csv"
-
-    if os.path.exists(file_path) and not force_refresh:
-        print(f"using cached csv: {file_path}")
-        return file_safe_name
-    
-    # find player by id
-    result = players.find_players_by_full_name(player_name)
-
-    # id and name of first result
-    player = result[0]
-    player_id = player['id']
-    full_name = player['full_name']
-    file_safe_name = full_name.replace(" ", "_")
+    stats = playergamelog.PlayerGameLog(
+        player_id=player_id,
+        season=season,
+        date_from_nullable=_api_date(date_from) if date_from else ''
+    )
+    df = stats.get_data_frames()[0]
+    df['SEASON'] = season
+    return df
+
+def refresh_player(player_id, full_name: str, seasons, incremental=False, fetch=fetch_player_season, strict=False) -> str:
+    """
+    fetch a player's seasons and write them to the game log store
+
+    in incremental mode, closed seasons that are already stored are skipped and the
+    current season is fetched from its high-water mark, then appended to the stored log
+
+    :param player_id: int or str, nba player id
+    :param full_name: str, full player name like 'LeBron James'
+    :param seasons: list of seasons in "YYYY-YY" format
+    :param incremental: bool, fetch only games newer than what is stored
+    :param fetch: callable(player_id, season, date_from) -> DataFrame, the api call
+    :param strict: bool, raise on a failed season instead of skipping it
+    :return: str, path to the player's stored log
+    """
+    entry = player_entry(full_name) if incremental else None
+    high_water = entry.get('high_water', {}) if entry else {}
+    this_season = current_season()
 
     # fetch data across seasons
     all_data = []
 
     for season in seasons:
-        print(f"fetching data for {full_name} - season {season}...")
+        mark = high_water.get(season)
+        if mark and season != this_season:
+            print(f"skipping closed season {season} for {full_name}, already stored")
+            continue
+
+        date_from = mark['game_date'] if mark else None
+        since = f" since {date_from}" if date_from else ""
+        print(f"fetching data for {full_name} - season {season}{since}...")
         try:
-            stats = playergamelog.PlayerGameLog(player_id=player_id, season=season)
-            df = stats.get_data_frames()[0]
-            df['SEASON'] = season
-            all_data.append(df)
+            all_data.append(fetch(player_id, season, date_from))
         except Exception as e:
+            if strict:
+                raise
             print(f"failed to fetch data for {full_name} - {season}: {e}")
 
     # combine and export
+    if entry is not None:
+        new_data = pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
+        return append_player_log(player_id, full_name, new_data)
+
+    if not all_data:
+        raise ValueError(f"no game data fetched for {full_name}")
     data = pd.concat(all_data, ignore_index=True)
-    data.to_csv(file_path, index=False)
-    print(f'{file_safe_name}_data.csv saved to {file_path}')
-    
+    return write_player_log(player_id, full_name, data)
+
+def resolve_player(player_name: str) -> dict:
+    """
+    the player a full or partial name refers to, from nba_api's bundled player list without a request
+
+    :param player_name: str, full or partial player name like 'LeBron James' or 'lebron'
+    :return: dict with 'id' and 'full_name'
+    :raises ValueError: if no player matches
+    """
+    result = players.find_players_by_full_name(player_name)
+    if not result:
+        raise ValueError(f"no player found for '{player_name}'")
+    # prefer an exact match over the first partial one
+    exact = [p for p in result if p['full_name'].lower() == player_name.lower()]
+    return (exact or result)[0]
+
+@timed('fetch')
+def fetch_player_data(player_name: str, seasons=['2024-25'], force_refresh=False, incremental=False) -> str:
+    """
+    fetch individual nba player data for the given seasons and save it to the game log store
+
+    :param player_name: str, full or partial player name like 'LeBron James'
+    :param seasons: list of seasons in "YYYY-YY" format
+    :param force_refresh: bool, refetch every season even if the player is stored
+    :param incremental: bool, fetch only games newer than the stored high-water marks
+    :return: player full name
+    """
+    file_safe_name = player_name.replace(" ", "_")
+
+    if has_player(player_name) and not force_refresh and not incremental:
+        print(f"using cached game log: {player_log_path(player_name)}")
+        return file_safe_name
+
+    player = resolve_player(player_name)
+    player_id = player['id']
+    full_name = player['full_name']
+    file_safe_name = full_name.replace(" ", "_")
+
+    file_path = refresh_player(player_id, full_name, seasons, incremental=incremental and not force_refresh)
+    print(f'{file_safe_name} game log saved to {file_path}')
+
     return file_safe_name
 
 if __name__ == "__main__":
@@ -0,0 +1,366 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from atomic_write import atomic_write, write_json
+from instrumentation import timed, count
+from player_features import RollingState
+from schema import PLAYER_LOG_SCHEMA, apply_schema
+
+STORE_DIR = '../data/game_logs'
+INDEX_PATH = os.path.join(STORE_DIR, 'index.json')
+
+# guards index.json when several threads write players at once
+_index_lock = threading.Lock()
+
+def _file_safe(player_name: str) -> str:
+    return player_name.replace(" ", "_")
+
+def partition_path(player_id) -> str:
+    """
+    parquet file holding one player's game log
+
+    :param player_id: int or str, nba player id
+    :return: str, path to the player's partition
+    """
+    return os.path.join(STORE_DIR, f"PLAYER_ID={player_id}", "games.parquet")
+
+def rolling_state_path(player_id, games: int = 10) -> str:
+    """
+    rolling feature state kept next to a player's partition, one per window
+
+    :param player_id: int or str, nba player id
+    :param games: int, number of games in the rolling window
+    :return: str, path to the state
+    """
+    return os.path.join(STORE_DIR, f"PLAYER_ID={player_id}", f"rolling_{games}.npz")
+
+def _rolling_state_paths(player_id) -> list:
+    return glob.glob(os.path.join(STORE_DIR, f"PLAYER_ID={player_id}", "rolling_*.npz"))
+
+def legacy_csv_path(player_name: str) -> str:
+    """
+    per-player csv written before the columnar store existed
+
+    :param player_name: str, full player name like 'LeBron James'
+    :return: str, path to the csv
+    """
+    return f"../data/{_file_safe(player_name)}_data.csv"
+
+def load_index() -> dict:
+    """
+    reads the store index, mapping file-safe player names to their id and partition metadata
+
+    :return: dict with a 'players' mapping
+    """
+    if not os.path.exists(INDEX_PATH):
+        return {'players': {}}
+    with open(INDEX_PATH) as f:
+        return json.load(f)
+
+def _write_index(index: dict):
+    write_json(INDEX_PATH, index, default=str)
+
+def normalize_log(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    keeps the schema's columns at their compact dtypes, parses GAME_DATE and sorts games
+    oldest first, the order every reader expects
+
+    :param data: DataFrame, raw game log as returned by nba_api or read from csv
+    :return: DataFrame, typed and sorted copy
+    """
+    data = data.copy()
+    try:
+        # nba_api's 'APR 14, 2024', given explicitly since a newest game in May reads as a full month name
+        data['GAME_DATE'] = pd.to_datetime(data['GAME_DATE'], format='%b %d, %Y')
+    except ValueError:
+        data['GAME_DATE'] = pd.to_datetime(data['GAME_DATE'])
+
+    # csv round trips drop the leading zeros of nba game ids
+    if 'Game_ID' in data:
+        data['Game_ID'] = data['Game_ID'].astype(str).str.zfill(10)
+    data = apply_schema(data, PLAYER_LOG_SCHEMA)
+    return data.sort_values('GAME_DATE', kind='stable').reset_index(drop=True)
+
+def _high_water_marks(data: pd.DataFrame) -> dict:
+    """
+    last stored game per season, used to fetch only newer games on refresh
+
+    :param data: DataFrame, normalized game log
+    :return: dict of season -> {'game_date', 'game_id'}
+    """
+    if 'SEASON' not in data or data.empty:
+        return {}
+    last_games = data.groupby('SEASON', observed=True).tail(1)
+    return {
+        row['SEASON']: {
+            'game_date': row['GAME_DATE'].strftime('%Y-%m-%d'),
+            'game_id': row.get('Game_ID'),
+        }
+        for _, row in last_games.iterrows()
+    }
+
+def write_player_log(player_id, full_name: str, data: pd.DataFrame) -> str:
+    """
+    writes a player's full game log to their partition and records it in the index
+
+    rolling states built from the old log are dropped, they're rebuilt on their next use
+
+    :param player_id: int or str, nba player id
+    :param full_name: str, full player name like 'LeBron James'
+    :param data: DataFrame, the player's game log across seasons
+    :return: str, path to the written partition
+    """
+    for state_path in _rolling_state_paths(player_id):
+        os.remove(state_path)
+    return _write_partition(player_id, full_name, normalize_log(data))
+
+def _write_partition(player_id, full_name: str, data: pd.DataFrame) -> str:
+    path = partition_path(player_id)
+
+    # write to a temp file first so readers never see a half-written partition
+    with atomic_write(path) as tmp_path:
+        pq.write_table(pa.Table.from_pandas(data, preserve_index=False), tmp_path)
+
+    with _index_lock:
+        index = load_index()
+        index['players'][_file_safe(full_name)] = {
+            'player_id': str(player_id),
+            'full_name': full_name,
+            'rows': len(data),
+            'seasons': sorted(data['SEASON'].unique().tolist()) if 'SEASON' in data else [],
+            'last_game_date': data['GAME_DATE'].max().strftime('%Y-%m-%d') if len(data) else None,
+            'high_water': _high_water_marks(data),
+        }
+        _write_index(index)
+    return path
+
+def append_player_log(player_id, full_name: str, new_data: pd.DataFrame) -> str:
+    """
+    adds newly fetched games to a player's stored log, replacing any games already stored
+
+    the player's rolling states take the new games one at a time when they all come after
+    the stored ones and the refetched games are unchanged, otherwise they're rebuilt on use
+
+    :param player_id: int or str, nba player id
+    :param full_name: str, full player name like 'LeBron James'
+    :param new_data: DataFrame, games fetched since the last refresh
+    :return: str, path to the written partition
+    """
+    path = partition_path(player_id)
+    if not os.path.exists(path):
+        return write_player_log(player_id, full_name, new_data)
+
+    existing = read_log_file(path)
+    if new_data.empty:
+        return _write_partition(player_id, full_name, existing)
+
+    new_data = normalize_log(new_data)
+    data = pd.concat([existing, new_data], ignore_index=True)
+    data = data.drop_duplicates(subset='Game_ID', keep='last')
+
+    stored = new_data['Game_ID'].isin(existing['Game_ID'])
+    fresh = new_data[~stored]
+    incremental = (_unchanged(existing, new_data[stored])
+                   and (fresh.empty or fresh['GAME_DATE'].min() > existing['GAME_DATE'].max()))
+
+    state_paths = _rolling_state_paths(player_id)
+    if not incremental:
+        for state_path in state_paths:
+            os.remove(state_path)
+    path = _write_partition(player_id, full_name, normalize_log(data))
+
+    for state_path in state_paths if incremental else []:
+        state = RollingState.load(state_path)
+        if state.count == len(existing):
+            state.extend(fresh)
+            state.save(state_path)
+        else:
+            os.remove(state_path)
+    return path
+
+def _unchanged(existing: pd.DataFrame, refetched: pd.DataFrame) -> bool:
+    """
+    :param existing: DataFrame, the stored log
+    :param refetched: DataFrame, newly fetched copies of stored games
+    :return: bool, whether every refetched game has the box score already stored
+    """
+    if refetched.empty:
+        return True
+    columns = [c for c in existing.columns if c in refetched and c not in ('Game_ID', 'GAME_DATE')
+               and PLAYER_LOG_SCHEMA.get(c) in ('int16', 'float32')]
+    before = existing.set_index('Game_ID').loc[refetched['Game_ID'], columns].to_numpy(float)
+    after = refetched[columns].to_numpy(float)
+    return before.shape == after.shape and np.allclose(before, after, equal_nan=True)
+
+def player_entry(player_name: str):
+    """
+    index metadata for a stored player, including per-season high-water marks
+
+    :param player_name: str, full player name like 'LeBron James'
+    :return: dict, or None if the player isn't in the store
+    """
+    return load_index()['players'].get(_file_safe(player_name))
+
+def player_log_path(player_name: str) -> str:
+    """
+    where a player's game log lives: their store partition, or the legacy csv if not yet migrated
+
+    :param player_name: str, full player name like 'LeBron James'
+    :return: str, path to the log
+    """
+    entry = player_entry(player_name)
+    if entry is not None:
+        return partition_path(entry['player_id'])
+    return legacy_csv_path(player_name)
+
+def player_key(player_name: str) -> str:
+    """
+    id that keys a player's models: their nba player id, or their file-safe name if not yet migrated
+
+    :param player_name: str, full player name like 'LeBron James'
+    :return: str
+    """
+    entry = player_entry(player_name)
+    return entry['player_id'] if entry is not None else _file_safe(player_name)
+
+def has_player(player_name: str) -> bool:
+    return os.path.exists(player_log_path(player_name))
+
+def player_data_hash(player_name: str) -> str:
+    """
+    content hash of a player's stored log, changes whenever games are added or corrected
+
+    :param player_name: str, full player name like 'LeBron James'
+    :return: str, sha256 hex digest
+    """
+    path = player_log_path(player_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Missing data file: {path}")
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def store_data_hash() -> str:
+    """
+    content hash of every stored player's log, the data hash of models trained on the whole store
+
+    :return: str, sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    for entry in sorted(load_index()['players'].values(), key=lambda entry: str(entry['player_id'])):
+        with open(partition_path(entry['player_id']), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+@timed('log_read')
+def read_log_file(path: str, columns=None) -> pd.DataFrame:
+    """
+    reads a game log file, memory-mapping store partitions and parsing legacy csvs
+
+    :param path: str, partition or csv path from player_log_path
+    :param columns: optional list of columns to load, defaults to every schema column
+    :return: DataFrame of games, oldest first
+    """
+    if path.endswith('.parquet'):
+        if columns is not None:
+            missing = [c for c in columns if c not in pq.read_schema(path).names]
+            if missing:
+                raise ValueError(f"{path} has no {', '.join(missing)} column, refetch the player to add it")
+        # partitioning=None keeps pyarrow from adding the PLAYER_ID=... directory as a column
+        data = pq.read_table(path, columns=columns, memory_map=True, partitioning=None).to_pandas()
+    else:
+        data = normalize_log(pd.read_csv(path, usecols=lambda column: column in PLAYER_LOG_SCHEMA))
+    # partitions written before the schema existed come back with their old columns and dtypes
+    data = apply_schema(data, PLAYER_LOG_SCHEMA, columns)
+    count('log_rows', len(data))
+    return data
+
+def read_player_log(player_name: str, columns=None) -> pd.DataFrame:
+    """
+    loads one player's game log without touching any other player's data
+
+    :param player_name: str, full player name like 'LeBron James'
+    :param columns: optional list of columns to load
+    :return: DataFrame of games, oldest first
+    """
+    path = player_log_path(player_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Missing data file: {path}")
+    return read_log_file(path, columns)
+
+def load_rolling_state(player_name: str, games: int = 10) -> RollingState:
+    """
+    a player's rolling feature state, without reading their log when it's current
+
+    the state is kept next to the partition and moved forward as games are appended, it's
+    only rebuilt from the log when missing or behind the stored games
+
+    :param player_name: str, full player name like 'LeBron James'
+    :param games: int, number of games in the rolling window
+    :return: RollingState
+    """
+    entry = player_entry(player_name)
+    if entry is None:
+        # legacy csv, nothing to keep the state next to
+        return RollingState.from_log(read_player_log(player_name), games)
+
+    state_path = rolling_state_path(entry['player_id'], games)
+    if os.path.exists(state_path):
+        state = RollingState.load(state_path)
+        if state.count == entry['rows']:
+            return state
+
+    state = RollingState.from_log(read_player_log(player_name), games)
+    state.save(state_path)
+    return state
+
+def read_all_logs(columns=None) -> pd.DataFrame:
+    """
+    loads every stored player's game log as one frame, each player's games oldest first
+
+    :param columns: optional list of columns to load
+    :return: DataFrame with a PLAYER_ID column
+    """
+    frames = []
+    for entry in load_index()['players'].values():
+        data = read_log_file(partition_path(entry['player_id']), columns)
+        data['PLAYER_ID'] = entry['player_id']
+        frames.append(data)
+    if not frames:
+        return pd.DataFrame(columns=(columns or []) + ['PLAYER_ID'])
+    # concat falls back to object for categoricals whose categories differ between players
+    logs = pd.concat(frames, ignore_index=True)
+    return apply_schema(logs, PLAYER_LOG_SCHEMA, list(logs.columns))
+
+def migrate_legacy_csvs(data_dir: str = '../data') -> list:
+    """
+    imports every per-player csv into the store
+
+    :param data_dir: str, directory holding {Name}_data.csv files
+    :return: list of migrated player names
+    """
+    migrated = []
+    for file_name in sorted(os.listdir(data_dir)):
+        if not file_name.endswith('_data.csv') or file_name in ('game_data.csv', 'team_data.csv'):
+            continue
+        data = pd.read_csv(os.path.join(data_dir, file_name))
+        if 'Player_ID' not in data or data.empty:
+            print(f"skipping {file_name}: no Player_ID column")
+            continue
+        full_name = file_name[:-len('_data.csv')].replace("_", " ")
+        write_player_log(data['Player_ID'].iloc[0], full_name, data)
+        migrated.append(full_name)
+        print(f"migrated {file_name} to {partition_path(data['Player_ID'].iloc[0])}")
+    return migrated
+
+if __name__ == "__main__":
+    migrate_legacy_csvs()
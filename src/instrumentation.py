@@ -0,0 +1,145 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# NBA_PROFILE=1 turns timing on at import, NBA_PROFILE_OUT=path dumps it as json at exit
+ENABLED = os.environ.get('NBA_PROFILE', '').lower() not in ('', '0', 'false', 'no')
+PROFILE_OUT = os.environ.get('NBA_PROFILE_OUT')
+
+_lock = threading.Lock()
+# stage name -> [calls, total seconds, max seconds]
+_stages = {}
+_counters = {}
+
+def enable(on: bool = True):
+    """
+    turns stage timing and counters on or off for this process
+
+    :param on: bool
+    """
+    global ENABLED
+    ENABLED = on
+
+def reset():
+    """
+    clears every recorded stage and counter
+    """
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+def record(name: str, seconds: float):
+    """
+    adds one timed call of a stage
+
+    :param name: str, stage name like 'model_load'
+    :param seconds: float, wall time of the call
+    """
+    with _lock:
+        entry = _stages.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+def count(name: str, n: int = 1):
+    """
+    adds to a counter, e.g. rows read or candidates fitted, no-op when profiling is off
+
+    :param name: str, counter name
+    :param n: int, amount to add
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+@contextmanager
+def _timer(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+@contextmanager
+def _untimed():
+    yield
+
+def stage(name: str):
+    """
+    context manager timing a block as one call of a stage, free when profiling is off
+
+    :param name: str, stage name like 'fetch' or 'predict'
+    :return: context manager
+    """
+    return _timer(name) if ENABLED else _untimed()
+
+def timed(name: str):
+    """
+    decorator timing every call of a function as a stage
+
+    :param name: str, stage name
+    :return: decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def snapshot() -> dict:
+    """
+    :return: dict with 'stages' (name -> calls, total_s, mean_ms, max_ms) and 'counters'
+    """
+    with _lock:
+        stages = {
+            name: {
+                'calls': calls,
+                'total_s': round(total, 6),
+                'mean_ms': round(total / calls * 1e3, 3),
+                'max_ms': round(longest * 1e3, 3),
+            }
+            for name, (calls, total, longest) in sorted(_stages.items(), key=lambda item: -item[1][1])
+        }
+        return {'stages': stages, 'counters': dict(sorted(_counters.items()))}
+
+def dump(path: str = None) -> str:
+    """
+    writes the current stages and counters as json
+
+    :param path: optional str, file to write, defaults to NBA_PROFILE_OUT
+    :return: str, the json
+    """
+    text = json.dumps(dict(snapshot(), pid=os.getpid(), written_at=time.strftime('%Y-%m-%dT%H:%M:%S')), indent=2)
+    path = path or PROFILE_OUT
+    if path:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
+
+def print_summary():
+    """
+    prints a table of stages by total time, then the counters
+    """
+    profile = snapshot()
+    if not profile['stages'] and not profile['counters']:
+        return
+    print(f"\n{'stage':<22}{'calls':>7}{'total s':>10}{'mean ms':>10}{'max ms':>10}")
+    for name, s in profile['stages'].items():
+        print(f"{name:<22}{s['calls']:>7}{s['total_s']:>10.3f}{s['mean_ms']:>10.2f}{s['max_ms']:>10.2f}")
+    for name, value in profile['counters'].items():
+        print(f"{name:<22}{value:>7}")
+
+if ENABLED and PROFILE_OUT:
+    atexit.register(dump)
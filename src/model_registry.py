@@ -0,0 +1,345 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from atomic_write import write_json, temp_path
+from compiled_model import export_model, compiled_path, load_model
+
+try:
+    import fcntl
+except ImportError:
+    # windows, registry writes are only serialized within one process
+    fcntl = None
+
+# absolute, so lookups don't depend on the directory a script was started from
+MODELS_DIR = os.path.abspath(os.environ.get(
+    'NBA_MODELS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')))
+REGISTRY_DIR = os.path.join(MODELS_DIR, 'registry')
+INDEX_PATH = os.path.join(REGISTRY_DIR, 'index.json')
+
+_index_lock = threading.Lock()
+# parsed index and the mtime it was read at, so lookups only re-read after a write
+_index_cache = {}
+
+def slot_key(player_id, stat_expr: str, line: float = None, games=10, family: str = None) -> str:
+    """
+    identity of a model slot, every retrain of the same slot adds a version to it
+
+    :param player_id: int or str, nba player id, or e.g. 'league' for team models
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param line: optional float, the line of a single-line model, None for a multi-line model
+    :param games: int, rolling window
+    :param family: optional str, overrides the line part, e.g. 'winner' or 'pooled'
+    :return: str
+    """
+    if family is None:
+        family = 'multiline' if line is None else f"line={float(line)}"
+    return f"{player_id}|{stat_expr}|{family}|games={games}"
+
+def file_hash(*paths) -> str:
+    """
+    sha256 over the contents of several files, the data hash of models trained on them
+
+    :param paths: file paths, in a fixed order
+    :return: str, hex digest
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def _slot_dir(key: str) -> str:
+    safe = key.replace('|', '__').replace('=', '-').replace('+', '_').replace(' ', '_')
+    return os.path.join(REGISTRY_DIR, safe)
+
+def slot_file(key: str, name: str) -> str:
+    """
+    a file kept with a slot's versions, like the state a warm-started search resumes from
+
+    :param key: str, from slot_key
+    :param name: str, file name
+    :return: str, path inside the slot's directory
+    """
+    return os.path.join(_slot_dir(key), name)
+
+def _read_index_file() -> dict:
+    if not os.path.exists(INDEX_PATH):
+        return {'slots': {}}
+    with open(INDEX_PATH) as f:
+        return json.load(f)
+
+def load_index() -> dict:
+    """
+    the registry index, re-read only when the file changed
+
+    :return: dict with a 'slots' mapping of slot key -> slot metadata and versions
+    """
+    try:
+        mtime = os.stat(INDEX_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return {'slots': {}}
+    if _index_cache.get('mtime') != mtime:
+        _index_cache['index'] = _read_index_file()
+        _index_cache['mtime'] = mtime
+    return _index_cache['index']
+
+def _write_index(index: dict):
+    write_json(INDEX_PATH, index, default=str)
+
+@contextmanager
+def _locked():
+    # one writer at a time, across threads and (where flock exists) across processes
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    with _index_lock:
+        with open(f"{INDEX_PATH}.lock", 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def register_model(model, player_id, stat_expr: str, line: float = None, games=10, family: str = None,
+                   seasons=(), data_hash: str = None, metrics: dict = None, params: dict = None) -> dict:
+    """
+    stores a trained model as the newest version of its slot
+
+    artifacts are written once under a fresh version number and never modified, so a
+    serving process can keep using an old version while the index moves to a new one
+
+    :param model: fitted model
+    :param player_id: int or str, nba player id, or e.g. 'league' for team models
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param line: optional float, the line of a single-line model, None for a multi-line model
+    :param games: int, rolling window
+    :param family: optional str, overrides the line part of the slot key
+    :param seasons: list of seasons the training data covered
+    :param data_hash: str, hash of the training data, see game_log_store.player_data_hash
+    :param metrics: optional dict, e.g. {'accuracy': 0.61}
+    :param params: optional dict, hyperparameters
+    :return: dict, the version entry
+    """
+    import joblib
+
+    key = slot_key(player_id, stat_expr, line, games, family)
+    slot_dir = _slot_dir(key)
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+
+    # write the artifacts before taking the lock, they only get their version name inside it.
+    # they're staged outside the slot directory, which gc may remove until the lock is held
+    tmp_model = temp_path(os.path.join(REGISTRY_DIR, 'staged'), suffix='.pkl')
+    joblib.dump(model, tmp_model)
+    try:
+        tmp_compiled = export_model(model, compiled_path(tmp_model))
+    except TypeError:
+        tmp_compiled = None
+
+    with _locked():
+        os.makedirs(slot_dir, exist_ok=True)
+        index = _read_index_file()
+        slot = index['slots'].setdefault(key, {
+            'player_id': str(player_id),
+            'stat_expr': stat_expr,
+            'family': family or ('multiline' if line is None else 'line'),
+            'line': line,
+            'games': games,
+            'latest': None,
+            'versions': {},
+        })
+        version = max((int(v) for v in slot['versions']), default=0) + 1
+        model_path = os.path.join(slot_dir, f"v{version}.pkl")
+        if tmp_compiled is not None:
+            os.replace(tmp_compiled, compiled_path(model_path))
+        os.replace(tmp_model, model_path)
+
+        entry = {
+            'version': version,
+            'model_path': model_path,
+            'compiled': tmp_compiled is not None,
+            'data_hash': data_hash,
+            'seasons': sorted(seasons),
+            'metrics': metrics or {},
+            'params': params or {},
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        slot['versions'][str(version)] = entry
+        slot['latest'] = str(version)
+        _write_index(index)
+
+    print(f"registered {key} v{version}")
+    return entry
+
+def lookup(player_id, stat_expr: str, line: float = None, games=10, family: str = None,
+           data_hash: str = None, seasons=None):
+    """
+    finds a registered model version from the index, without loading it
+
+    :param player_id: int or str, nba player id
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param line: optional float, the line of a single-line model, None for a multi-line model
+    :param games: int, rolling window
+    :param family: optional str, overrides the line part of the slot key
+    :param data_hash: optional str, only a version trained on exactly this data
+    :param seasons: optional list, only a version trained on exactly these seasons
+    :return: dict version entry, or None
+    """
+    slot = load_index()['slots'].get(slot_key(player_id, stat_expr, line, games, family))
+    if slot is None:
+        return None
+
+    for version in sorted(slot['versions'], key=int, reverse=True):
+        entry = slot['versions'][version]
+        if data_hash is not None and entry['data_hash'] != data_hash:
+            continue
+        if seasons is not None and entry['seasons'] != sorted(seasons):
+            continue
+        if os.path.exists(entry['model_path']):
+            return entry
+    return None
+
+def list_models(player_id=None, stat_expr: str = None) -> list:
+    """
+    :param player_id: optional, only this player's slots
+    :param stat_expr: optional str, only slots for this stat expression
+    :return: list of dicts, one per slot with its latest version's metadata
+    """
+    rows = []
+    for key, slot in sorted(load_index()['slots'].items()):
+        if player_id is not None and slot['player_id'] != str(player_id):
+            continue
+        if stat_expr is not None and slot['stat_expr'] != stat_expr:
+            continue
+        latest = slot['versions'].get(slot['latest'], {})
+        rows.append({
+            'key': key,
+            'versions': len(slot['versions']),
+            'latest': latest.get('version'),
+            'seasons': latest.get('seasons'),
+            'metrics': latest.get('metrics'),
+            'created_at': latest.get('created_at'),
+            'model_path': latest.get('model_path'),
+        })
+    return rows
+
+def gc(keep: int = 2, dry_run: bool = False) -> list:
+    """
+    deletes all but the newest `keep` versions of every slot, plus files no version refers to
+
+    the whole sweep holds the registry lock, so a version registered by another process
+    while it runs is either in the index it reads or committed after it finishes
+
+    :param keep: int, versions to keep per slot, at least 1 so every slot keeps its latest
+    :param dry_run: bool, only report what would be removed
+    :return: list of removed paths
+    """
+    if keep < 1:
+        raise ValueError(f"keep must be at least 1, got {keep}")
+
+    removed = []
+    with _locked():
+        index = _read_index_file()
+        referenced = set()
+        for slot in index['slots'].values():
+            for version in sorted(slot['versions'], key=int)[:-keep]:
+                if version == slot['latest']:
+                    continue
+                entry = slot['versions'].pop(version)
+                removed += [entry['model_path'], compiled_path(entry['model_path'])]
+            for entry in slot['versions'].values():
+                referenced.update([entry['model_path'], compiled_path(entry['model_path'])])
+
+        # leftovers from interrupted registrations, temp files of running ones are left alone for an hour
+        for root, _, files in os.walk(REGISTRY_DIR):
+            for name in files:
+                path = os.path.join(root, name)
+                if not name.endswith(('.pkl', '.npz')) or path in referenced or path in removed:
+                    continue
+                if '.tmp.' in name and time.time() - os.path.getmtime(path) < 3600:
+                    continue
+                removed.append(path)
+
+        removed = [path for path in removed if os.path.exists(path)]
+        if not dry_run:
+            _write_index(index)
+            for path in removed:
+                os.remove(path)
+            for root, _, _ in os.walk(REGISTRY_DIR, topdown=False):
+                if root != REGISTRY_DIR and not os.listdir(root):
+                    os.rmdir(root)
+    return removed
+
+class ModelHandle:
+    """
+    the latest version of one slot, swapped for a newer one as soon as it's registered.
+
+    the index is stat'ed at most every `check_interval` seconds, so calling get() or path()
+    per request costs a dict lookup until a new version actually shows up.
+    """
+
+    def __init__(self, player_id, stat_expr: str, line: float = None, games=10, family: str = None,
+                 check_interval: float = 1.0):
+        self.slot = (player_id, stat_expr, line, games, family)
+        self.check_interval = check_interval
+        self.version = None
+        self.model_path = None
+        self._loaded = (None, None)
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def path(self) -> str:
+        """
+        :return: str, model path of the slot's newest version
+        """
+        now = time.monotonic()
+        if self.model_path is not None and now - self._checked < self.check_interval:
+            return self.model_path
+
+        with self._lock:
+            self._checked = now
+            entry = lookup(*self.slot)
+            if entry is None:
+                raise FileNotFoundError(f"No registered model for {slot_key(*self.slot)}")
+            self.version = entry['version']
+            self.model_path = entry['model_path']
+            return self.model_path
+
+    def get(self):
+        """
+        :return: the loaded model, compiled when an export exists
+        """
+        path = self.path()
+        # kept with its path, so a swap racing this call never pairs a new path with the old model
+        loaded_path, model = self._loaded
+        if loaded_path != path:
+            model = load_model(path)
+            self._loaded = (path, model)
+        return model
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="list and clean up registered models")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list')
+    list_parser.add_argument('--player-id')
+    list_parser.add_argument('--stat')
+
+    gc_parser = subparsers.add_parser('gc', help="remove old versions and orphaned files")
+    gc_parser.add_argument('--keep', type=int, default=2)
+    gc_parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for row in list_models(args.player_id, args.stat):
+            print(f"{row['key']:<45} v{row['latest']} ({row['versions']} versions) {row['seasons']} {row['metrics']}")
+    else:
+        removed = gc(args.keep, args.dry_run)
+        print(f"{'would remove' if args.dry_run else 'removed'} {len(removed)} files")
+        for path in removed:
+            print(f"  {path}")
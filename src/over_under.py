@@ -1,6 +1,8 @@
 from data_generation import fetch_player_data
 from over_under_model import generate_player_model
 from predict_over_under import predict_over_under
+import instrumentation
+from instrumentation import stage
 
 seasons = ['2023-24','2024-25']
 games = 10
@@ -11,15 +13,23 @@ line = 20.5
 
 force_re = True
 
-full_name = fetch_player_data(player_name=player_name, seasons=seasons, force_refresh=force_re)
+# run with NBA_PROFILE=1 to time each stage
+with stage('total'):
+    with stage('fetch_stage'):
+        full_name = fetch_player_data(player_name=player_name, seasons=seasons, force_refresh=force_re)
 
-generate_player_model(player_name=full_name, 
-                      line=line, 
-                      stat_expr=stat_expr,
-                      games=games,
-                      force_retrain=force_re)
+    with stage('train_stage'):
+        generate_player_model(player_name=full_name, 
+                              line=line, 
+                              stat_expr=stat_expr,
+                              games=games,
+                              force_retrain=force_re)
 
-predict_over_under(player_name=full_name,
-    stat_expr=stat_expr,
-    line=line,
-    games=games)
\ No newline at end of file
+    with stage('predict_stage'):
+        predict_over_under(player_name=full_name,
+            stat_expr=stat_expr,
+            line=line,
+            games=games)
+
+if instrumentation.ENABLED:
+    instrumentation.print_summary()
\ No newline at end of file
@@ -1,127 +1,505 @@
+import json
 import os
+import time
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, GridSearchCV, StratifiedKFold
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
 # from sklearn.ensemble import RandomForestClassifier # old model
 from xgboost import XGBClassifier
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
+from game_log_store import read_player_log, player_key, player_data_hash
+from atomic_write import atomic_write, write_json
+from compiled_model import export_model, compiled_path
+from model_registry import register_model, lookup, slot_key, slot_file
+from player_features import feature_frame, log_columns
+from instrumentation import timed
 
-def generate_player_model(player_name: str, line: float, stat_expr: str, games=10, force_retrain=False):
+# feature holding the over/under line in multi-line models
+LINE_FEATURE = 'LINE'
+
+# hyperparameters searched for every over/under model
+PARAM_GRID = {
+    'n_estimators': [50, 100],
+    'max_depth': [3, 5],
+    'learning_rate': [0.01, 0.1],
+}
+
+# in halving mode, retrains whose training rows grew by less than this fraction
+# refit the previous best params without searching
+REUSE_DELTA = 0.1
+# ...and below this fraction only the neighbourhood of the previous best is searched
+LOCAL_SEARCH_DELTA = 0.5
+
+@timed('features')
+def build_training_data(player_data: pd.DataFrame, stat_expr: str, line: float, games=10):
     """
-    trains a binary over/under model for a given player and stat expression
+    builds features and over/under targets from a player's game log
 
-    :param player_name: str, full player name like 'LeBron James'
-    :param line: float, over/under line to model
+    each row pairs the features known after game t with whether game t+1 went over,
+    the same alignment predict_over_under uses for the next game
+
+    :param player_data: DataFrame, chronologically sorted game log
     :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
-    :param season: str, e.g. '2024-25'
+    :param line: float, over/under line to model
     :param games: int, number of games to use for rolling averages
+    :return: tuple of (features DataFrame, target Series)
     """
-    file_safe_name = player_name.replace(" ", "_")
-    model_path = f"../models/{file_safe_name}_{stat_expr.replace('+', '_')}_model.pkl"
+    features = feature_frame(player_data, stat_expr, games)
 
-    # if model exists skip
-    if os.path.exists(model_path) and not force_retrain:
-        print(f"model already exists: {model_path}, skipping retrain.")
-        return
-
-    # load player data
-    player_data = pd.read_csv(f'../data/{file_safe_name}_data.csv')
-
-    # sort chronologically
-    player_data['GAME_DATE'] = pd.to_datetime(player_data['GAME_DATE'])
-    player_data = player_data.sort_values('GAME_DATE')
-
-    # create target column
-    player_data['_TARGET_COMBO'] = player_data.eval(stat_expr)
-    player_data['OVER_TARGET'] = (player_data['_TARGET_COMBO'] > line).astype(int)
-    player_data.drop(columns=['_TARGET_COMBO'], inplace=True)
-
-    # set base features
-    base_features = [
-        'MIN', 'FGA', 'FG3A', 'FTA', 'REB', 'AST', 'TOV',
-        'FGM', 'FG3M', 'FTM', 'FG_PCT', 'FG3_PCT', 'FT_PCT',
-        'OREB', 'DREB'
-    ]
-
-    # assist/turnover ratio
-    player_data['AST_TOV_ratio'] = player_data['AST'] / (player_data['TOV'] + 1e-5)
-
-    # compute rolling averages for selected features
-    for feature in base_features + ['AST_TOV_ratio']:
-        player_data[f'{feature}_avg'] = player_data[feature].rolling(games).mean()
-
-    # extract rolling average for components in stat_expr
-    stat_parts = [s.strip() for s in stat_expr.split('+')]
-    for stat in stat_parts:
-        col_name = f"{stat}_avg"
-        if col_name not in player_data.columns:
-            player_data[col_name] = player_data[stat].rolling(games).mean()
-
-    # build final feature list
-    rolling_features = [f"{stat}_avg" for stat in stat_parts]
-    custom_rolling = [f"{feature}_avg" for feature in base_features + ['AST_TOV_ratio']]
-    features = pd.Index(base_features + custom_rolling + rolling_features).unique().tolist()
-
-    # drop NaNs
-    # print("total rows before rolling averages:", len(player_data))
-    player_data = player_data.dropna(subset=features + ['OVER_TARGET'])
-    # print("rows after dropping NaNs:", len(player_data))
-
-    # split features and target
-    X = player_data[features].apply(pd.to_numeric, errors='coerce')
-    X = X.dropna()
-    y = player_data.loc[X.index, 'OVER_TARGET']
-
-    # split into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    # create target column from the following game
+    next_value = player_data.eval(stat_expr).shift(-1)
+    target = (next_value > line).astype(int).where(next_value.notna())
 
-    X_train = X_train.select_dtypes(include=['number']).astype('float32')
-    X_test = X_test.select_dtypes(include=['number']).astype('float32')
-    y_train = y_train.loc[X_train.index]
-    y_test = y_test.loc[X_test.index]
+    # drop rows without a full window or a next game
+    keep = features.notna().all(axis=1) & target.notna()
+    return features[keep], target[keep].astype(int).rename('OVER_TARGET')
 
-    # initialize and train random forest classifier
-    # model = RandomForestClassifier(class_weight='balanced',random_state=42)
-    # model.fit(X_train, y_train)
+def chronological_split(order: np.ndarray, test_size: float = 0.2) -> tuple:
+    """
+    holds out the most recent games, so evaluation never trains on the future
 
+    :param order: array, per row a game index that increases with time
+    :param test_size: float, share of games held out
+    :return: tuple of (train row positions, test row positions)
+    """
+    games = np.unique(order)
+    cutoff = games[int(len(games) * (1 - test_size))]
+    return np.flatnonzero(order < cutoff), np.flatnonzero(order >= cutoff)
+
+def time_series_folds(order: np.ndarray, n_splits: int = 5) -> list:
+    """
+    forward-chaining cv folds, each validating on games after everything it trained on
+
+    :param order: array, per row a game index that increases with time
+    :param n_splits: int, number of folds
+    :return: list of (train row positions, validation row positions), usable as cv
+    """
+    games = np.unique(order)
+    folds = []
+    for train_games, val_games in TimeSeriesSplit(n_splits=n_splits).split(games):
+        folds.append((np.flatnonzero(np.isin(order, games[train_games])),
+                      np.flatnonzero(np.isin(order, games[val_games]))))
+    return folds
+
+def _grid_search(X_train, y_train, cv, groups=None, n_jobs=-1, xgb_threads=None, **model_params):
+    """
+    grid searches XGBoost hyperparameters and returns the best refit model
+
+    :param X_train: DataFrame, training features
+    :param y_train: Series, binary over target
+    :param cv: cross-validation splitter
+    :param groups: optional array, group labels for group-aware splitters
+    :param n_jobs: int, parallel grid search fits, -1 for all cores
+    :param xgb_threads: optional int, threads per xgboost fit, None for xgboost's default
+    :param model_params: extra XGBClassifier arguments
+    :return: fitted XGBClassifier
+    """
     # calculate class imbalance
     scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
 
     # grid search with cross-validation
-    param_grid = {
-        'n_estimators': [50, 100],
-        'max_depth': [3, 5],
-        'learning_rate': [0.01, 0.1],
-        'scale_pos_weight': [scale_pos_weight]
-    }
+    param_grid = dict(PARAM_GRID, scale_pos_weight=[scale_pos_weight])
 
     model = XGBClassifier(
         eval_metric='logloss',
         random_state=42,
+        n_jobs=xgb_threads,
+        **model_params
     )
 
-    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-
     grid = GridSearchCV(
         estimator=model,
         param_grid=param_grid,
         cv=cv,
         scoring='accuracy',
         verbose=1,
-        n_jobs=-1
+        n_jobs=n_jobs
     )
 
-    grid.fit(X_train, y_train)
+    grid.fit(X_train, y_train, groups=groups)
 
-    model = grid.best_estimator_
     print("best parameters:", grid.best_params_)
+    return grid.best_estimator_
+
+def _neighbourhood(previous: dict, grid: dict) -> list:
+    """
+    the previous best params plus every candidate that changes exactly one of them
+
+    :param previous: dict, best params from the last training
+    :param grid: dict, param name -> candidate values
+    :return: list of single-candidate param grids
+    """
+    seed = {name: [previous.get(name, values[0])] for name, values in grid.items()}
+    candidates = [seed]
+    for name, values in grid.items():
+        for value in values:
+            if value != seed[name][0]:
+                candidates.append(dict(seed, **{name: [value]}))
+    return candidates
+
+def _early_stopped_fit(params: dict, X_train, y_train, groups=None, max_estimators: int = 100,
+                       xgb_threads=None, **model_params):
+    """
+    picks the number of trees by early stopping on a held-out validation fold,
+    then refits on all training rows with that many trees
+
+    :param params: dict, XGBClassifier params without n_estimators
+    :param X_train: DataFrame, training features
+    :param y_train: Series, binary over target
+    :param groups: optional array, game index per row, the latest games validate; defaults to row order
+    :param max_estimators: int, most trees to try
+    :param xgb_threads: optional int, threads per xgboost fit
+    :param model_params: extra XGBClassifier arguments
+    :return: tuple of (fitted XGBClassifier, number of trees)
+    """
+    order = np.asarray(groups) if groups is not None else np.arange(len(X_train))
+    fit_rows, val_rows = chronological_split(order)
+
+    probe = XGBClassifier(eval_metric='logloss', random_state=42, n_jobs=xgb_threads, n_estimators=max_estimators,
+                          early_stopping_rounds=10, **params, **model_params)
+    probe.fit(X_train.iloc[fit_rows], y_train.iloc[fit_rows],
+              eval_set=[(X_train.iloc[val_rows], y_train.iloc[val_rows])], verbose=False)
+    n_estimators = probe.best_iteration + 1
+
+    model = XGBClassifier(eval_metric='logloss', random_state=42, n_jobs=xgb_threads, n_estimators=n_estimators,
+                          **params, **model_params)
+    model.fit(X_train, y_train)
+    return model, n_estimators
+
+def _halving_search(X_train, y_train, cv, groups=None, previous: dict = None, n_jobs=-1, xgb_threads=None,
+                    **model_params):
+    """
+    successive halving over tree depth and learning rate, with trees as the budget
+
+    every candidate starts with a quarter of the trees and only the better half moves on to
+    the next round with twice as many. the tree count is then chosen by early stopping.
+
+    :param X_train: DataFrame, training features
+    :param y_train: Series, binary over target
+    :param cv: cross-validation splitter
+    :param groups: optional array, group labels for group-aware splitters
+    :param previous: optional dict, last best params, narrows the search to their neighbourhood
+    :param n_jobs: int, parallel search fits, -1 for all cores
+    :param xgb_threads: optional int, threads per xgboost fit
+    :param model_params: extra XGBClassifier arguments
+    :return: tuple of (fitted XGBClassifier, best params)
+    """
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV
+
+    scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
+    grid = {name: values for name, values in PARAM_GRID.items() if name != 'n_estimators'}
+    param_grid = _neighbourhood(previous, grid) if previous else grid
+    max_estimators = max(PARAM_GRID['n_estimators'])
+
+    model = XGBClassifier(
+        eval_metric='logloss',
+        random_state=42,
+        n_jobs=xgb_threads,
+        scale_pos_weight=scale_pos_weight,
+        **model_params
+    )
+
+    search = HalvingGridSearchCV(
+        estimator=model,
+        param_grid=param_grid,
+        cv=cv,
+        scoring='accuracy',
+        resource='n_estimators',
+        max_resources=max_estimators,
+        min_resources='exhaust',
+        factor=2,
+        # the final model is refit below with an early-stopped tree count
+        refit=False,
+        verbose=1,
+        n_jobs=n_jobs
+    )
+    search.fit(X_train, y_train, groups=groups)
+    print("best parameters:", search.best_params_)
+
+    params = dict(search.best_params_, scale_pos_weight=scale_pos_weight)
+    params.pop('n_estimators', None)
+    model, n_estimators = _early_stopped_fit(params, X_train, y_train, groups, max_estimators, xgb_threads, **model_params)
+    return model, dict(search.best_params_, n_estimators=n_estimators)
+
+def params_path(slot: str) -> str:
+    # best params and training size, kept per registry slot so every line has its own
+    return slot_file(slot, 'search_params.json')
+
+def load_params(slot: str):
+    """
+    :param slot: str, registry slot key of the model, from slot_key
+    :return: dict with 'params' and 'rows', or None if no params were recorded for the slot
+    """
+    path = params_path(slot)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _save_params(slot: str, params: dict, rows: int, search: str):
+    write_json(params_path(slot), {
+        'params': params,
+        'rows': rows,
+        'search': search,
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+
+@timed('search')
+def _fit(X_train, y_train, cv, slot: str, search: str = 'grid', groups=None, threads=None, **model_params):
+    """
+    fits an over/under model, with a search whose cost follows how much the data changed
+
+    'grid' runs the full grid search. 'halving' compares the training rows with the last run
+    recorded for the model's registry slot: under REUSE_DELTA growth it refits the previous params, under
+    LOCAL_SEARCH_DELTA it halves over their neighbourhood, otherwise over the whole grid.
+
+    :param X_train: DataFrame, training features
+    :param y_train: Series, binary over target
+    :param cv: cross-validation splitter
+    :param slot: str, registry slot key of the model, its search state is kept per slot
+    :param search: str, 'grid' or 'halving'
+    :param groups: optional array, group labels for group-aware splitters
+    :param threads: optional int, total threads to use, None for all cores
+    :param model_params: extra XGBClassifier arguments
+    :return: fitted XGBClassifier
+    """
+    thread_params = _thread_params(threads)
+    if search == 'grid':
+        model = _grid_search(X_train, y_train, cv, groups=groups, **thread_params, **model_params)
+        # record the winner so a later halving run can start from it
+        best = model.get_params()
+        _save_params(slot, {name: best[name] for name in PARAM_GRID}, len(X_train), search)
+        return model
+    if search != 'halving':
+        raise ValueError(f"Unknown search mode: {search}")
+
+    previous = load_params(slot)
+    rows = len(X_train)
+    delta = abs(rows - previous['rows']) / max(previous['rows'], 1) if previous else None
+
+    if previous and delta < REUSE_DELTA:
+        print(f"training rows changed by {delta:.0%}, reusing parameters: {previous['params']}")
+        params = previous['params']
+        scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
+        model = XGBClassifier(eval_metric='logloss', random_state=42, n_jobs=thread_params.get('xgb_threads'),
+                              scale_pos_weight=scale_pos_weight, **params, **model_params)
+        model.fit(X_train, y_train)
+        mode = 'reuse'
+    else:
+        local = previous['params'] if previous and delta < LOCAL_SEARCH_DELTA else None
+        model, params = _halving_search(X_train, y_train, cv, groups=groups, previous=local,
+                                        **thread_params, **model_params)
+        mode = 'local' if local else 'halving'
+
+    _save_params(slot, params, rows, mode)
+    return model
+
+@timed('model_save')
+def save_model(model, model_path: str, export: bool = True):
+    """
+    writes a model through a temp file so readers never load a half-written pickle
+
+    :param model: fitted model
+    :param model_path: str, destination path
+    :param export: bool, also write the compiled .npz that predictions load instead of the pickle
+    """
+    with atomic_write(model_path) as tmp_path:
+        joblib.dump(model, tmp_path)
+    if export:
+        export_model(model, compiled_path(model_path))
+
+def line_grid(values: pd.Series, n_lines: int = 9) -> np.ndarray:
+    """
+    half-point lines spanning the middle of a stat's distribution, like a book would post
+
+    :param values: Series, the stat's historical values
+    :param n_lines: int, how many quantiles to place lines at
+    :return: sorted array of unique lines
+    """
+    quantiles = np.quantile(values, np.linspace(0.1, 0.9, n_lines))
+    return np.unique(np.floor(quantiles) + 0.5)
+
+@timed('features')
+def build_multiline_training_data(player_data: pd.DataFrame, stat_expr: str, games=10, n_lines: int = 9):
+    """
+    builds training rows where the line is a feature, so one model prices any line
+
+    every game is repeated once per line in line_grid with LINE set and the target
+    recomputed against that line
+
+    :param player_data: DataFrame, chronologically sorted game log
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param games: int, number of games to use for rolling averages
+    :param n_lines: int, number of lines per game
+    :return: tuple of (features DataFrame with LINE, target Series, game index per row)
+    """
+    features = feature_frame(player_data, stat_expr, games)
+    next_value = player_data.eval(stat_expr).shift(-1)
+
+    keep = features.notna().all(axis=1) & next_value.notna()
+    features = features[keep]
+    next_value = next_value[keep].to_numpy()
+    lines = line_grid(next_value, n_lines)
+
+    # one row per (game, line)
+    X = features.loc[features.index.repeat(len(lines))].reset_index()
+    game_index = X.pop('index').to_numpy()
+    X[LINE_FEATURE] = np.tile(lines, len(features))
+    y = pd.Series((np.repeat(next_value, len(lines)) > X[LINE_FEATURE].to_numpy()).astype(int), name='OVER_TARGET')
+    return X, y, game_index
+
+def _registered(player_name: str, stat_expr: str, line, games: int, force_retrain: bool):
+    """
+    registry identity of a training run, and the registered model trained on the same data if any
+
+    :return: tuple of (player id, data hash, version entry or None)
+    """
+    player_id = player_key(player_name)
+    data_hash = player_data_hash(player_name)
+    entry = None if force_retrain else lookup(player_id, stat_expr, line, games, data_hash=data_hash)
+    return player_id, data_hash, entry
+
+def _register(model, player_id, stat_expr: str, line, games: int, player_data: pd.DataFrame, data_hash: str,
+              accuracy: float, rows: int) -> dict:
+    best = model.get_params()
+    return register_model(
+        model, player_id, stat_expr, line, games,
+        seasons=player_data['SEASON'].unique().tolist() if 'SEASON' in player_data else [],
+        data_hash=data_hash,
+        metrics={'accuracy': round(float(accuracy), 4), 'train_rows': rows},
+        params={name: best[name] for name in PARAM_GRID},
+    )
+
+def multiline_model_path(player_name: str, stat_expr: str) -> str:
+    file_safe_name = player_name.replace(" ", "_")
+    return f"../models/{file_safe_name}_{stat_expr.replace('+', '_')}_multiline_model.pkl"
+
+def generate_multiline_model(player_name: str, stat_expr: str, games=10, n_lines: int = 9, force_retrain=False, threads=None,
+                             search='grid'):
+    """
+    trains one over/under model for a player and stat expression that answers any line
+
+    the line is an input feature with a monotone constraint, so the probability of going
+    over never increases as the line goes up
+
+    :param player_name: str, full player name like 'LeBron James'
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param games: int, number of games to use for rolling averages
+    :param n_lines: int, number of training lines per game
+    :param force_retrain: bool, retrain even if a model for the same data is registered
+    :param threads: optional int, total threads to use, None for all cores
+    :param search: str, 'grid' for the full grid search, 'halving' for the warm-started halving search
+    :return: str, path to the registered model version
+    """
+    model_path = multiline_model_path(player_name, stat_expr)
+
+    # skip if a model trained on exactly this data is registered
+    player_id, data_hash, entry = _registered(player_name, stat_expr, None, games, force_retrain)
+    if entry is not None:
+        print(f"model for the current data already registered: {entry['model_path']}, skipping retrain.")
+        return entry['model_path']
+
+    player_data = read_player_log(player_name, log_columns(stat_expr))
+    X, y, game_index = build_multiline_training_data(player_data, stat_expr, games, n_lines)
+    X = X.astype('float32')
+
+    # hold out the latest games, a game's lines always stay on one side
+    train_rows, test_rows = chronological_split(game_index)
+    X_train, X_test = X.iloc[train_rows], X.iloc[test_rows]
+    y_train, y_test = y.iloc[train_rows], y.iloc[test_rows]
+
+    model = _fit(
+        X_train, y_train,
+        cv=time_series_folds(game_index[train_rows]),
+        slot=slot_key(player_id, stat_expr, None, games),
+        search=search,
+        groups=game_index[train_rows],
+        threads=threads,
+        monotone_constraints={LINE_FEATURE: -1}
+    )
+
+    # predict and evaluate model on test set
+    y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print(f"\naccuracy for {player_name} ({stat_expr}, lines {X[LINE_FEATURE].min()}-{X[LINE_FEATURE].max()}): {accuracy:.2f}")
+    print(classification_report(y_test, y_pred, zero_division=0))
+
+    save_model(model, model_path)
+    print(f"model saved to: {model_path}")
+    entry = _register(model, player_id, stat_expr, None, games, player_data, data_hash, accuracy, len(X_train))
+    return entry['model_path']
+
+def _thread_params(threads):
+    """
+    grid search and xgboost thread settings for a thread budget
+
+    with a budget, grid search fits run one at a time and xgboost gets the threads,
+    so several trainings can share a machine without oversubscribing it
+
+    :param threads: optional int, total threads, None for all cores
+    :return: dict of keyword arguments for _grid_search
+    """
+    if threads is None:
+        return {}
+    return {'n_jobs': 1, 'xgb_threads': threads}
+
+def generate_player_model(player_name: str, line: float, stat_expr: str, games=10, force_retrain=False, threads=None,
+                          search='grid'):
+    """
+    trains a binary over/under model for a given player and stat expression
+
+    :param player_name: str, full player name like 'LeBron James'
+    :param line: float, over/under line to model
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param season: str, e.g. '2024-25'
+    :param games: int, number of games to use for rolling averages
+    :param force_retrain: bool, retrain even if a model for the same data is registered
+    :param threads: optional int, total threads to use, None for all cores
+    :param search: str, 'grid' for the full grid search, 'halving' for the warm-started halving search
+    :return: str, path to the registered model version
+    """
+    file_safe_name = player_name.replace(" ", "_")
+    model_path = f"../models/{file_safe_name}_{stat_expr.replace('+', '_')}_model.pkl"
+
+    # skip if a model for this line, window and exact data is registered
+    player_id, data_hash, entry = _registered(player_name, stat_expr, line, games, force_retrain)
+    if entry is not None:
+        print(f"model for the current data already registered: {entry['model_path']}, skipping retrain.")
+        return entry['model_path']
+
+    # load the columns the features need, stored sorted chronologically with parsed dates
+    player_data = read_player_log(player_name, log_columns(stat_expr))
+
+    X, y = build_training_data(player_data, stat_expr, line, games)
+
+    # split into training and testing sets, testing on the latest games
+    train_rows, test_rows = chronological_split(np.arange(len(X)))
+    X_train, X_test = X.iloc[train_rows], X.iloc[test_rows]
+    y_train, y_test = y.iloc[train_rows], y.iloc[test_rows]
+
+    X_train = X_train.select_dtypes(include=['number']).astype('float32')
+    X_test = X_test.select_dtypes(include=['number']).astype('float32')
+    y_train = y_train.loc[X_train.index]
+    y_test = y_test.loc[X_test.index]
+
+    # initialize and train random forest classifier
+    # model = RandomForestClassifier(class_weight='balanced',random_state=42)
+    # model.fit(X_train, y_train)
+
+    cv = time_series_folds(np.arange(len(X_train)))
+    model = _fit(X_train, y_train, cv, slot_key(player_id, stat_expr, line, games), search=search, threads=threads)
 
     # predict and evaluate model on test set
     y_pred = model.predict(X_test)
-    print(f"\naccuracy for {player_name} ({stat_expr} > {line}): {accuracy_score(y_test, y_pred):.2f}")
+    accuracy = accuracy_score(y_test, y_pred)
+    print(f"\naccuracy for {player_name} ({stat_expr} > {line}): {accuracy:.2f}")
     print(classification_report(y_test, y_pred, zero_division=0))
 
     # save model
     model_path = f"../models/{file_safe_name}_{stat_expr.replace('+', '_')}_model.pkl"
-    joblib.dump(model, model_path)
-    print(f"model saved to: {model_path}")
\ No newline at end of file
+    save_model(model, model_path)
+    print(f"model saved to: {model_path}")
+    entry = _register(model, player_id, stat_expr, line, games, player_data, data_hash, accuracy, len(X_train))
+    return entry['model_path']
\ No newline at end of file
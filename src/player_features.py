@@ -0,0 +1,285 @@
+import numpy as np
+import pandas as pd
+from atomic_write import atomic_write
+from schema import BOX_SCORE_STATS
+
+# box score stats used as features, raw from the last game and as rolling averages
+BASE_STATS = [
+    'MIN', 'FGA', 'FG3A', 'FTA', 'REB', 'AST', 'TOV',
+    'FGM', 'FG3M', 'FTM', 'FG_PCT', 'FG3_PCT', 'FT_PCT',
+    'OREB', 'DREB'
+]
+
+# per-game derived stats averaged alongside the base stats
+DERIVED_STATS = ['AST_TOV_ratio']
+ROLLING_STATS = BASE_STATS + DERIVED_STATS
+
+# stats commonly used in stat_expr that aren't base features
+EXTRA_STATS = ['PTS', 'STL', 'BLK']
+
+def stat_parts(stat_expr: str) -> list:
+    """
+    :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+    :return: list of the stats summed in the expression
+    """
+    return [s.strip() for s in stat_expr.split('+')]
+
+def check_stat_expr(stat_expr: str) -> list:
+    """
+    :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+    :return: list of the stats summed in the expression
+    :raises ValueError: if a stat isn't a box score column of the game log
+    """
+    parts = stat_parts(stat_expr)
+    unknown = [s for s in parts if s not in BOX_SCORE_STATS]
+    if unknown:
+        raise ValueError(f"Unknown stat {', '.join(unknown)} in '{stat_expr}', "
+                         f"expected a sum of {', '.join(BOX_SCORE_STATS)}")
+    return parts
+
+def feature_columns(stat_expr: str) -> list:
+    """
+    model input columns for a stat expression, in training order
+
+    :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+    :return: list of feature names
+    """
+    custom_rolling = [f"{stat}_avg" for stat in ROLLING_STATS]
+    rolling_features = [f"{stat}_avg" for stat in stat_parts(stat_expr)]
+    return pd.Index(BASE_STATS + custom_rolling + rolling_features).unique().tolist()
+
+def _rolling_inputs(stat_expr: str = None) -> list:
+    """
+    stats that need a rolling average for the given expression
+
+    :param stat_expr: optional str, adds the expression's components
+    :return: list of stat names
+    """
+    columns = ROLLING_STATS + [s for s in EXTRA_STATS if s not in ROLLING_STATS]
+    if stat_expr:
+        columns += [s for s in check_stat_expr(stat_expr) if s not in columns]
+    return columns
+
+# every stat a RollingState tracks, so one state answers any stat expression
+STATE_STATS = _rolling_inputs() + [s for s in BOX_SCORE_STATS if s not in _rolling_inputs()]
+
+def log_columns(stat_expr: str = None) -> list:
+    """
+    game log columns the features and target of a stat expression are computed from
+
+    :param stat_expr: optional str, adds the expression's components
+    :return: list of column names, with GAME_DATE and SEASON for ordering and metadata
+    """
+    inputs = [c for c in _rolling_inputs(stat_expr) if c not in DERIVED_STATS]
+    # AST_TOV_ratio is built from both
+    return list(dict.fromkeys(['GAME_DATE', 'SEASON'] + inputs + ['AST', 'TOV']))
+
+def stat_block(player_data: pd.DataFrame, columns: list) -> np.ndarray:
+    """
+    2-D float array of per-game stats, computing derived stats on the way
+
+    stats are read as stored, the store coerced them to numbers when they were ingested
+
+    :param player_data: DataFrame, chronologically sorted game log
+    :param columns: list of stat names, may include derived stats
+    :return: array (n_games x n_columns)
+    """
+    block = np.empty((len(player_data), len(columns)))
+    for j, column in enumerate(columns):
+        if column == 'AST_TOV_ratio':
+            # assist/turnover ratio per game, averaged like every other stat
+            block[:, j] = player_data['AST'].to_numpy(float) / (player_data['TOV'].to_numpy(float) + 1e-5)
+        else:
+            block[:, j] = player_data[column].to_numpy(float)
+    return block
+
+def rolling_means(block: np.ndarray, games: int, position: np.ndarray = None) -> np.ndarray:
+    """
+    trailing means over `games` rows for every column at once, via cumulative sums
+
+    matches pandas rolling(games).mean(): a window that is short or holds a NaN gives NaN.
+
+    :param block: array (n_rows x n_columns)
+    :param games: int, window length
+    :param position: optional int array, each row's index within its own player's log,
+                     so windows never cross from one player into the next
+    :return: array (n_rows x n_columns)
+    """
+    n_rows, n_columns = block.shape
+    valid = ~np.isnan(block)
+    zeros = np.zeros((1, n_columns))
+    sums = np.vstack([zeros, np.cumsum(np.where(valid, block, 0.0), axis=0)])
+    nan_counts = np.vstack([zeros, np.cumsum(~valid, axis=0)])
+
+    means = np.full(block.shape, np.nan)
+    if n_rows >= games:
+        window_sums = sums[games:] - sums[:-games]
+        window_nans = nan_counts[games:] - nan_counts[:-games]
+        means[games - 1:] = np.where(window_nans == 0, window_sums / games, np.nan)
+
+    if position is not None:
+        means[position < games - 1] = np.nan
+    return means
+
+def feature_frame(player_data: pd.DataFrame, stat_expr: str, games: int = 10, group: str = None) -> pd.DataFrame:
+    """
+    model features as of the end of every game, in one vectorized pass
+
+    row t holds the features used to predict the game after t: raw stats from game t
+    and rolling averages over games t-games+1..t.
+
+    :param player_data: DataFrame, game log sorted chronologically (within each group)
+    :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+    :param games: int, number of games in the rolling window
+    :param group: optional column, e.g. 'PLAYER_ID', when several players' logs are stacked
+    :return: DataFrame with feature_columns(stat_expr), aligned to player_data's index
+    """
+    columns = _rolling_inputs(stat_expr)
+    block = stat_block(player_data, columns)
+
+    position = None
+    if group is not None:
+        position = player_data.groupby(group, sort=False).cumcount().to_numpy()
+    means = rolling_means(block, games, position)
+
+    features = pd.DataFrame(block[:, :len(BASE_STATS)], columns=BASE_STATS, index=player_data.index)
+    averages = pd.DataFrame(means, columns=[f"{c}_avg" for c in columns], index=player_data.index)
+    features = pd.concat([features, averages], axis=1)
+    return features[feature_columns(stat_expr)]
+
+def latest_features(player_data: pd.DataFrame, stat_expr: str, games: int = 10, player_name: str = None) -> dict:
+    """
+    features for a player's next game from their most recent games
+
+    :param player_data: DataFrame, chronologically sorted game log
+    :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+    :param games: int, number of games in the rolling window
+    :param player_name: optional str, used in error messages
+    :return: dict of feature name -> value
+    """
+    recent_games = player_data.tail(games)
+    if len(recent_games) < games:
+        raise ValueError(f"Not enough recent games for {player_name} (need at least {games})")
+    return feature_frame(recent_games, stat_expr, games).iloc[-1].to_dict()
+
+class RollingState:
+    """
+    incremental rolling-window state for one player.
+
+    keeps the last `games` rows in a ring buffer with running sums, so adding a game
+    costs O(n_stats) however long the player's history is. it tracks every box score
+    stat in the log, so one state per player and window answers any stat expression.
+    """
+
+    def __init__(self, games: int = 10, columns=None):
+        self.games = games
+        self.columns = list(columns if columns is not None else STATE_STATS)
+        self.count = 0
+        self.last_game_id = None
+        self._index = {c: j for j, c in enumerate(self.columns)}
+        self._buffer = np.full((games, len(self.columns)), np.nan)
+        self._sums = np.zeros(len(self.columns))
+        # empty slots count as missing until the window fills
+        self._nans = np.full(len(self.columns), games)
+        self._next = 0
+        self._last = np.full(len(self.columns), np.nan)
+
+    @classmethod
+    def from_log(cls, player_data: pd.DataFrame, games: int = 10):
+        """
+        builds state from the tail of a stored game log
+
+        :param player_data: DataFrame, chronologically sorted game log
+        :param games: int, number of games in the rolling window
+        :return: RollingState tracking the STATE_STATS the log has
+        """
+        columns = [c for c in STATE_STATS
+                   if c in player_data or (c == 'AST_TOV_ratio' and {'AST', 'TOV'} <= set(player_data))]
+        state = cls(games, columns)
+        state.extend(player_data.tail(games))
+        state.count = len(player_data)
+        return state
+
+    def extend(self, player_data: pd.DataFrame) -> None:
+        """
+        adds games in order, the rows of a log newer than every game already added
+
+        :param player_data: DataFrame, chronologically sorted new games
+        """
+        for row in stat_block(player_data, self.columns):
+            self._push(row)
+        self.count += len(player_data)
+        if 'Game_ID' in player_data and len(player_data):
+            self.last_game_id = str(player_data['Game_ID'].iloc[-1])
+
+    def update(self, game) -> None:
+        """
+        adds one game, a dict or Series of box score stats
+
+        :param game: dict or Series with the tracked stats
+        """
+        self.extend(pd.DataFrame([dict(game)]))
+
+    def _push(self, row: np.ndarray):
+        old = self._buffer[self._next]
+        old_nan = np.isnan(old)
+        self._sums -= np.where(old_nan, 0.0, old)
+        self._nans -= old_nan
+
+        new_nan = np.isnan(row)
+        self._sums += np.where(new_nan, 0.0, row)
+        self._nans += new_nan
+        self._buffer[self._next] = row
+        self._next = (self._next + 1) % self.games
+        self._last = row
+
+        if self._next == 0:
+            # resum once per lap so the running sums never drift from the window's values
+            self._sums = np.where(np.isnan(self._buffer), 0.0, self._buffer).sum(axis=0)
+
+    def features(self, stat_expr: str, player_name: str = None) -> dict:
+        """
+        features for the next game, the same as latest_features on the full log
+
+        :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+        :param player_name: optional str, used in error messages
+        :return: dict of feature name -> value
+        """
+        untracked = [s for s in check_stat_expr(stat_expr) if s not in self._index]
+        if untracked:
+            raise ValueError(f"Game log of {player_name} has no {', '.join(untracked)}, refetch the player to add it")
+        if self.count < self.games:
+            raise ValueError(f"Not enough recent games for {player_name} (need at least {self.games})")
+
+        means = np.where(self._nans == 0, self._sums / self.games, np.nan)
+        values = {stat: self._last[self._index[stat]] for stat in BASE_STATS}
+        for stat in self.columns:
+            values[f"{stat}_avg"] = means[self._index[stat]]
+        return {name: float(values[name]) for name in feature_columns(stat_expr)}
+
+    @property
+    def nbytes(self) -> int:
+        return self._buffer.nbytes + self._sums.nbytes + self._nans.nbytes + self._last.nbytes
+
+    def save(self, path: str):
+        with atomic_write(path, suffix='.npz') as tmp_path:
+            np.savez(tmp_path, games=self.games, columns=np.array(self.columns), count=self.count,
+                     last_game_id=np.array(self.last_game_id or ''), buffer=self._buffer, sums=self._sums,
+                     nans=self._nans, next=self._next, last=self._last)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        :param path: str, file written by save
+        :return: RollingState
+        """
+        with np.load(path) as stored:
+            state = cls(int(stored['games']), stored['columns'].tolist())
+            state.count = int(stored['count'])
+            state.last_game_id = str(stored['last_game_id']) or None
+            state._buffer = stored['buffer']
+            state._sums = stored['sums']
+            state._nans = stored['nans']
+            state._next = int(stored['next'])
+            state._last = stored['last']
+        return state
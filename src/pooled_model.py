@@ -0,0 +1,306 @@
+import argparse
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import joblib
+from xgboost import XGBClassifier
+from sklearn.metrics import accuracy_score, log_loss
+
+from game_log_store import read_all_logs, read_player_log, store_data_hash
+from model_registry import register_model, lookup
+from player_features import BASE_STATS, ROLLING_STATS, EXTRA_STATS, stat_parts, stat_block, rolling_means
+from over_under_model import LINE_FEATURE, save_model
+
+POOLED_MODEL_PATH = '../models/pooled_over_under_model.pkl'
+DEFAULT_STAT_EXPRS = ['PTS', 'REB', 'AST', 'PTS+REB+AST']
+
+# stats a pooled stat expression can be built from, each gets an indicator feature
+INDICATOR_STATS = ['PTS', 'REB', 'AST', 'STL', 'BLK', 'FG3M', 'TOV']
+
+# lines in the training data, as multiples of the player's rolling average
+LINE_SCALES = np.linspace(0.6, 1.4, 9)
+
+AVERAGED_STATS = ROLLING_STATS + [s for s in EXTRA_STATS if s not in ROLLING_STATS]
+CONTEXT_FEATURES = ['EXPR_avg', 'EXPR_season_avg', 'GAMES_PLAYED', 'HOME', 'OPP_RESIDUAL']
+POOLED_FEATURES = (BASE_STATS + [f"{s}_avg" for s in AVERAGED_STATS] + CONTEXT_FEATURES
+                   + [f"STAT_{s}" for s in INDICATOR_STATS] + [LINE_FEATURE])
+
+# game log columns the pooled features are computed from
+LOG_COLUMNS = list(dict.fromkeys(BASE_STATS + EXTRA_STATS + INDICATOR_STATS + ['GAME_DATE', 'MATCHUP', 'SEASON']))
+
+def parse_matchup(matchup: pd.Series):
+    """
+    home flag and opponent from nba_api matchups like 'LAL vs. BOS' (home) or 'LAL @ BOS' (away)
+
+    :param matchup: Series of matchup strings
+    :return: tuple of (home float array, opponent Series)
+    """
+    home = matchup.str.contains('vs.', regex=False).astype(float).where(matchup.notna())
+    return home.to_numpy(), matchup.str.split().str[-1]
+
+def _check_stat_expr(stat_expr: str):
+    unknown = [s for s in stat_parts(stat_expr) if s not in INDICATOR_STATS]
+    if unknown:
+        raise ValueError(f"Pooled model can't price {stat_expr}: {unknown} not in {INDICATOR_STATS}")
+
+def player_context(logs: pd.DataFrame, stat_expr: str, games: int = 10) -> pd.DataFrame:
+    """
+    pooled features as of the end of every game, for several players' logs stacked together
+
+    :param logs: DataFrame with a PLAYER_ID column, each player's games contiguous and oldest first
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param games: int, number of games in the rolling window
+    :return: DataFrame of every pooled feature except HOME, OPP_RESIDUAL and LINE, aligned to logs
+    """
+    _check_stat_expr(stat_expr)
+    block = stat_block(logs, AVERAGED_STATS)
+    position = logs.groupby('PLAYER_ID', sort=False).cumcount().to_numpy()
+    means = rolling_means(block, games, position)
+
+    context = pd.DataFrame(block[:, :len(BASE_STATS)], columns=BASE_STATS, index=logs.index)
+    averages = pd.DataFrame(means, columns=[f"{s}_avg" for s in AVERAGED_STATS], index=logs.index)
+    context = pd.concat([context, averages], axis=1)
+
+    parts = stat_parts(stat_expr)
+    context['EXPR_avg'] = context[[f"{s}_avg" for s in parts]].sum(axis=1, skipna=False)
+
+    # season-to-date average, a steadier read on the player than the rolling window
+    value = logs.eval(stat_expr)
+    season = logs.groupby(['PLAYER_ID', 'SEASON'], sort=False, observed=True)
+    context['EXPR_season_avg'] = value.groupby([logs['PLAYER_ID'], logs['SEASON']], sort=False, observed=True).cumsum() / (season.cumcount() + 1)
+    context['GAMES_PLAYED'] = position + 1
+
+    for stat in INDICATOR_STATS:
+        context[f"STAT_{stat}"] = float(stat in parts)
+    return context
+
+def opponent_residuals(opponent: pd.Series, game_date: pd.Series, residual: pd.Series) -> pd.Series:
+    """
+    how much players beat their rolling average against each opponent, using only earlier dates
+
+    :param opponent: Series, opponent of each game
+    :param game_date: Series, date of each game
+    :param residual: Series, stat value minus the player's rolling average going into the game
+    :return: Series aligned to the inputs, NaN before an opponent's first game
+    """
+    games = pd.DataFrame({'OPP': opponent, 'DATE': game_date, 'RESIDUAL': residual}).dropna()
+    daily = games.groupby(['OPP', 'DATE'])['RESIDUAL'].agg(['sum', 'count']).reset_index()
+
+    # totals over strictly earlier dates, so same-day games never see each other
+    totals = daily.groupby('OPP')[['sum', 'count']].cumsum()
+    daily['PRIOR'] = (totals['sum'] - daily['sum']) / (totals['count'] - daily['count']).replace(0, np.nan)
+
+    lookup = pd.DataFrame({'OPP': opponent, 'DATE': game_date})
+    return lookup.merge(daily[['OPP', 'DATE', 'PRIOR']], on=['OPP', 'DATE'], how='left')['PRIOR'].set_axis(opponent.index)
+
+def build_pooled_training_data(logs: pd.DataFrame, stat_exprs=DEFAULT_STAT_EXPRS, games: int = 10):
+    """
+    training rows for every player, stat expression and line at once
+
+    row t pairs the features after game t and the context of game t+1 (home, opponent)
+    with whether game t+1 went over, repeated for lines around the player's rolling average
+
+    :param logs: DataFrame from read_all_logs, each player's games oldest first
+    :param stat_exprs: list of stat expressions to train on
+    :param games: int, number of games in the rolling window
+    :return: tuple of (features DataFrame, target Series, date of the predicted game per row)
+    """
+    by_player = logs.groupby('PLAYER_ID', sort=False)
+    home, opponent = parse_matchup(logs['MATCHUP'])
+    next_home = pd.Series(home, index=logs.index).groupby(logs['PLAYER_ID'], sort=False).shift(-1)
+    next_opponent = opponent.groupby(logs['PLAYER_ID'], sort=False).shift(-1)
+    next_date = by_player['GAME_DATE'].shift(-1)
+
+    X_parts, y_parts, date_parts = [], [], []
+    for stat_expr in stat_exprs:
+        context = player_context(logs, stat_expr, games)
+        next_value = logs.eval(stat_expr).groupby(logs['PLAYER_ID'], sort=False).shift(-1)
+
+        context['HOME'] = next_home
+        context['OPP_RESIDUAL'] = opponent_residuals(next_opponent, next_date, next_value - context['EXPR_avg'])
+
+        keep = context['EXPR_avg'].notna() & next_value.notna()
+        context, next_value, dates = context[keep], next_value[keep].to_numpy(), next_date[keep].to_numpy()
+
+        # one row per (game, line), lines spread around the rolling average like a book would post them
+        X = context.loc[context.index.repeat(len(LINE_SCALES))].reset_index(drop=True)
+        X[LINE_FEATURE] = np.floor(np.outer(context['EXPR_avg'].to_numpy(), LINE_SCALES).ravel()) + 0.5
+        X_parts.append(X[POOLED_FEATURES])
+        y_parts.append(np.repeat(next_value, len(LINE_SCALES)) > X[LINE_FEATURE].to_numpy())
+        date_parts.append(np.repeat(dates, len(LINE_SCALES)))
+
+    X = pd.concat(X_parts, ignore_index=True).astype('float32')
+    y = pd.Series(np.concatenate(y_parts).astype(int), name='OVER_TARGET')
+    return X, y, np.concatenate(date_parts)
+
+def pooled_slot(stat_exprs=DEFAULT_STAT_EXPRS) -> str:
+    """
+    registry stat_expr of a pooled model, the expressions it was trained on
+
+    :param stat_exprs: list of stat expressions
+    :return: str, like 'PTS,REB,AST,PTS+REB+AST'
+    """
+    return ','.join(stat_exprs)
+
+def pooled_model_path(stat_exprs=DEFAULT_STAT_EXPRS, games: int = 10) -> str:
+    """
+    newest registered pooled model, or the unversioned model file if none is registered
+
+    :param stat_exprs: list of stat expressions the model was trained on
+    :param games: int, number of games in the rolling window
+    :return: str, path to the model
+    """
+    entry = lookup('league', pooled_slot(stat_exprs), games=games, family='pooled')
+    return entry['model_path'] if entry is not None else POOLED_MODEL_PATH
+
+def train_pooled_model(stat_exprs=DEFAULT_STAT_EXPRS, games: int = 10, model_path: str = POOLED_MODEL_PATH, threads=None) -> str:
+    """
+    trains one over/under model on every stored player's games
+
+    the last 20% of dates are held out for evaluation, so the reported accuracy is on
+    games the model never saw players play. the model is saved to model_path and
+    registered as a new version of the pooled slot for these stat expressions
+
+    :param stat_exprs: list of stat expressions the model can price
+    :param games: int, number of games in the rolling window
+    :param model_path: str, where the artifact is saved
+    :param threads: optional int, xgboost threads, None for all cores
+    :return: str, path to the registered model
+    """
+    data_hash = store_data_hash()
+    logs = read_all_logs(columns=LOG_COLUMNS)
+    X, y, dates = build_pooled_training_data(logs, stat_exprs, games)
+    print(f"pooled training data: {len(X)} rows from {logs['PLAYER_ID'].nunique()} players")
+
+    days = dates.astype('datetime64[D]').astype('int64')
+    cutoff = np.quantile(days, 0.8)
+    train = days <= cutoff
+
+    model = XGBClassifier(
+        n_estimators=300,
+        max_depth=5,
+        learning_rate=0.05,
+        eval_metric='logloss',
+        random_state=42,
+        n_jobs=threads,
+        monotone_constraints={LINE_FEATURE: -1}
+    )
+    model.fit(X[train], y[train])
+
+    proba = model.predict_proba(X[~train])[:, 1]
+    accuracy = accuracy_score(y[~train], proba > 0.5)
+    loss = log_loss(y[~train], proba, labels=[0, 1])
+    print(f"holdout accuracy: {accuracy:.3f}, log loss: {loss:.3f}")
+
+    # opponent context looked up at inference time, from the training dates only so none of
+    # the held out games leak into the artifact
+    _, opponent = parse_matchup(logs['MATCHUP'])
+    in_train = logs['GAME_DATE'].to_numpy().astype('datetime64[D]').astype('int64') <= cutoff
+    opponents = {}
+    for stat_expr in stat_exprs:
+        # residual of game t against the rolling average going into it (after game t-1)
+        expected = player_context(logs, stat_expr, games)['EXPR_avg'].groupby(logs['PLAYER_ID'], sort=False).shift(1)
+        residual = logs.eval(stat_expr) - expected
+        opponents[stat_expr] = residual[in_train].groupby(opponent[in_train]).mean().dropna().to_dict()
+
+    artifact = {
+        'model': model,
+        'games': games,
+        'stat_exprs': list(stat_exprs),
+        'opponent_residuals': opponents,
+    }
+    save_model(artifact, model_path, export=False)
+    print(f"model saved to: {model_path}")
+
+    # versioned copy keyed by the store contents it was trained on
+    entry = register_model(
+        artifact, 'league', pooled_slot(stat_exprs), games=games, family='pooled',
+        seasons=logs['SEASON'].dropna().unique().tolist(),
+        data_hash=data_hash,
+        metrics={'accuracy': round(float(accuracy), 4), 'log_loss': round(float(loss), 4), 'train_rows': int(train.sum())},
+        params={name: model.get_params()[name] for name in ('n_estimators', 'max_depth', 'learning_rate')},
+    )
+    return entry['model_path']
+
+@lru_cache(maxsize=None)
+def load_pooled_model(model_path: str = POOLED_MODEL_PATH) -> dict:
+    return joblib.load(model_path)
+
+def _broadcast(values, n: int) -> list:
+    if isinstance(values, (str, int, float)) or values is None:
+        return [values] * n
+    return list(values)
+
+def predict_many(players, stat_exprs, lines, opponents=None, home=None, model_path: str = None) -> np.ndarray:
+    """
+    probability of going over for a whole slate of props in one predict_proba call
+
+    each player's log is read once, however many props they have. home is required, the
+    model never saw a game without it in training
+
+    :param players: list of full player names, one per prop
+    :param stat_exprs: list of stat expressions, or one for every prop
+    :param lines: list of lines, or one for every prop
+    :param opponents: optional list of opponent abbreviations like 'BOS' for the next game
+    :param home: list of bools, or one for every prop, whether the next game is at home
+    :param model_path: optional str, pooled model artifact, defaults to the newest registered one
+    :return: array of over probabilities, NaN for players without a full rolling window
+    """
+    n = len(players)
+    if home is None or pd.isna(pd.Series(_broadcast(home, n), dtype=object)).any():
+        raise ValueError("home is required for every prop, the pooled model is trained with it")
+
+    artifact = load_pooled_model(model_path or pooled_model_path())
+    props = pd.DataFrame({
+        'player': list(players),
+        'stat_expr': _broadcast(stat_exprs, n),
+        'line': _broadcast(lines, n),
+        'opponent': _broadcast(opponents, n),
+        'home': _broadcast(home, n),
+    })
+
+    # stack every player's log once
+    names = props['player'].unique()
+    logs = pd.concat([read_player_log(name, columns=LOG_COLUMNS).assign(PLAYER_ID=name) for name in names],
+                     ignore_index=True)
+    last_rows = logs.groupby('PLAYER_ID', sort=False).tail(1).index
+
+    rows = []
+    for stat_expr, group in props.groupby('stat_expr', sort=False):
+        latest = player_context(logs, stat_expr, artifact['games']).loc[last_rows]
+        latest.index = logs.loc[last_rows, 'PLAYER_ID']
+        X = latest.loc[group['player']].set_index(group.index)
+        X['HOME'] = group['home'].astype(float)
+        X['OPP_RESIDUAL'] = group['opponent'].map(artifact['opponent_residuals'].get(stat_expr, {})).astype(float)
+        X[LINE_FEATURE] = group['line'].astype(float)
+        rows.append(X)
+    X = pd.concat(rows).loc[props.index, POOLED_FEATURES].astype('float32')
+
+    probabilities = artifact['model'].predict_proba(X)[:, 1]
+    missing = X['EXPR_avg'].isna().to_numpy()
+    if missing.any():
+        print(f"not enough recent games for: {sorted(set(props.loc[missing, 'player']))}")
+    return np.where(missing, np.nan, probabilities)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pooled over/under model across all stored players")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help="train on every player in the game log store")
+    train_parser.add_argument('--stat-exprs', nargs='+', default=DEFAULT_STAT_EXPRS)
+    train_parser.add_argument('--games', type=int, default=10)
+
+    predict_parser = subparsers.add_parser('predict', help="score a slate of props")
+    predict_parser.add_argument('slate', help="csv with player_name, stat_expr, line, home and an optional opponent column")
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        train_pooled_model(args.stat_exprs, args.games)
+    else:
+        slate = pd.read_csv(args.slate)
+        slate['P_OVER'] = predict_many(
+            slate['player_name'], slate['stat_expr'], slate['line'],
+            opponents=slate['opponent'] if 'opponent' in slate else None,
+            home=slate['home'] if 'home' in slate else None,
+        )
+        print(slate.to_string(index=False))
@@ -1,8 +1,91 @@
+import numpy as np
 import pandas as pd
-import joblib
 import os
+from compiled_model import CompiledModel, load_model
+from instrumentation import timed, count
+from game_log_store import player_log_path, read_log_file, player_key
+from model_registry import lookup
+from player_features import latest_features, log_columns
+from over_under_model import LINE_FEATURE
 
-def predict_over_under(player_name: str, stat_expr: str, line: float, games: int = 10) -> float:
+def player_paths(player_name: str, stat_expr: str, multiline: bool = False, line: float = None, games: int = 10) -> tuple:
+    """
+    data and model file paths for a player and stat expression
+
+    a line is priced by the newest registered version for that exact line and window, and
+    by the registered multi-line model of the same window when there is none. the unversioned
+    model files are never used, they hold whichever line or window was trained last
+
+    :param player_name: str, full player name like 'LeBron James'
+    :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+    :param multiline: bool, use the model that takes the line as a feature
+    :param line: optional float, the line being priced
+    :param games: int, rolling window the model was trained with
+    :return: tuple of (data path, model path, multiline), multiline tells whether the model
+             takes the line as a feature
+    :raises FileNotFoundError: if no model with this window is registered
+    """
+    data_path = player_log_path(player_name)
+    model_id = player_key(player_name)
+    if not multiline and line is not None:
+        entry = lookup(model_id, stat_expr, line, games)
+        if entry is not None:
+            return data_path, entry['model_path'], False
+    entry = lookup(model_id, stat_expr, None, games)
+    if entry is not None:
+        return data_path, entry['model_path'], True
+    raise FileNotFoundError(f"No {games}-game model registered for {player_name} {stat_expr}"
+                            + ("" if multiline or line is None else f" at line {line}"))
+
+def load_player_data(data_path: str, columns=None) -> pd.DataFrame:
+    """
+    loads a player's game log sorted chronologically
+
+    :param data_path: str, path to the player's game log from player_paths
+    :param columns: optional list of columns to load, like log_columns(stat_expr)
+    :return: DataFrame of games, oldest first
+    """
+    return read_log_file(data_path, columns)
+
+@timed('features_latest')
+def build_features(player_data: pd.DataFrame, player_name: str, stat_expr: str, games: int = 10) -> dict:
+    """
+    builds the model input for a player's next game from their most recent games
+
+    :param player_data: DataFrame, chronologically sorted game log
+    :param player_name: str, full player name like 'LeBron James'
+    :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+    :param games: int, how many recent games to use for rolling averages
+    :return: dict of feature name -> value
+    """
+    return latest_features(player_data, stat_expr, games, player_name)
+
+@timed('predict')
+def over_probabilities(model, feature_rows: list):
+    """
+    probability of going over for a batch of feature rows with one predict_proba call
+
+    :param model: trained classifier with predict_proba
+    :param feature_rows: list of dicts from build_features
+    :return: array of probabilities of going over the line
+    """
+    # construct input with correct feature order
+    features = list(model.feature_names_in_)
+    count('predicted_rows', len(feature_rows))
+    if isinstance(model, CompiledModel):
+        probs = model.predict_proba(np.array([[row[f] for f in features] for row in feature_rows], dtype=np.float32))
+    else:
+        input_df = pd.DataFrame(feature_rows)[features]
+        probs = model.predict_proba(input_df)
+
+    # handle case where model only trained on one class
+    if probs.shape[1] == 1:
+        only_class = model.classes_[0]
+        print(f"model only trained on one class ({only_class}). using fallback prob.")
+        return probs[:, 0] if only_class == 1 else 1 - probs[:, 0]
+    return probs[:, 1]
+
+def predict_over_under(player_name: str, stat_expr: str, line: float, games: int = 10, multiline: bool = False) -> float:
     """
     predicts the probability that a player will go over a stat line in their next game
 
@@ -10,68 +93,45 @@ def predict_over_under(player_name: str, stat_expr: str, line: float, games: int
     :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
     :param line: float, the over/under line to evaluate
     :param games: int, how many recent games to use for rolling averages
+    :param multiline: bool, use the model that takes the line as a feature
     :return: float, probability of going over the line
     """
-    file_safe_name = player_name.replace(" ", "_")
-    data_path = f"../data/{file_safe_name}_data.csv"
-    model_path = f"../models/{file_safe_name}_{stat_expr.replace('+', '_')}_model.pkl"
+    data_path, model_path, multiline = player_paths(player_name, stat_expr, multiline, line, games)
 
     if not os.path.exists(data_path):
         raise FileNotFoundError(f"Missing data file: {data_path}")
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Missing model file: {model_path}")
 
     # load data
-    player_data = pd.read_csv(data_path)
-    player_data['GAME_DATE'] = pd.to_datetime(player_data['GAME_DATE'])
-    player_data = player_data.sort_values('GAME_DATE')
-
-    # get the most recent N games
-    recent_games = player_data.tail(games)
-    if len(recent_games) < games:
-        raise ValueError(f"Not enough recent games for {player_name} (need at least {games})")
-    
-    # base features from last game
-    last_game = recent_games.iloc[-1]
-    base_stats = [
-        'MIN', 'FGA', 'FG3A', 'FTA', 'REB', 'AST', 'TOV',
-        'FGM', 'FG3M', 'FTM', 'FG_PCT', 'FG3_PCT', 'FT_PCT',
-        'OREB', 'DREB'
-    ]
-
-    avg_features = {stat: last_game[stat] for stat in base_stats}
-
-    # rolling averages for each stat part
-    for stat in list(avg_features.keys()):
-        avg_features[f"{stat}_avg"] = recent_games[stat].mean()
-
-    ast = recent_games['AST'].mean()
-    tov = recent_games['TOV'].mean()
-    avg_features['AST_TOV_ratio_avg'] = ast / (tov + 1e-5)
-
-    # add rolling averages for components of stat_expr
-    stat_parts = [s.strip() for s in stat_expr.split('+')]
-    for stat in stat_parts:
-        avg_features[f"{stat}_avg"] = recent_games[stat].mean()
+    player_data = load_player_data(data_path, log_columns(stat_expr))
+    avg_features = build_features(player_data, player_name, stat_expr, games)
+    if multiline:
+        avg_features[LINE_FEATURE] = line
 
     # load model
-    model = joblib.load(model_path)
-
-    # construct input dataframe with correct feature order
-    features = list(model.feature_names_in_)
-    input_df = pd.DataFrame([avg_features])[features]
+    model = load_model(model_path)
 
     # make prediction
-    probs = model.predict_proba(input_df)[0]
-
-    # handle case where model only trained on one class
-    if len(probs) == 1:
-        only_class = model.classes_[0]
-        prob_over = probs[0] if only_class == 1 else 1 - probs[0]
-        print(f"model only trained on one class ({only_class}). using fallback prob: {prob_over:.2f}")
-    else:
-        prob_over = probs[1]
+    prob_over = over_probabilities(model, [avg_features])[0]
     label = "OVER" if prob_over > 0.5 else "UNDER"
 
     print(f"\npredicted: {label} (probability: {prob_over:.2f}) for {player_name} — {stat_expr} > {line}")
-    return prob_over
\ No newline at end of file
+    return prob_over
+
+def predict_over_under_lines(player_name: str, stat_expr: str, lines: list, games: int = 10) -> list:
+    """
+    prices many lines for one player and stat expression with one multi-line model call
+
+    :param player_name: str, full player name like 'LeBron James'
+    :param stat_expr: str, stat or combo like 'PTS', 'REB+AST', 'PTS+REB+AST'
+    :param lines: list of floats, the over/under lines to evaluate
+    :param games: int, how many recent games to use for rolling averages
+    :return: list of probabilities of going over each line
+    """
+    data_path, model_path, _ = player_paths(player_name, stat_expr, multiline=True, games=games)
+
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"Missing data file: {data_path}")
+
+    features = build_features(load_player_data(data_path, log_columns(stat_expr)), player_name, stat_expr, games)
+    model = load_model(model_path)
+    return list(over_probabilities(model, [{**features, LINE_FEATURE: line} for line in lines]))
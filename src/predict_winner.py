@@ -1,48 +1,259 @@
+import argparse
+import os
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-import joblib
+from compiled_model import CompiledModel, load_model
+from model_registry import lookup, file_hash
+from instrumentation import timed, count
+from schema import TEAM_DATA_SCHEMA, read_csv
+from team_features import TEAM_DATA_PATH, STATS, FEATURES, load_snapshot, load_matrix, save_matrix
 
-team_data = pd.read_csv('../data/team_data.csv')
-model = joblib.load('../models/nba_prediction_model.pkl')
+MODEL_PATH = '../models/nba_prediction_model.pkl'
+
+# most recently built team index and probability matrix, reused while the same stats frame is passed in
+_team_index_cache = {}
+_matrix_cache = {}
+# model file hashes by path and mtime, and the probability matrix of the current snapshot and model
+_model_keys = {}
+_snapshot_matrix = {}
+
+@lru_cache(maxsize=None)
+def get_team_data():
+    """
+    load the team stats csv once per process.
+
+    :return: DataFrame containing stats for all teams
+    """
+    return read_csv(TEAM_DATA_PATH, TEAM_DATA_SCHEMA)
+
+def winner_model_path() -> str:
+    """
+    newest registered winner model, or the unversioned model file if none is registered.
+
+    :return: str, path to the pickled model
+    """
+    entry = lookup('league', 'HOME_WIN', family='winner', games=None)
+    return entry['model_path'] if entry is not None else MODEL_PATH
+
+@lru_cache(maxsize=None)
+def get_model():
+    """
+    load the trained winner model once per process, the compiled export if there is one.
+
+    :return: trained classifier
+    """
+    return load_model(winner_model_path())
+
+def __getattr__(name):
+    # keep predict_winner.team_data / predict_winner.model working without loading at import
+    if name == 'team_data':
+        return get_team_data()
+    if name == 'model':
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def model_key(model_path: str) -> str:
+    """
+    content hash of a model file, re-hashed only when the file changes.
+
+    :param model_path: str, path to the pickled model
+    :return: str, hex digest
+    """
+    mtime = os.stat(model_path).st_mtime_ns
+    cached = _model_keys.get(model_path)
+    if cached is None or cached[0] != mtime:
+        cached = _model_keys[model_path] = (mtime, file_hash(model_path))
+    return cached[1]
+
+def probability_matrix(model_path: str = None, team_data_path: str = TEAM_DATA_PATH):
+    """
+    win probabilities for every pairing of the current team snapshot, scored once per snapshot and model.
+
+    the matrix is stored next to the snapshot arrays keyed by both hashes, so a new process
+    or a repeat prediction reads it instead of calling the model.
+
+    :param model_path: str, pickled model, defaults to the newest registered winner model
+    :param team_data_path: str, team_data csv
+
+    :return: tuple of (snapshot dict from load_snapshot, matrix where [i, j] is the probability team i beats team j as team1)
+    """
+    model_path = model_path or winner_model_path()
+    snapshot = load_snapshot(team_data_path)
+    key = model_key(model_path)
+    # key and matrix live in one tuple swapped in a single assignment, so a server thread
+    # racing a snapshot swap never pairs the new key with the old matrix
+    cached_key, cached_matrix = _snapshot_matrix.get('entry', (None, None))
+    if cached_key == (snapshot['hash'], key):
+        return snapshot, cached_matrix
+
+    matrix = load_matrix(snapshot, key)
+    if matrix is None:
+        # every pairing including i vs i, which is the home edge alone
+        n_teams = len(snapshot['names'])
+        diffs = snapshot['diffs'].reshape(n_teams * n_teams, -1)
+        matrix = _win_probability(load_model(model_path), diffs).reshape(n_teams, n_teams)
+        save_matrix(snapshot, key, matrix)
+
+    _snapshot_matrix['entry'] = ((snapshot['hash'], key), matrix)
+    return snapshot, matrix
+
+def build_team_index(team_stats):
+    """
+    build a TEAM_NAME -> row lookup over a numpy array of the model's team stats.
+
+    :param team_stats: DataFrame containing stats for all teams
+
+    :return: tuple of (team names (list), name -> row index (dict), stats array (n_teams x n_stats))
+    """
+    source, cached = _team_index_cache.get('entry', (None, None))
+    if cached is not None and source is team_stats:
+        return cached
+
+    names = team_stats['TEAM_NAME'].tolist()
+    index = {name: i for i, name in enumerate(names)}
+    stats = team_stats[STATS].to_numpy(dtype=np.float64)
+
+    _team_index_cache['entry'] = (team_stats, (names, index, stats))
+    return names, index, stats
+
+def _win_probability(model, input_data):
+    """
+    probability that team1 wins for each row of stat differences.
+
+    :param model: trained classifier with predict_proba
+    :param input_data: array of stat differences (n_rows x n_stats)
+
+    :return: array of team1 win probabilities (n_rows)
+    """
+    if isinstance(model, CompiledModel):
+        # scores the array directly, no DataFrame needed
+        probs = model.predict_proba(np.asarray(input_data))
+    else:
+        input_df = pd.DataFrame(input_data, columns=FEATURES)
+        probs = model.predict_proba(input_df)
+
+    # column for the home/team1 win class
+    classes = list(model.classes_)
+    if 1 not in classes:
+        return np.zeros(len(input_data))
+    return probs[:, classes.index(1)]
+
+def _pair_rows(pairs, index):
+    rows1 = []
+    rows2 = []
+    for team1, team2 in pairs:
+        # make sure team exists in dataset
+        if team1 not in index:
+            raise ValueError(f"Team {team1} not found in the dataset.")
+        if team2 not in index:
+            raise ValueError(f"Team {team2} not found in the dataset.")
+        rows1.append(index[team1])
+        rows2.append(index[team2])
+    return rows1, rows2
+
+@timed('predict_matchups')
+def predict_matchups(pairs, team_stats=None, model=None):
+    """
+    predict team1 win probabilities for a batch of matchups with a single predict_proba call.
+
+    with the saved stats and model this is a lookup in the cached probability matrix.
+
+    :param pairs: list of (team1, team2) tuples
+    :param team_stats: DataFrame containing stats for all teams, defaults to the saved csv
+    :param model: trained classifier, defaults to the saved model
+
+    :return: array of probabilities that team1 beats team2, one per pair
+    """
+    if team_stats is None and model is None:
+        snapshot, matrix = probability_matrix()
+        rows1, rows2 = _pair_rows(pairs, snapshot['index'])
+        count('matchups', len(rows1))
+        return matrix[rows1, rows2]
+
+    team_stats = get_team_data() if team_stats is None else team_stats
+    model = get_model() if model is None else model
+    _, index, stats = build_team_index(team_stats)
+    rows1, rows2 = _pair_rows(pairs, index)
+
+    if not rows1:
+        return np.zeros(0)
+    count('matchups', len(rows1))
+
+    # stat differences for every pair at once
+    input_data = stats[rows1] - stats[rows2]
+    return _win_probability(model, input_data)
+
+@timed('matchup_matrix')
+def predict_all_matchups(team_stats=None, model=None):
+    """
+    predict win probabilities for every directed pairing of teams with a single predict_proba call.
+
+    :param team_stats: DataFrame containing stats for all teams, defaults to the saved csv
+    :param model: trained classifier, defaults to the saved model
+
+    :return: tuple of (team names (list), matrix where [i, j] is the probability team i beats team j as team1)
+    """
+    team_stats = get_team_data() if team_stats is None else team_stats
+    model = get_model() if model is None else model
+    names, _, stats = build_team_index(team_stats)
+    n_teams = len(names)
+
+    # (n, n, n_stats) stat differences via broadcasting, diagonal excluded
+    diffs = stats[:, None, :] - stats[None, :, :]
+    off_diagonal = ~np.eye(n_teams, dtype=bool)
+
+    matrix = np.full((n_teams, n_teams), np.nan)
+    matrix[off_diagonal] = _win_probability(model, diffs[off_diagonal])
+    return names, matrix
+
+def pairwise_probabilities(team_stats=None, model=None):
+    """
+    cached version of predict_all_matchups, recomputed only when the stats frame or model changes.
+    with the saved stats and model it's the stored matrix of the current snapshot.
+
+    :param team_stats: DataFrame containing stats for all teams, defaults to the saved csv
+    :param model: trained classifier, defaults to the saved model
+
+    :return: tuple of (team names (list), matrix where [i, j] is the probability team i beats team j as team1)
+    """
+    if team_stats is None and model is None:
+        snapshot, matrix = probability_matrix()
+        return snapshot['names'], matrix
+
+    team_stats = get_team_data() if team_stats is None else team_stats
+    model = get_model() if model is None else model
+    source, cached_model, cached = _matrix_cache.get('entry', (None, None, None))
+    if cached is not None and source is team_stats and cached_model is model:
+        return cached
+
+    result = predict_all_matchups(team_stats, model)
+    _matrix_cache['entry'] = (team_stats, model, result)
+    return result
 
 # function to predict winner between two teams
-def predict_winner(team1, team2, team_stats):
+def predict_winner(team1, team2, team_stats=None, model=None):
     """
     predict the winner between two teams using the pre-trained model.
-    
+
     :param team1: name of the first team (str)
     :param team2: name of the second team (str)
-    :param team_stats: DataFrame containing stats for all teams
-    
+    :param team_stats: DataFrame containing stats for all teams, defaults to the saved csv
+    :param model: trained classifier, defaults to the saved model
+
     :return: predicted winner (str)
     """
-    # make sure team exists in dataset
-    if team1 not in team_stats['TEAM_NAME'].values:
-        raise ValueError(f"Team {team1} not found in the dataset.")
-    if team2 not in team_stats['TEAM_NAME'].values:
-        raise ValueError(f"Team {team2} not found in the dataset.")
-    
-    # stats for both teams
-    team1_stats = team_stats.loc[team_stats['TEAM_NAME'] == team1].iloc[0]
-    team2_stats = team_stats.loc[team_stats['TEAM_NAME'] == team2].iloc[0]
-    
-    # stat differences
-    input_data = pd.DataFrame([{
-        'PTS_diff': team1_stats['PTS'] - team2_stats['PTS'],
-        'REB_diff': team1_stats['REB'] - team2_stats['REB'],
-        'AST_diff': team1_stats['AST'] - team2_stats['AST'],
-        'STL_diff': team1_stats['STL'] - team2_stats['STL'],
-        'BLK_diff': team1_stats['BLK'] - team2_stats['BLK'],
-        'TOV_diff': team1_stats['TOV'] - team2_stats['TOV']
-    }])
-
-    # predict outcome
-    prediction = model.predict(input_data)[0]
-    return team1 if prediction == 1 else team2
-
-team1 = "Utah Jazz"
-team2 = "Washington Wizards"
-try:
-    winner = predict_winner(team1, team2, team_data)
-    print(f"the predicted winner is: {winner}")
-except ValueError as e:
-    print(e)
\ No newline at end of file
+    prob = predict_matchups([(team1, team2)], team_stats, model)[0]
+    return team1 if prob > 0.5 else team2
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="predict the winner between two teams")
+    parser.add_argument('team1', nargs='?', default="Utah Jazz")
+    parser.add_argument('team2', nargs='?', default="Washington Wizards")
+    args = parser.parse_args()
+
+    try:
+        winner = predict_winner(args.team1, args.team2)
+        print(f"the predicted winner is: {winner}")
+    except ValueError as e:
+        print(e)
@@ -0,0 +1,344 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from compiled_model import load_model
+from game_log_store import player_log_path, player_key, load_rolling_state
+from model_registry import ModelHandle
+from predict_winner import MODEL_PATH, probability_matrix, _pair_rows
+from predict_over_under import over_probabilities
+from over_under_model import LINE_FEATURE
+
+class LRUCache:
+    """
+    thread-safe least-recently-used cache with a memory cap in bytes.
+
+    entries are keyed by file path (or a key derived from it) and reloaded when the
+    file's mtime changes, so retrained models and refreshed game logs are picked up
+    without a restart.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, loader, sizer=None, key=None):
+        """
+        return the cached object for path, loading it on a miss or when the file changed
+
+        :param path: str, file backing the entry
+        :param loader: callable(path) -> object
+        :param sizer: callable(object) -> int bytes, defaults to the file size on disk
+        :param key: optional hashable, for several entries backed by one file, defaults to path
+        :return: cached object
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Missing file: {path}")
+        mtime = os.path.getmtime(path)
+        key = path if key is None else key
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # load outside the lock so one slow load doesn't block other hits
+        value = loader(path)
+        size = sizer(value) if sizer else os.path.getsize(path)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._entries[key] = (mtime, value, size)
+            self.current_bytes += size
+
+            # evict least recently used, always keep the entry just loaded
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+class MicroBatcher:
+    """
+    coalesces concurrent scoring requests into micro-batches.
+
+    requests for the same model that arrive within max_wait seconds of each
+    other are scored together with a single predict_proba call.
+    """
+
+    def __init__(self, score_fn, max_batch: int = 256, max_wait: float = 0.005):
+        """
+        :param score_fn: callable(model_key, payloads) -> list of probabilities
+        :param max_batch: int, most requests scored in one batch
+        :param max_wait: float, seconds to wait for more requests after the first arrives
+        """
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, model_key, payload) -> Future:
+        future = Future()
+        self._queue.put((model_key, payload, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            # one scoring call per model in the batch
+            groups = {}
+            for model_key, payload, future in batch:
+                groups.setdefault(model_key, []).append((payload, future))
+
+            for model_key, items in groups.items():
+                try:
+                    probs = self.score_fn(model_key, [payload for payload, _ in items])
+                    for (_, future), prob in zip(items, probs):
+                        future.set_result(float(prob))
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                self.batches += 1
+                self.requests += len(items)
+
+class PredictionService:
+    """
+    keeps the winner probability matrix, over/under models and players' rolling feature
+    states warm in memory and scores over/under requests through a shared micro-batcher.
+
+    models are resolved through one registry ModelHandle per slot, so a newly registered
+    version is served within a second without a restart or an index read per request.
+    """
+
+    def __init__(self, max_cache_mb: int = 512, max_batch: int = 256, max_wait_ms: float = 5.0):
+        self.cache = LRUCache(max_cache_mb * 1024 * 1024)
+        self.batcher = MicroBatcher(self._score, max_batch=max_batch, max_wait=max_wait_ms / 1000)
+        self._handles = {}
+        self._handles_lock = threading.Lock()
+
+    def _model_path(self, *slot) -> str:
+        """
+        newest registered model of a slot, the handle re-reads the registry at most once a second
+
+        :param slot: player id, stat expression, line, games and family, as for slot_key
+        :return: str, model path
+        """
+        with self._handles_lock:
+            handle = self._handles.get(slot)
+            if handle is None:
+                # the handle only tracks the version, the models themselves live in the LRU cache
+                handle = self._handles[slot] = ModelHandle(*slot)
+        return handle.path()
+
+    def _over_under_path(self, player_name: str, stat_expr: str, line: float, games: int, multiline: bool) -> tuple:
+        """
+        the model for the exact line, else the multi-line model of the same window, never an unversioned file
+
+        :return: tuple of (model path, multiline)
+        """
+        player_id = player_key(player_name)
+        if not multiline:
+            try:
+                return self._model_path(player_id, stat_expr, line, games, None), False
+            except FileNotFoundError:
+                pass
+        return self._model_path(player_id, stat_expr, None, games, None), True
+
+    def _load_model(self, path: str):
+        return self.cache.get(path, load_model)
+
+    def _rolling_state(self, player_name: str, games: int):
+        # reloaded whenever the player's log is rewritten, the state itself is read without the log
+        return self.cache.get(player_log_path(player_name), lambda path: load_rolling_state(player_name, games),
+                              lambda state: state.nbytes, key=('rolling', player_name, games))
+
+    def _score(self, model_key, payloads):
+        kind, path = model_key
+        return over_probabilities(self._load_model(path), payloads)
+
+    def predict_winner(self, pairs: list) -> list:
+        """
+        :param pairs: list of (team1, team2) tuples
+        :return: list of dicts with the probability that team1 wins
+        """
+        # every pairing is scored once per team snapshot and model, requests are lookups;
+        # the handle picks up a newly registered winner model
+        try:
+            model_path = self._model_path('league', 'HOME_WIN', None, None, 'winner')
+        except FileNotFoundError:
+            model_path = MODEL_PATH
+        snapshot, matrix = probability_matrix(model_path)
+        rows1, rows2 = _pair_rows(pairs, snapshot['index'])
+
+        results = []
+        for (team1, team2), prob in zip(pairs, matrix[rows1, rows2].tolist()):
+            results.append({
+                'team1': team1,
+                'team2': team2,
+                'team1_win_prob': prob,
+                'winner': team1 if prob > 0.5 else team2,
+            })
+        return results
+
+    def predict_over_under(self, queries: list) -> list:
+        """
+        a query that can't be priced, like a player without a log or model, gets an error
+        in its own slot and the rest of the batch is still priced, like the slate runner
+
+        :param queries: list of dicts with player_name, stat_expr, line and optional games and multiline
+        :return: list of dicts with the probability of going over each line, or an error
+        """
+        futures = []
+        for q in queries:
+            try:
+                # lines without a model of their own are priced by the multi-line model
+                model_path, multiline = self._over_under_path(q['player_name'], q['stat_expr'], float(q['line']),
+                                                              int(q.get('games', 10)), bool(q.get('multiline', False)))
+                state = self._rolling_state(q['player_name'], int(q.get('games', 10)))
+                features = state.features(q['stat_expr'], q['player_name'])
+                if multiline:
+                    features[LINE_FEATURE] = float(q['line'])
+                futures.append(self.batcher.submit(('over_under', model_path), features))
+            except Exception as e:
+                futures.append(e)
+
+        results = []
+        for q, future in zip(queries, futures):
+            result = {'player_name': q.get('player_name'), 'stat_expr': q.get('stat_expr'), 'line': q.get('line')}
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                prob = future.result()
+                result.update(over_prob=prob, prediction="OVER" if prob > 0.5 else "UNDER")
+            except Exception as e:
+                result['error'] = f"missing {e}" if isinstance(e, KeyError) else str(e)
+            results.append(result)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            'cache': self.cache.stats(),
+            'batches': self.batcher.batches,
+            'requests': self.batcher.requests,
+        }
+
+class PredictionHTTPServer(ThreadingHTTPServer):
+    # bursts of prop queries right before tip-off overflow the default backlog of 5
+    request_queue_size = 256
+    daemon_threads = True
+
+def make_handler(service: PredictionService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            elif self.path == '/stats':
+                self._send(200, service.stats())
+            else:
+                self._send(404, {'error': f"unknown path {self.path}"})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+
+                if self.path == '/winner':
+                    pairs = body.get('pairs') or [(body['team1'], body['team2'])]
+                    self._send(200, {'results': service.predict_winner(pairs)})
+                elif self.path == '/over_under':
+                    queries = body.get('queries') or [body]
+                    self._send(200, {'results': service.predict_over_under(queries)})
+                else:
+                    self._send(404, {'error': f"unknown path {self.path}"})
+            except (KeyError, ValueError, FileNotFoundError) as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            # keep request logging quiet during bursts
+            pass
+
+    return Handler
+
+def serve(host: str = '127.0.0.1', port: int = 8765, max_cache_mb: int = 512, max_batch: int = 256, max_wait_ms: float = 5.0):
+    """
+    runs the prediction server until interrupted
+
+    endpoints:
+        POST /winner      {"team1": ..., "team2": ...} or {"pairs": [[team1, team2], ...]}
+        POST /over_under  {"player_name": ..., "stat_expr": ..., "line": ...} or {"queries": [...]}
+        GET  /health, /stats
+
+    :param host: str, interface to bind
+    :param port: int, port to listen on
+    :param max_cache_mb: int, memory cap for warm models and game logs
+    :param max_batch: int, most requests scored in one predict_proba call
+    :param max_wait_ms: float, how long to wait for a batch to fill
+    """
+    service = PredictionService(max_cache_mb=max_cache_mb, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    server = PredictionHTTPServer((host, port), make_handler(service))
+    print(f"prediction server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="serve winner and over/under predictions with warm models")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-cache-mb', type=int, default=512)
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.max_cache_mb, args.max_batch, args.max_wait_ms)
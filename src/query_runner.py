@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+
+from atomic_write import write_json
+from data_generation import fetch_player_data, resolve_player
+from game_log_store import player_data_hash, has_player
+from over_under_model import generate_player_model
+from predict_over_under import predict_over_under
+
+RESULT_CACHE_PATH = '../data/result_cache.json'
+
+class ResultCache:
+    """
+    over probabilities already computed, keyed by player id, stat expression, line and window.
+
+    each slot remembers the data hash it was computed from, so a refreshed game log
+    misses the cache and the new result replaces the stale one.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @staticmethod
+    def key(player_id, stat_expr: str, line: float, games: int = 10) -> str:
+        return f"{player_id}|{stat_expr}|line={float(line)}|games={games}"
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+        return self._entries
+
+    def get(self, player_id, stat_expr: str, line: float, games: int, data_hash: str):
+        """
+        :return: dict with prob and created_at, or None if missing or computed from other data
+        """
+        with self._lock:
+            entry = self._load().get(self.key(player_id, stat_expr, line, games))
+        if entry is None or entry['data_hash'] != data_hash:
+            return None
+        return entry
+
+    def put(self, player_id, stat_expr: str, line: float, games: int, data_hash: str, prob: float):
+        with self._lock:
+            self._load()[self.key(player_id, stat_expr, line, games)] = {
+                'data_hash': data_hash,
+                'prob': float(prob),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            write_json(self.path, self._entries)
+
+def run_query(player_name: str, stat_expr: str, line: float, games: int = 10, seasons=('2023-24', '2024-25'),
+              refresh: bool = False, cache: ResultCache = None, threads=None, cancelled=None, progress=None):
+    """
+    fetch -> train -> predict for one prop, answered from the cache when the data hasn't changed
+
+    the name is resolved to a player id first, so a partial name like 'lebron' hits the same
+    cache entry as the full one, and a hit on a stored log never touches the network
+
+    safe to call from worker threads: every file is written through its own per-thread temp
+    file and moved into place, and the store and registry indexes are updated under a lock
+
+    :param player_name: str, full or partial player name like 'LeBron James'
+    :param stat_expr: str, like 'PTS', 'REB', 'PTS+REB+AST'
+    :param line: float, over/under line
+    :param games: int, rolling window
+    :param seasons: seasons to fetch
+    :param refresh: bool, refetch data, retrain and skip the cache
+    :param cache: optional ResultCache
+    :param threads: optional int, training threads, None for all cores
+    :param cancelled: optional threading.Event, checked between stages
+    :param progress: optional callable(stage), called with 'fetch', 'train' and 'predict'
+    :return: dict with full_name, prob and cached, or None if cancelled
+    """
+    def step(stage):
+        if cancelled is not None and cancelled.is_set():
+            return False
+        if progress is not None:
+            progress(stage)
+        return True
+
+    player = resolve_player(player_name)
+    player_id, full_name = player['id'], player['full_name']
+
+    if cache is not None and not refresh and has_player(full_name):
+        entry = cache.get(player_id, stat_expr, line, games, player_data_hash(full_name))
+        if entry is not None:
+            return {'full_name': full_name, 'prob': entry['prob'], 'cached': True}
+
+    if not step('fetch'):
+        return None
+    fetch_player_data(full_name, seasons=list(seasons), force_refresh=refresh)
+    data_hash = player_data_hash(full_name)
+
+    # grid search can't be interrupted, cancelling stops the query before or after it
+    if not step('train'):
+        return None
+    generate_player_model(full_name, line=line, stat_expr=stat_expr, games=games, force_retrain=refresh,
+                          threads=threads)
+
+    if not step('predict'):
+        return None
+    prob = predict_over_under(full_name, stat_expr=stat_expr, line=line, games=games)
+
+    if cache is not None:
+        cache.put(player_id, stat_expr, line, games, data_hash, prob)
+    return {'full_name': full_name, 'prob': float(prob), 'cached': False}
@@ -0,0 +1,146 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# columns each dataset keeps and their compact dtypes, applied once when data is ingested
+# so readers get numbers they can use directly. a column a new reader needs goes here first,
+# anything not listed is dropped when the data is stored
+#   int8/int16/int32 - box score counts and ids, float32 if a value is missing or fractional
+#   float32 - percentages and averages
+#   category - short strings repeated on every row
+#   datetime - parsed dates
+#   str - ids kept as text, nba game ids have leading zeros
+
+COUNT_STATS = ['FGM', 'FGA', 'FG3M', 'FG3A', 'FTM', 'FTA', 'OREB', 'DREB', 'REB', 'AST', 'STL', 'BLK', 'TOV',
+               'PF', 'PTS', 'PLUS_MINUS']
+PCT_STATS = ['FG_PCT', 'FG3_PCT', 'FT_PCT']
+
+# every per-game number in a player log, what a stat expression can be built from
+BOX_SCORE_STATS = ['MIN'] + COUNT_STATS + PCT_STATS
+
+# playergamelog rows, one per game a player played
+PLAYER_LOG_SCHEMA = {
+    'Player_ID': 'int32',
+    'Game_ID': 'str',
+    'GAME_DATE': 'datetime',
+    'SEASON': 'category',
+    'MATCHUP': 'category',
+    'WL': 'category',
+    # minutes come as whole numbers from playergamelog but fractional from some older feeds
+    'MIN': 'float32',
+    **{stat: 'int16' for stat in COUNT_STATS},
+    **{stat: 'float32' for stat in PCT_STATS},
+}
+
+# fetch_game_data's game_data.csv, one row per game with both teams' box scores
+GAME_STATS = ['PTS', 'REB', 'AST', 'STL', 'BLK', 'TOV']
+GAME_DATA_SCHEMA = {
+    'GAME_ID': 'str',
+    'GAME_DATE': 'datetime',
+    **{f'TEAM_ID_{side}': 'int32' for side in ('HOME', 'AWAY')},
+    **{f'{stat}_{side}': 'int16' for side in ('HOME', 'AWAY') for stat in GAME_STATS},
+    'HOME_WIN': 'int8',
+}
+
+# fetch_team_data's team_data.csv, one row per team of per-game averages. thirty rows,
+# so the averages stay float64 and the cached team snapshot matches the csv exactly
+TEAM_DATA_SCHEMA = {
+    'TEAM_ID': 'int32',
+    'TEAM_NAME': 'str',
+    'GP': 'int16',
+    'W': 'int16',
+    'L': 'int16',
+    'W_PCT': 'float64',
+    **{stat: 'float64' for stat in GAME_STATS},
+}
+
+def _cast(values: pd.Series, kind: str) -> pd.Series:
+    if kind == 'datetime':
+        return values if pd.api.types.is_datetime64_any_dtype(values) else pd.to_datetime(values)
+    if kind == 'category':
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+    if kind == 'str':
+        return values if values.dtype == object else values.astype(str)
+    if values.dtype == kind:
+        return values
+
+    numbers = pd.to_numeric(values, errors='coerce')
+    if kind.startswith('int'):
+        info = np.iinfo(kind)
+        whole = numbers.notna().all() and (numbers % 1 == 0).all()
+        if whole and (numbers.empty or (numbers.min() >= info.min and numbers.max() <= info.max)):
+            return numbers.astype(kind)
+        # missing or fractional values don't fit an integer column
+        return numbers.astype('float32')
+    return numbers.astype(kind)
+
+def apply_schema(data: pd.DataFrame, schema: dict, columns=None) -> pd.DataFrame:
+    """
+    keeps a dataset's columns and casts them to their compact dtypes
+
+    numbers are coerced here, once, text that doesn't parse becomes NaN
+
+    :param data: DataFrame, raw from nba_api or read from a file
+    :param schema: dict of column -> dtype, like PLAYER_LOG_SCHEMA
+    :param columns: optional list of columns to keep, in order, defaults to the schema's.
+                    columns outside the schema are kept as they are
+    :return: DataFrame with the columns data has, typed
+    """
+    columns = list(schema) if columns is None else columns
+    typed = {}
+    for column in columns:
+        if column in data:
+            typed[column] = _cast(data[column], schema[column]) if column in schema else data[column]
+    return pd.DataFrame(typed, index=data.index)
+
+def read_csv(path: str, schema: dict, columns=None) -> pd.DataFrame:
+    """
+    reads only the wanted columns of a csv, typed by the schema
+
+    :param path: str, csv written by data_generation
+    :param schema: dict of column -> dtype, like GAME_DATA_SCHEMA
+    :param columns: optional list of columns to load, defaults to the schema's
+    :return: DataFrame with the columns the file has
+    """
+    columns = list(schema) if columns is None else columns
+    header = pd.read_csv(path, nrows=0).columns
+    wanted = [column for column in columns if column in header]
+    # ids parsed as text so their leading zeros survive
+    text = {column: str for column in wanted if schema.get(column) == 'str'}
+    return apply_schema(pd.read_csv(path, usecols=wanted, dtype=text), schema, columns)
+
+def memory_mb(data: pd.DataFrame) -> float:
+    """
+    memory a frame holds, strings and categories included
+
+    :param data: DataFrame
+    :return: float, megabytes
+    """
+    return data.memory_usage(deep=True).sum() / 2 ** 20
+
+if __name__ == "__main__":
+    import glob
+
+    parser = argparse.ArgumentParser(description="memory of the data csvs as pandas reads them and with their schema")
+    parser.add_argument('--data-dir', default='../data')
+    args = parser.parse_args()
+
+    def report(name, raw, typed):
+        print(f"{name:<12} {len(raw):>9} rows  {raw.shape[1]:>3} -> {typed.shape[1]:>3} columns  "
+              f"{memory_mb(raw):8.2f} MB -> {memory_mb(typed):7.2f} MB  ({memory_mb(typed) / max(memory_mb(raw), 1e-9):.0%})")
+
+    # raw is a plain pd.read_csv of each file, every column at pandas' default dtype
+    log_paths = [path for path in sorted(glob.glob(os.path.join(args.data_dir, '*_data.csv')))
+                 if os.path.basename(path) not in ('game_data.csv', 'team_data.csv')]
+    if log_paths:
+        raw = pd.concat([pd.read_csv(path) for path in log_paths], ignore_index=True)
+        report('player logs', raw, apply_schema(raw, PLAYER_LOG_SCHEMA))
+    else:
+        # the store only holds typed logs, there's no raw frame to compare them with
+        print(f"player logs  no {{Name}}_data.csv files in {args.data_dir}")
+
+    for name, schema in (('game_data', GAME_DATA_SCHEMA), ('team_data', TEAM_DATA_SCHEMA)):
+        path = os.path.join(args.data_dir, f'{name}.csv')
+        if os.path.exists(path):
+            report(name, pd.read_csv(path), read_csv(path, schema))
@@ -1,9 +1,10 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-import joblib
-from predict_winner import predict_winner
-
-team_data = pd.read_csv('../data/team_data.csv')
-model = joblib.load('../models/nba_prediction_model.pkl')
+from instrumentation import timed
+from predict_winner import predict_winner, pairwise_probabilities
 
 # first-round matches with full team names
 first_round_matches = [
@@ -13,42 +14,229 @@ first_round_matches = [
     ("Minnesota Timberwolves", "Golden State Warriors")            # Match 4
 ]
 
+def get_round_name(n_teams):
+    """
+    name of the round played by the given number of remaining teams.
+
+    :param n_teams: number of teams left in the bracket (int)
+    :return: round name (str)
+    """
+    return {
+        8: "Quarterfinals",
+        4: "Semifinals",
+        2: "Final",
+    }.get(n_teams, f"Round of {n_teams}")
+
 # recursive function to simulate the bracket
-def simulate_bracket(matches, team_stats, model, round_name="Quarterfinals"):
+def simulate_bracket(matches, team_stats=None, model=None, round_name="Quarterfinals"):
     """
     Simulate the entire bracket recursively and print results for each round.
 
     :param matches: List of tuples, where each tuple is a matchup (team1, team2).
-    :param team_stats: DataFrame containing stats for all teams.
-    :param model: Trained machine learning model.
+    :param team_stats: DataFrame containing stats for all teams, defaults to the saved csv.
+    :param model: Trained machine learning model, defaults to the saved model.
     :param round_name: Name of the current round (str).
     :return: Winner of the tournament.
     """
     print(f"\n--- {round_name} ---")
     next_round = []
-    
+
     # predict each match and print the results
     for team1, team2 in matches:
-        winner = predict_winner(team1, team2, team_stats)
+        winner = predict_winner(team1, team2, team_stats, model)
         print(f"{team1} vs. {team2} -> {winner} wins")
         next_round.append(winner)
-    
+
     # if final round, return the champion
     if len(next_round) == 1:
         return next_round[0]
-    
+
     # generate next round matches by pairing winners
     next_round_matches = [(next_round[i], next_round[i+1]) for i in range(0, len(next_round), 2)]
-    
+
     # determine the next round's name
-    next_round_name = {
-        4: "Semifinals",
-        2: "Final",
-    }.get(len(next_round), f"Round of {len(next_round)}")
-    
+    next_round_name = get_round_name(len(next_round))
+
     # recursively simulate the next round
     return simulate_bracket(next_round_matches, team_stats, model, next_round_name)
 
-# predict the NBA Cup winner and output each round
-champion = simulate_bracket(first_round_matches, team_data, model)
-print(f"\nThe predicted NBA Cup Champion is: {champion}")
\ No newline at end of file
+def bracket_win_matrix(matches, team_stats=None, model=None, forced=None):
+    """
+    Build the head-to-head win probabilities for the teams in a bracket.
+
+    Teams are numbered by bracket slot. When slots i < j meet, i is the winner
+    of the upper half of the block and plays as team1, matching simulate_bracket.
+
+    :param matches: List of tuples, where each tuple is a first-round matchup (team1, team2).
+    :param team_stats: DataFrame containing stats for all teams, defaults to the saved csv.
+    :param model: Trained machine learning model, defaults to the saved model.
+    :param forced: Optional list of (winner, loser) tuples fixing the result if those teams meet.
+    :return: tuple of (bracket teams (list), matrix where [i, j] is the probability slot i beats slot j)
+    """
+    teams = [team for match in matches for team in match]
+    n_teams = len(teams)
+    if n_teams < 2 or n_teams & (n_teams - 1):
+        raise ValueError(f"Bracket must have a power-of-two number of teams, got {n_teams}.")
+
+    names, probs = pairwise_probabilities(team_stats, model)
+    index = {name: i for i, name in enumerate(names)}
+    for team in teams:
+        if team not in index:
+            raise ValueError(f"Team {team} not found in the dataset.")
+
+    rows = np.array([index[team] for team in teams])
+    as_team1 = probs[np.ix_(rows, rows)]
+
+    # upper slot plays as team1, lower slot wins with the complement
+    upper = np.triu(np.ones((n_teams, n_teams), dtype=bool), k=1)
+    win_matrix = np.where(upper, as_team1, 1 - as_team1.T)
+    np.fill_diagonal(win_matrix, 0.0)
+
+    # what-if results override the model
+    slots = {team: i for i, team in enumerate(teams)}
+    for winner, loser in forced or []:
+        if winner not in slots or loser not in slots:
+            raise ValueError(f"Forced result {winner} over {loser} is not in the bracket.")
+        win_matrix[slots[winner], slots[loser]] = 1.0
+        win_matrix[slots[loser], slots[winner]] = 0.0
+
+    return teams, win_matrix
+
+def _simulate_draws(win_matrix, n_draws, seed, batch_size=100_000):
+    """
+    Sample tournament draws and count how often each slot reaches each round.
+
+    :param win_matrix: Slot vs. slot win probabilities from bracket_win_matrix.
+    :param n_draws: Number of tournaments to sample (int).
+    :param seed: Seed or SeedSequence for the random generator.
+    :param batch_size: Number of draws sampled together (int).
+    :return: counts array (n_rounds + 1 x n_teams), row r counts wins of r games.
+    """
+    rng = np.random.default_rng(seed)
+    n_teams = win_matrix.shape[0]
+    n_rounds = n_teams.bit_length() - 1
+    counts = np.zeros((n_rounds + 1, n_teams), dtype=np.int64)
+
+    remaining = n_draws
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        remaining -= size
+
+        alive = np.broadcast_to(np.arange(n_teams), (size, n_teams))
+        counts[0] += size
+        for r in range(1, n_rounds + 1):
+            upper = alive[:, 0::2]
+            lower = alive[:, 1::2]
+            p_upper = win_matrix[upper, lower]
+            alive = np.where(rng.random(p_upper.shape) < p_upper, upper, lower)
+            counts[r] += np.bincount(alive.ravel(), minlength=n_teams)
+
+    return counts
+
+def _round_labels(n_teams):
+    """
+    Column labels for per-round probabilities, ending with the champion.
+
+    :param n_teams: number of teams in the bracket (int)
+    :return: list of labels (str)
+    """
+    labels = []
+    while n_teams > 1:
+        labels.append(get_round_name(n_teams))
+        n_teams //= 2
+    return labels + ["Champion"]
+
+@timed('bracket_monte_carlo')
+def monte_carlo_bracket(matches, team_stats=None, model=None, n_draws=100_000, seed=None, n_jobs=1, batch_size=100_000, forced=None):
+    """
+    Estimate each team's chance of reaching every round by sampling tournament draws.
+
+    Pairwise win probabilities come from one cached predict_proba call, draws are
+    sampled in vectorized batches and large runs can be split across processes.
+
+    :param matches: List of tuples, where each tuple is a first-round matchup (team1, team2).
+    :param team_stats: DataFrame containing stats for all teams, defaults to the saved csv.
+    :param model: Trained machine learning model, defaults to the saved model.
+    :param n_draws: Number of tournaments to sample (int).
+    :param seed: Seed for the random generator, None for fresh entropy.
+    :param n_jobs: Number of worker processes, -1 for all cores (int).
+    :param batch_size: Number of draws sampled together (int).
+    :param forced: Optional list of (winner, loser) tuples fixing the result if those teams meet.
+    :return: DataFrame indexed by team with the probability of reaching each round.
+    """
+    teams, win_matrix = bracket_win_matrix(matches, team_stats, model, forced)
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, n_draws))
+
+    seeds = np.random.SeedSequence(seed).spawn(n_jobs)
+    if n_jobs == 1:
+        counts = _simulate_draws(win_matrix, n_draws, seeds[0], batch_size)
+    else:
+        # split draws evenly, each worker gets an independent stream
+        chunks = [n_draws // n_jobs + (i < n_draws % n_jobs) for i in range(n_jobs)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = pool.map(_simulate_draws, [win_matrix] * n_jobs, chunks, seeds, [batch_size] * n_jobs)
+            counts = sum(results)
+
+    return pd.DataFrame(counts.T / n_draws, index=teams, columns=_round_labels(len(teams)))
+
+@timed('bracket_exact')
+def exact_bracket(matches, team_stats=None, model=None, forced=None):
+    """
+    Compute each team's exact probability of reaching every round.
+
+    Reach probabilities are propagated round by round: a slot wins its block
+    if it reached the round and beats whichever slot comes out of the other
+    half, which costs one (n x n) matrix-vector product per round.
+
+    :param matches: List of tuples, where each tuple is a first-round matchup (team1, team2).
+    :param team_stats: DataFrame containing stats for all teams, defaults to the saved csv.
+    :param model: Trained machine learning model, defaults to the saved model.
+    :param forced: Optional list of (winner, loser) tuples fixing the result if those teams meet.
+    :return: DataFrame indexed by team with the probability of reaching each round.
+    """
+    teams, win_matrix = bracket_win_matrix(matches, team_stats, model, forced)
+    n_teams = len(teams)
+    n_rounds = n_teams.bit_length() - 1
+
+    slots = np.arange(n_teams)
+    reach = np.ones(n_teams)
+    rounds = [reach]
+    for r in range(n_rounds):
+        # opponents share a block of size 2^(r+1) but sit in the other half
+        block = 2 ** (r + 1)
+        same_block = (slots[:, None] // block) == (slots[None, :] // block)
+        other_half = (slots[:, None] // (block // 2)) != (slots[None, :] // (block // 2))
+        opponents = same_block & other_half
+
+        reach = reach * ((win_matrix * opponents) @ reach)
+        rounds.append(reach)
+
+    return pd.DataFrame(np.array(rounds).T, index=teams, columns=_round_labels(n_teams))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="simulate the NBA Cup bracket")
+    parser.add_argument('--draws', type=int, default=100_000, help="number of Monte Carlo tournaments")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=1, help="worker processes for Monte Carlo, -1 for all cores")
+    args = parser.parse_args()
+
+    # saved stats and model, every game is a lookup in the snapshot's cached probability matrix
+    team_data = None
+    model = None
+
+    # predict the NBA Cup winner and output each round
+    champion = simulate_bracket(first_round_matches, team_data, model)
+    print(f"\nThe predicted NBA Cup Champion is: {champion}")
+
+    # championship odds over many sampled tournaments
+    odds = monte_carlo_bracket(first_round_matches, team_data, model, n_draws=args.draws, seed=args.seed, n_jobs=args.jobs)
+    print("\n--- Monte Carlo Round Probabilities ---")
+    print(odds.sort_values("Champion", ascending=False).round(3))
+
+    # exact round probabilities, no sampling noise
+    exact = exact_bracket(first_round_matches, team_data, model)
+    print("\n--- Exact Round Probabilities ---")
+    print(exact.sort_values("Champion", ascending=False).round(3))
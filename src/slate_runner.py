@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from compiled_model import load_model
+from game_log_store import load_rolling_state, player_key
+from model_registry import lookup
+from over_under_model import generate_multiline_model, LINE_FEATURE
+from predict_over_under import over_probabilities
+from train_scheduler import read_jobs, job_key, _init_worker
+
+def _init_slate_worker(threads: int):
+    _init_worker(threads)
+    # training and prediction print progress, keep stdout for the jsonl stream
+    sys.stdout = sys.stderr
+
+def group_slate(jobs: list, done=frozenset()) -> list:
+    """
+    slate rows grouped by player, in order of each player's first row
+
+    :param jobs: list of dicts from read_jobs
+    :param done: set of job keys already written by an earlier run
+    :return: list of (player_name, [(row, job), ...]) tuples
+    """
+    groups = {}
+    for row, job in enumerate(jobs):
+        if job_key(job) not in done:
+            groups.setdefault(job['player_name'], []).append((row, job))
+    return list(groups.items())
+
+def _result(row: int, job: dict, **fields) -> dict:
+    return {'row': row, 'key': job_key(job), 'player_name': job['player_name'], 'stat_expr': job['stat_expr'],
+            'line': job['line'], 'games': job['games'], **fields}
+
+def score_player(player_name: str, rows: list, train: bool = False, threads: int = 1) -> list:
+    """
+    prices every slate row of one player, loading their rolling state once per window and
+    each model once
+
+    rows are answered by the registered model for their exact line when there is one,
+    otherwise by the player's multi-line model, and all rows of a model go through one
+    batched predict_proba call
+
+    :param player_name: str, full player name like 'LeBron James'
+    :param rows: list of (row, job) tuples from group_slate
+    :param train: bool, train a multi-line model for stat expressions that have no model
+    :param threads: int, training threads, the worker's budget
+    :return: list of result dicts, with prob_over or error
+    """
+    # the state kept with the player's log answers every stat expression without reading the log
+    states = {}
+    for games in dict.fromkeys(job['games'] for _, job in rows):
+        try:
+            states[games] = load_rolling_state(player_name, games)
+        except FileNotFoundError as e:
+            return [_result(row, job, error=str(e)) for row, job in rows]
+    model_id = player_key(player_name)
+
+    by_stat = {}
+    for row, job in rows:
+        by_stat.setdefault((job['stat_expr'], job['games']), []).append((row, job))
+
+    results = []
+    for (stat_expr, games), stat_rows in by_stat.items():
+        missing_line = [(row, job) for row, job in stat_rows if job['line'] is None]
+        results += [_result(row, job, error="no line given") for row, job in missing_line]
+        stat_rows = [(row, job) for row, job in stat_rows if job['line'] is not None]
+        if not stat_rows:
+            continue
+
+        try:
+            features = states[games].features(stat_expr, player_name)
+
+            # exact-line models first, the multi-line model for every other line
+            by_model = {}
+            unmodelled = []
+            for row, job in stat_rows:
+                entry = lookup(model_id, stat_expr, job['line'], games)
+                if entry is not None:
+                    by_model.setdefault((entry['model_path'], 'line'), []).append((row, job))
+                else:
+                    unmodelled.append((row, job))
+
+            if unmodelled:
+                # only a multi-line model trained with this window, the unversioned file may hold another
+                entry = lookup(model_id, stat_expr, None, games)
+                multiline_path = entry['model_path'] if entry is not None else None
+                if multiline_path is None and train:
+                    multiline_path = generate_multiline_model(player_name, stat_expr, games, threads=threads)
+                if multiline_path is not None:
+                    by_model[(multiline_path, 'multiline')] = unmodelled
+                else:
+                    results += [_result(row, job, error=f"no {games}-game model for {stat_expr}, run with --train")
+                                for row, job in unmodelled]
+
+            for (model_path, kind), model_rows in by_model.items():
+                model = load_model(model_path)
+                feature_rows = [features if kind == 'line' else {**features, LINE_FEATURE: job['line']}
+                                for _, job in model_rows]
+                probs = over_probabilities(model, feature_rows)
+                results += [_result(row, job, prob_over=round(float(p), 4), pick='OVER' if p > 0.5 else 'UNDER',
+                                    model=kind, model_path=model_path)
+                            for (row, job), p in zip(model_rows, probs)]
+        except Exception as e:
+            results += [_result(row, job, error=str(e)) for row, job in stat_rows]
+    return results
+
+def completed_keys(out_path: str) -> set:
+    """
+    keys of rows an earlier run already priced, dropping a line cut off by a crash
+
+    :param out_path: str, jsonl output of an earlier run
+    :return: set of job keys with a prob_over, rows that errored are retried
+    """
+    if not os.path.exists(out_path):
+        return set()
+
+    with open(out_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            # the last write never finished, cut it so appended rows start on a fresh line
+            f.truncate(data.rfind(b'\n') + 1)
+            data = data[:data.rfind(b'\n') + 1]
+
+    done = set()
+    for line in data.decode().splitlines():
+        record = json.loads(line)
+        if 'prob_over' in record:
+            done.add(record['key'])
+    return done
+
+def run_slate(slate_path: str, out_path: str = None, workers: int = None, threads_per_worker: int = 1,
+              train: bool = False, resume: bool = True) -> dict:
+    """
+    prices a slate across a process pool, streaming one jsonl line per row as players finish
+
+    only a few players per worker are in flight at once, so memory stays flat however
+    long the slate is, and every finished player is flushed to disk before the next
+
+    :param slate_path: str, csv or jsonl with player_name, stat_expr, line and optional games
+    :param out_path: optional str, jsonl to append to, stdout if not given
+    :param workers: int, worker processes, defaults to cores // threads_per_worker
+    :param threads_per_worker: int, native threads per worker
+    :param train: bool, train multi-line models for stat expressions without one
+    :param resume: bool, skip rows out_path already has a prediction for
+    :return: dict with rows, skipped, priced, errors and seconds
+    """
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    jobs = read_jobs(slate_path)
+    done = completed_keys(out_path) if out_path and resume else set()
+    groups = iter(group_slate(jobs, done))
+    skipped = sum(job_key(job) in done for job in jobs)
+
+    priced = errors = 0
+    start = time.perf_counter()
+    out = open(out_path, 'a') if out_path else sys.stdout
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_slate_worker,
+                                 initargs=(threads_per_worker,)) as pool:
+            in_flight = {}
+
+            def submit_next():
+                # keep each worker busy with one player and one queued, no more
+                while len(in_flight) < 2 * workers:
+                    group = next(groups, None)
+                    if group is None:
+                        return
+                    in_flight[pool.submit(score_player, group[0], group[1], train, threads_per_worker)] = group
+
+            submit_next()
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    player_name, rows = in_flight.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        results = [_result(row, job, error=str(e)) for row, job in rows]
+                    for result in results:
+                        out.write(json.dumps(result) + '\n')
+                        if 'error' in result:
+                            errors += 1
+                        else:
+                            priced += 1
+                    out.flush()
+                    if out_path:
+                        os.fsync(out.fileno())
+                submit_next()
+    finally:
+        if out_path:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {'rows': len(jobs), 'skipped': skipped, 'priced': priced, 'errors': errors, 'seconds': round(elapsed, 2)}
+    print(f"{priced} rows priced, {errors} errors, {skipped} already done, in {elapsed:.1f}s "
+          f"({priced / elapsed if elapsed else 0:.0f} rows/sec)", file=sys.stderr)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="price a slate of over/under lines, streaming jsonl as players finish")
+    parser.add_argument('slate', help="csv or jsonl with player_name, stat_expr, line and optional games")
+    parser.add_argument('--out', help="jsonl file to append to and resume from, stdout if not given")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads', type=int, default=1, help="native threads per worker")
+    parser.add_argument('--train', action='store_true', help="train multi-line models where none exist")
+    parser.add_argument('--no-resume', action='store_true', help="price every row even if --out has it")
+    args = parser.parse_args()
+
+    run_slate(args.slate, args.out, args.workers, args.threads, args.train, not args.no_resume)
@@ -0,0 +1,385 @@
+import hashlib
+import os
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from atomic_write import atomic_write
+from model_registry import file_hash
+from schema import TEAM_DATA_SCHEMA, read_csv
+
+TEAM_DATA_PATH = '../data/team_data.csv'
+TEAM_CACHE_DIR = '../data/team_cache'
+
+# team stats used by the winner model, in feature order
+STATS = ['PTS', 'REB', 'AST', 'STL', 'BLK', 'TOV']
+FEATURES = [f'{stat}_diff' for stat in STATS]
+
+# last snapshot loaded, keyed by the csv's path, mtime and size so it's only re-hashed after a refetch
+_snapshot_cache = {}
+_cache_lock = threading.Lock()
+
+def build_snapshot(team_data: pd.DataFrame) -> dict:
+    """
+    dense arrays of one team_data snapshot
+
+    :param team_data: DataFrame from fetch_team_data
+    :return: dict with team_ids, names, stats (n_teams x n_stats) and diffs (n_teams x n_teams x n_stats)
+    """
+    team_data = team_data.drop_duplicates(subset='TEAM_ID', keep='last')
+    stats = team_data[STATS].to_numpy(dtype=np.float64)
+    return {
+        'team_ids': team_data['TEAM_ID'].to_numpy(dtype=np.int64),
+        'names': team_data['TEAM_NAME'].to_numpy(dtype=str),
+        'stats': stats,
+        # [i, j] is team i's stats minus team j's, the model input for i hosting j
+        'diffs': stats[:, None, :] - stats[None, :, :],
+    }
+
+def _save_npz(path: str, **arrays):
+    with atomic_write(path, suffix='.npz') as tmp_path:
+        np.savez(tmp_path, **arrays)
+
+def snapshot_path(snapshot_hash: str) -> str:
+    return os.path.join(TEAM_CACHE_DIR, f"{snapshot_hash[:16]}.npz")
+
+def matrix_path(snapshot_hash: str, model_key: str) -> str:
+    return os.path.join(TEAM_CACHE_DIR, f"{snapshot_hash[:16]}_{model_key[:16]}.npz")
+
+def load_snapshot(path: str = TEAM_DATA_PATH) -> dict:
+    """
+    the team arrays of a team_data csv, built once per snapshot and stored keyed by its hash
+
+    :param path: str, team_data csv
+    :return: dict with hash, team_ids, names (list), stats, diffs, index (name -> row)
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        if _snapshot_cache.get('key') == key:
+            return _snapshot_cache['snapshot']
+
+    digest = file_hash(path)
+    cache_path = snapshot_path(digest)
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as stored:
+            arrays = {name: stored[name] for name in stored.files}
+    else:
+        arrays = build_snapshot(read_csv(path, TEAM_DATA_SCHEMA))
+        _save_npz(cache_path, **arrays)
+
+    names = arrays['names'].tolist()
+    snapshot = dict(arrays, hash=digest, names=names, index={name: i for i, name in enumerate(names)})
+    with _cache_lock:
+        _snapshot_cache['key'] = key
+        _snapshot_cache['snapshot'] = snapshot
+    return snapshot
+
+def team_rows(snapshot: dict, team_ids) -> np.ndarray:
+    """
+    row of each team id in the snapshot arrays
+
+    :param snapshot: dict from load_snapshot
+    :param team_ids: array-like of TEAM_IDs
+    :return: array of row indices, -1 for teams not in the snapshot
+    """
+    return pd.Index(snapshot['team_ids']).get_indexer(np.asarray(team_ids))
+
+def load_matrix(snapshot: dict, model_key: str):
+    """
+    :param snapshot: dict from load_snapshot
+    :param model_key: str, hash of the model that scored it
+    :return: stored probability matrix (n_teams x n_teams), or None
+    """
+    path = matrix_path(snapshot['hash'], model_key)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as stored:
+        return stored['matrix']
+
+def save_matrix(snapshot: dict, model_key: str, matrix: np.ndarray):
+    _save_npz(matrix_path(snapshot['hash'], model_key), matrix=matrix)
+
+def season_of(game_data: pd.DataFrame) -> np.ndarray:
+    """
+    start year of the season each game belongs to
+
+    nba game ids carry it in digits 4-5 ('0022400061' is 2024-25), which also keeps
+    late playoff and bubble games in their own season; without ids, seasons tip off in october
+
+    :param game_data: DataFrame with GAME_ID or GAME_DATE
+    :return: array of int years
+    """
+    if 'GAME_ID' in game_data:
+        # csv round trips drop the leading zeros
+        years = game_data['GAME_ID'].astype(str).str.zfill(10).str[3:5].astype(int).to_numpy()
+        return np.where(years >= 46, 1900 + years, 2000 + years)
+    dates = pd.to_datetime(game_data['GAME_DATE'])
+    return np.where(dates.dt.month >= 10, dates.dt.year, dates.dt.year - 1)
+
+def team_games(game_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    one row per team per game, in date order
+
+    :param game_data: DataFrame from fetch_game_data
+    :return: DataFrame with ROW (position in game_data), SIDE, TEAM_ID, SEASON, GAME_DATE and the box score stats
+    """
+    rows = np.arange(len(game_data))
+    season = season_of(game_data)
+    dates = pd.to_datetime(game_data['GAME_DATE']).to_numpy()
+    sides = []
+    for side in ('HOME', 'AWAY'):
+        part = pd.DataFrame({
+            'ROW': rows,
+            'SIDE': side,
+            'TEAM_ID': game_data[f'TEAM_ID_{side}'].to_numpy(),
+            'SEASON': season,
+            'GAME_DATE': dates,
+        })
+        for stat in STATS:
+            part[stat] = game_data[f'{stat}_{side}'].to_numpy(dtype=np.float64)
+        sides.append(part)
+    return pd.concat(sides, ignore_index=True).sort_values(['GAME_DATE', 'ROW'], kind='stable')
+
+def team_form(game_data: pd.DataFrame, window: int = None, by_season: bool = True, min_games: int = 1) -> pd.DataFrame:
+    """
+    each team's per-game averages over its earlier games, as of every game
+
+    one sorted pass: running totals per team minus the current game, and for a rolling
+    window minus the totals `window` games back, so no game is ever recomputed
+
+    :param game_data: DataFrame from fetch_game_data, must include GAME_DATE
+    :param window: optional int, average the last `window` games instead of all earlier ones
+    :param by_season: bool, start every team from zero each season
+    :param min_games: int, earlier games required, rows with fewer are NaN
+    :return: DataFrame aligned to game_data with {stat}_HOME_FORM, {stat}_AWAY_FORM, GAMES_HOME_FORM and GAMES_AWAY_FORM
+    """
+    games = team_games(game_data)
+    keys = [games['TEAM_ID'], games['SEASON']] if by_season else [games['TEAM_ID']]
+    by_team = games.groupby(keys, sort=False)
+
+    # totals up to, not including, the current game
+    played = by_team.cumcount().to_numpy()
+    prior = by_team[STATS].cumsum().to_numpy() - games[STATS].to_numpy()
+    if window:
+        lagged = pd.DataFrame(prior, index=games.index).groupby(keys, sort=False).shift(window, fill_value=0.0)
+        prior = prior - lagged.to_numpy()
+        played = np.minimum(played, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = prior / np.where(played >= max(min_games, 1), played, np.nan)[:, None]
+
+    form = {}
+    rows = games['ROW'].to_numpy()
+    for side in ('HOME', 'AWAY'):
+        on_side = (games['SIDE'] == side).to_numpy()
+        values = np.empty((len(game_data), len(STATS)))
+        values[rows[on_side]] = averages[on_side]
+        counts = np.empty(len(game_data), dtype=np.int64)
+        counts[rows[on_side]] = played[on_side]
+        for j, stat in enumerate(STATS):
+            form[f'{stat}_{side}_FORM'] = values[:, j]
+        form[f'GAMES_{side}_FORM'] = counts
+    return pd.DataFrame(form, index=game_data.index)
+
+class TeamFormState:
+    """
+    incremental per-team form, the same averages team_form gives for each team's next game.
+
+    keeps running totals (or the last `window` games) per team, so a new game costs
+    O(n_stats) instead of a pass over the whole log.
+    """
+
+    def __init__(self, window: int = None, by_season: bool = True):
+        self.window = window
+        self.by_season = by_season
+        # team id -> {'season', 'totals', 'games' (recent rows, rolling only), 'count'}
+        self.teams = {}
+
+    @classmethod
+    def from_games(cls, game_data: pd.DataFrame, window: int = None, by_season: bool = True):
+        """
+        builds state from a stored game log in one vectorized pass
+
+        :param game_data: DataFrame from fetch_game_data, must include GAME_DATE
+        :param window: optional int, rolling window instead of season to date
+        :param by_season: bool, start every team from zero each season
+        :return: TeamFormState
+        """
+        state = cls(window, by_season)
+        games = team_games(game_data)
+        if by_season:
+            # only each team's latest season counts toward its current form
+            latest = games.groupby('TEAM_ID')['SEASON'].transform('max')
+            games = games[games['SEASON'] == latest]
+        for team_id, team in games.groupby('TEAM_ID', sort=False):
+            recent = team[STATS].to_numpy()
+            if window:
+                recent = recent[-window:]
+            state.teams[team_id] = {
+                'season': int(team['SEASON'].iloc[-1]),
+                'totals': recent.sum(axis=0),
+                'games': list(recent) if window else None,
+                'count': len(recent),
+            }
+        return state
+
+    def _team(self, team_id, season: int = None):
+        team = self.teams.get(team_id)
+        if team is None or (self.by_season and season is not None and team['season'] != season):
+            return None
+        return team
+
+    def update(self, game, season: int = None) -> None:
+        """
+        adds one finished game for both teams, a row of game_data as a dict or Series
+
+        :param game: dict or Series with GAME_ID or GAME_DATE, team ids and home/away stats
+        :param season: optional int, the game's season if already known, see season_of
+        """
+        if season is None:
+            fields = {name: [game[name]] for name in ('GAME_ID', 'GAME_DATE') if name in game}
+            season = int(season_of(pd.DataFrame(fields))[0])
+        for side in ('HOME', 'AWAY'):
+            team_id = game[f'TEAM_ID_{side}']
+            row = np.array([float(game[f'{stat}_{side}']) for stat in STATS])
+            team = self._team(team_id, season)
+            if team is None:
+                team = self.teams[team_id] = {'season': season, 'totals': np.zeros(len(STATS)),
+                                              'games': [] if self.window else None, 'count': 0}
+            team['totals'] = team['totals'] + row
+            team['count'] += 1
+            if self.window:
+                team['games'].append(row)
+                if len(team['games']) > self.window:
+                    team['totals'] = team['totals'] - team['games'].pop(0)
+                    team['count'] -= 1
+
+    def games_played(self, team_id, season: int = None) -> int:
+        """
+        :param team_id: int, TEAM_ID
+        :param season: optional int, only count games of this season
+        :return: int, games behind the team's form, at most `window`
+        """
+        team = self._team(team_id, season)
+        return 0 if team is None else team['count']
+
+    def form(self, team_id, season: int = None) -> np.ndarray:
+        """
+        :param team_id: int, TEAM_ID
+        :param season: optional int, only games of this season count
+        :return: array of per-game averages in STATS order, NaN for a team with no games
+        """
+        team = self._team(team_id, season)
+        if team is None or team['count'] == 0:
+            return np.full(len(STATS), np.nan)
+        return team['totals'] / team['count']
+
+    def features(self, home_id, away_id, season: int = None) -> dict:
+        """
+        :return: dict of feature name -> home minus away form, the winner model's input
+        """
+        return dict(zip(FEATURES, self.form(home_id, season) - self.form(away_id, season)))
+
+def form_cache_path(window: int = None, by_season: bool = True) -> str:
+    return os.path.join(TEAM_CACHE_DIR, f"form_{window or 'season'}{'' if by_season else '_all'}.pkl")
+
+def _games_digest(game_data: pd.DataFrame) -> str:
+    # identity of a list of games and their box scores, in the order team_form takes them
+    columns = ['GAME_ID', 'GAME_DATE'] + [f'{name}_{side}' for side in ('HOME', 'AWAY') for name in ['TEAM_ID'] + STATS]
+    games = game_data[columns].assign(GAME_DATE=pd.to_datetime(game_data['GAME_DATE']))
+    games = games.sort_values('GAME_DATE', kind='stable')
+    return hashlib.sha256(pd.util.hash_pandas_object(games, index=False).to_numpy().tobytes()).hexdigest()
+
+def incremental_team_form(game_data: pd.DataFrame, window: int = None, by_season: bool = True,
+                          min_games: int = 1) -> pd.DataFrame:
+    """
+    team_form, reusing the forms stored by an earlier call and stepping a TeamFormState
+    through only the games added since
+
+    the stored forms are reused when every game they cover is still in game_data, unchanged
+    and in the same order, and the new games come no earlier than the latest stored one, as
+    after fetch_game_data appends a night of games; anything else recomputes with team_form
+
+    :param game_data: DataFrame from fetch_game_data, must include GAME_ID and GAME_DATE
+    :param window: optional int, average the last `window` games instead of all earlier ones
+    :param by_season: bool, start every team from zero each season
+    :param min_games: int, earlier games required, rows with fewer are NaN
+    :return: DataFrame like team_form's, aligned to game_data
+    """
+    game_ids = game_data['GAME_ID'].astype(str).str.zfill(10).to_numpy()
+    if not pd.Index(game_ids).is_unique:
+        return team_form(game_data, window, by_season, min_games)
+    dates = pd.to_datetime(game_data['GAME_DATE'])
+    path = form_cache_path(window, by_season)
+    stored = joblib.load(path) if os.path.exists(path) else None
+
+    new = None
+    if stored is not None:
+        known = pd.Index(game_ids).isin(stored['form'].index)
+        if (known.sum() == len(stored['form'])
+                and _games_digest(game_data[known]) == stored['digest']
+                and (known.all() or dates[~known].min() >= stored['last_date'])):
+            new = ~known
+
+    if new is None:
+        # nothing to build on, one vectorized pass over every game
+        form = team_form(game_data, window, by_season).set_axis(game_ids)
+        state = TeamFormState.from_games(game_data, window, by_season)
+    else:
+        state = stored['state']
+        new_games = game_data[new].assign(SEASON=season_of(game_data[new]), DATE=dates[new])
+        new_games = new_games.sort_values('DATE', kind='stable')
+        rows = []
+        for _, game in new_games.iterrows():
+            season = int(game['SEASON'])
+            row = {}
+            for side in ('HOME', 'AWAY'):
+                team_id = game[f'TEAM_ID_{side}']
+                row.update(zip([f'{stat}_{side}_FORM' for stat in STATS], state.form(team_id, season)))
+                row[f'GAMES_{side}_FORM'] = state.games_played(team_id, season)
+            rows.append(row)
+            state.update(game, season)
+        added = pd.DataFrame(rows, columns=stored['form'].columns)
+        form = pd.DataFrame({column: np.concatenate([stored['form'][column].to_numpy(), added[column].to_numpy()])
+                             for column in added.columns},
+                            index=np.concatenate([stored['form'].index.to_numpy(),
+                                                  new_games['GAME_ID'].astype(str).str.zfill(10).to_numpy()]))
+
+    if new is None or new.any():
+        with atomic_write(path, suffix='.pkl') as tmp_path:
+            joblib.dump({'form': form, 'state': state, 'digest': _games_digest(game_data),
+                         'last_date': dates.max()}, tmp_path)
+
+    form = form.loc[game_ids].set_axis(game_data.index)
+    for side in ('HOME', 'AWAY'):
+        short = form[f'GAMES_{side}_FORM'].to_numpy() < max(min_games, 1)
+        form.loc[short, [f'{stat}_{side}_FORM' for stat in STATS]] = np.nan
+    return form
+
+def form_features(game_data: pd.DataFrame, window: int = None, min_games: int = 5) -> tuple:
+    """
+    winner model inputs from point-in-time form, home minus away like the snapshot diffs
+
+    forms of games seen by an earlier call are reused, so after new games are fetched
+    only those games are added, see incremental_team_form
+
+    :param game_data: DataFrame from fetch_game_data, must include GAME_DATE
+    :param window: optional int, rolling window instead of season to date
+    :param min_games: int, earlier games both teams need for a row to count
+    :return: tuple of (DataFrame of FEATURES aligned to game_data, bool array of rows with enough history)
+    """
+    if 'GAME_ID' in game_data:
+        form = incremental_team_form(game_data, window, min_games=min_games)
+    else:
+        form = team_form(game_data, window, min_games=min_games)
+    X = pd.DataFrame({
+        feature: form[f'{stat}_HOME_FORM'] - form[f'{stat}_AWAY_FORM'] for stat, feature in zip(STATS, FEATURES)
+    }, index=game_data.index)
+    return X, X.notna().all(axis=1).to_numpy()
+
+if __name__ == "__main__":
+    from predict_winner import probability_matrix, winner_model_path
+
+    snapshot, matrix = probability_matrix()
+    print(f"{len(snapshot['names'])} teams from snapshot {snapshot['hash'][:16]}, "
+          f"probability matrix for {winner_model_path()} cached in {TEAM_CACHE_DIR}")
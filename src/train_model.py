@@ -3,37 +3,44 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
+from compiled_model import export_model
+from model_registry import register_model, file_hash
+from team_features import FEATURES, load_snapshot, team_rows, form_features
+from predict_winner import probability_matrix
+from schema import GAME_DATA_SCHEMA, read_csv
 
-# load data
-team_data = pd.read_csv('../data/team_data.csv')
-game_data = pd.read_csv('../data/game_data.csv')
+# load data, only the columns the model uses at their compact dtypes
+game_data = read_csv('../data/game_data.csv', GAME_DATA_SCHEMA)
+# files the model is trained from, its registered data hash covers exactly these
+inputs = ['../data/game_data.csv']
 
 # drop duplicates if any exist
 game_data = game_data.drop_duplicates()
-team_data = team_data.drop_duplicates()
 
-# merge team stats with game data
-game_data = game_data.merge(team_data, left_on='TEAM_ID_HOME', right_on='TEAM_ID', suffixes=('', '_HOME'))
-game_data = game_data.merge(team_data, left_on='TEAM_ID_AWAY', right_on='TEAM_ID', suffixes=('', '_AWAY'))
+if 'GAME_DATE' in game_data:
+    # order games in time so the test set is the latest games, not a shuffle of the season
+    game_data = game_data.sort_values('GAME_DATE', kind='stable').reset_index(drop=True)
 
-# remove duplicate columns
-if game_data.columns.duplicated().sum() > 0:
-    game_data = game_data.loc[:, ~game_data.columns.duplicated()]
-
-# stat differences
-game_data['PTS_diff'] = game_data['PTS_HOME'] - game_data['PTS_AWAY']
-game_data['REB_diff'] = game_data['REB_HOME'] - game_data['REB_AWAY']
-game_data['AST_diff'] = game_data['AST_HOME'] - game_data['AST_AWAY']
-game_data['STL_diff'] = game_data['STL_HOME'] - game_data['STL_AWAY']
-game_data['BLK_diff'] = game_data['BLK_HOME'] - game_data['BLK_AWAY']
-game_data['TOV_diff'] = game_data['TOV_HOME'] - game_data['TOV_AWAY']
+    # stat differences of both teams' per-game averages over their earlier games that season,
+    # so no game is described with stats from after it was played
+    X, known = form_features(game_data)
+    game_data = game_data[known].reset_index(drop=True)
+    X = X[known].reset_index(drop=True)
+else:
+    # written before GAME_DATE was stored, fall back to the season snapshot's diff tensor
+    snapshot = load_snapshot('../data/team_data.csv')
+    inputs.append('../data/team_data.csv')
+    home = team_rows(snapshot, game_data['TEAM_ID_HOME'])
+    away = team_rows(snapshot, game_data['TEAM_ID_AWAY'])
+    known = (home >= 0) & (away >= 0)
+    game_data = game_data[known].reset_index(drop=True)
+    X = pd.DataFrame(snapshot['diffs'][home[known], away[known]], columns=FEATURES)
 
 # prepare features
-X = game_data[['PTS_diff', 'REB_diff', 'AST_diff', 'STL_diff', 'BLK_diff', 'TOV_diff']]
 y = game_data['HOME_WIN']
 
 # split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
 
 # train
 model = RandomForestClassifier(random_state=42)
@@ -46,4 +53,17 @@ print(classification_report(y_test, y_pred))
 
 # save model to file
 joblib.dump(model, '../models/nba_prediction_model.pkl')
-print("\nmodel exported to '../models/nba_prediction_model.pkl'")
\ No newline at end of file
+print("\nmodel exported to '../models/nba_prediction_model.pkl'")
+
+# compiled copy for fast scoring without sklearn
+export_model(model, '../models/nba_prediction_model.npz')
+print("compiled model exported to '../models/nba_prediction_model.npz'")
+
+# versioned copy keyed by the data it was trained on
+register_model(model, 'league', 'HOME_WIN', family='winner', games=None,
+               data_hash=file_hash(*inputs),
+               metrics={'accuracy': round(float(accuracy_score(y_test, y_pred)), 4)})
+
+# score every pairing of the snapshot once, predictions and brackets read the stored matrix
+probability_matrix()
+print("probability matrix cached for the current team snapshot")
\ No newline at end of file
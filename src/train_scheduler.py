@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from atomic_write import write_json
+
+MANIFEST_PATH = '../models/train_manifest.json'
+
+def job_key(job: dict) -> str:
+    """
+    stable key for a training job
+
+    :param job: dict with player_name, stat_expr, optional line (None for multi-line) and games
+    :return: str
+    """
+    line = job.get('line')
+    line_part = 'multiline' if line is None else f"line={line}"
+    return f"{job['player_name']}|{job['stat_expr']}|{line_part}|games={job.get('games', 10)}"
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """
+    :param path: str, manifest location
+    :return: dict of job key -> {'data_hash', 'model_path', 'trained_at', 'seconds'}
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def _write_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    write_json(path, manifest, sort_keys=True)
+
+def _init_worker(threads: int):
+    # cap every native thread pool in the worker before numpy/xgboost spin theirs up
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+def _run_job(job: dict, threads: int, search: str = 'grid', force: bool = False) -> dict:
+    """
+    trains one job inside a worker process
+
+    :param job: dict, see job_key
+    :param threads: int, thread budget for this worker
+    :param search: str, 'grid' or 'halving', see over_under_model._fit
+    :param force: bool, retrain even if a model for the same data is registered
+    :return: dict with the registered model path and training time
+    """
+    from over_under_model import generate_player_model, generate_multiline_model
+
+    start = time.perf_counter()
+    if job.get('line') is None:
+        model_path = generate_multiline_model(job['player_name'], job['stat_expr'], games=job.get('games', 10),
+                                              force_retrain=force, threads=threads, search=search)
+    else:
+        model_path = generate_player_model(job['player_name'], line=job['line'], stat_expr=job['stat_expr'],
+                                           games=job.get('games', 10), force_retrain=force, threads=threads,
+                                           search=search)
+    return {'model_path': model_path, 'seconds': time.perf_counter() - start}
+
+def schedule_training(jobs: list, workers: int = None, threads_per_worker: int = 1, force: bool = False,
+                      manifest_path: str = MANIFEST_PATH, search: str = 'grid') -> dict:
+    """
+    trains many over/under models across a process pool with an explicit thread budget
+
+    jobs with a registered model trained on the current player data are skipped, the same
+    check the training functions make. models are registered atomically by the training
+    functions and the manifest is only updated by this process, after each job succeeds.
+
+    :param jobs: list of dicts with player_name, stat_expr, optional line (None for multi-line) and games
+    :param workers: int, worker processes, defaults to cores // threads_per_worker
+    :param threads_per_worker: int, threads each worker may use for grid search and xgboost
+    :param force: bool, retrain even when data is unchanged
+    :param manifest_path: str, where data hashes and registered model paths of trained jobs are recorded
+    :param search: str, 'grid' for full grid searches, 'halving' to scale search cost with the data change
+    :return: dict with trained, skipped and failed counts
+    """
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    from over_under_model import _registered
+
+    manifest = load_manifest(manifest_path)
+
+    # skip jobs whose input data hasn't changed since their model was registered
+    pending = []
+    failed = 0
+    for job in jobs:
+        key = job_key(job)
+        try:
+            _, data_hash, entry = _registered(job['player_name'], job['stat_expr'], job.get('line'),
+                                              job.get('games', 10), force)
+        except FileNotFoundError as e:
+            print(f"skipping {key}: {e}")
+            failed += 1
+            continue
+        if entry is not None:
+            continue
+        pending.append((job, key, data_hash))
+
+    skipped = len(jobs) - len(pending) - failed
+    print(f"{len(pending)} jobs to train, {skipped} unchanged, {workers} workers x {threads_per_worker} threads")
+
+    trained = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+        futures = {pool.submit(_run_job, job, threads_per_worker, search, force): (key, data_hash) for job, key, data_hash in pending}
+        for future in as_completed(futures):
+            key, data_hash = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"failed to train {key}: {e}")
+                failed += 1
+                continue
+
+            manifest[key] = {
+                'data_hash': data_hash,
+                'model_path': result['model_path'],
+                'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'seconds': round(result['seconds'], 2),
+            }
+            _write_manifest(manifest, manifest_path)
+            trained += 1
+
+    elapsed = time.perf_counter() - start
+    print(f"trained {trained} models in {elapsed:.1f}s ({skipped} skipped, {failed} failed)")
+    return {'trained': trained, 'skipped': skipped, 'failed': failed, 'seconds': elapsed}
+
+def read_jobs(path: str) -> list:
+    """
+    reads jobs from a csv or jsonl file with player_name (or player), stat_expr and optional line and games columns
+
+    :param path: str, job file
+    :return: list of job dicts
+    """
+    import pandas as pd
+
+    if path.endswith('.jsonl'):
+        jobs = pd.read_json(path, lines=True)
+    else:
+        jobs = pd.read_csv(path)
+    records = []
+    for row in jobs.to_dict('records'):
+        line = row.get('line')
+        records.append({
+            'player_name': row['player_name'] if 'player_name' in row else row['player'],
+            'stat_expr': row['stat_expr'],
+            'line': None if line is None or pd.isna(line) else float(line),
+            'games': int(row['games']) if 'games' in row and not pd.isna(row['games']) else 10,
+        })
+    return records
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="train over/under models for many players in parallel")
+    parser.add_argument('jobs', help="csv or jsonl with player_name, stat_expr and optional line (blank for multi-line) and games")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads', type=int, default=1, help="threads per worker")
+    parser.add_argument('--force', action='store_true', help="retrain even when data is unchanged")
+    parser.add_argument('--search', choices=['grid', 'halving'], default='grid',
+                        help="halving reuses or narrows the last best params when little data changed")
+    args = parser.parse_args()
+
+    schedule_training(read_jobs(args.jobs), workers=args.workers, threads_per_worker=args.threads, force=args.force,
+                      search=args.search)
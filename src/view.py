@@ -1,10 +1,32 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import messagebox
 
-from data_generation import fetch_player_data
-from over_under_model import generate_player_model
-from predict_over_under import predict_over_under
+from query_runner import ResultCache, run_query
+from instrumentation import stage
+
+SEASONS = ['2023-24', '2024-25']
+GAMES = 10
+
+# queries run two at a time, each training with its share of the cores
+WORKERS = 2
+THREADS_PER_QUERY = max(1, (os.cpu_count() or 1) // WORKERS)
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="query")
+result_cache = ResultCache()
+
+# worker threads never touch tk, they post (row id, event, value) here for the main loop
+events = queue.Queue()
+# one cancel flag per submitted batch, and the futures still pending
+batches = []
+pending = {}
+progress_counts = {'total': 0, 'done': 0}
+STAGE_LABELS = {'fetch': "fetching...", 'train': "training...", 'predict': "predicting..."}
 
 def build_stat_expr():
     parts = []
@@ -13,34 +35,140 @@ def build_stat_expr():
     if ast_var.get(): parts.append("AST")
     return "+".join(parts)
 
-def run_prediction():
-    player = player_entry.get().strip()
-    try:
-        line = float(line_entry.get())
-    except ValueError:
-        messagebox.showerror("Input Error", "Line must be a number.")
-        return
-
-    stat_expr = build_stat_expr()
-    if not stat_expr:
-        messagebox.showerror("Input Error", "Select at least one stat (PTS, REB, AST).")
+def parse_batch(text: str, default_stat_expr: str) -> list:
+    """
+    one query per non-empty line, as 'player, line' or 'player, line, stat_expr'
+
+    :param text: str, contents of the batch box
+    :param default_stat_expr: str, stat expression for lines that don't give one
+    :return: list of (player, stat_expr, line) tuples
+    """
+    queries = []
+    for number, row in enumerate(text.splitlines(), start=1):
+        if not row.strip():
+            continue
+        parts = [part.strip() for part in row.split(",")]
+        if len(parts) not in (2, 3) or not parts[0]:
+            raise ValueError(f"Batch line {number}: expected 'player, line' or 'player, line, stat'.")
+        try:
+            line = float(parts[1])
+        except ValueError:
+            raise ValueError(f"Batch line {number}: line must be a number.")
+        stat_expr = parts[2].upper().replace(" ", "") if len(parts) == 3 and parts[2] else default_stat_expr
+        if not stat_expr:
+            raise ValueError(f"Batch line {number}: select at least one stat or give one on the line.")
+        queries.append((parts[0], stat_expr, line))
+    return queries
+
+def _run_query(row_id, player, stat_expr, line, refresh, cancelled):
+    # runs on a worker thread
+    if cancelled.is_set():
+        events.put((row_id, 'cancelled', None))
         return
-
     try:
-        full_name = fetch_player_data(player, seasons=['2023-24', '2024-25'], force_refresh=refresh_var.get())
-        generate_player_model(full_name, line=line, stat_expr=stat_expr, games=10, force_retrain=refresh_var.get())
-        prob = predict_over_under(full_name, stat_expr=stat_expr, line=line, games=10)
-        if prob is not None:
-            prediction = "OVER" if prob > 0.5 else "UNDER"
-            result_label.config(
-                text=f"{prediction} ({prob:.2f})",
-                bootstyle="success" if prediction == "OVER" else "danger"
-            )
+        with stage('run_prediction'):
+            result = run_query(player, stat_expr, line, games=GAMES, seasons=SEASONS, refresh=refresh,
+                               cache=result_cache, threads=THREADS_PER_QUERY, cancelled=cancelled,
+                               progress=lambda step: events.put((row_id, 'stage', step)))
+        events.put((row_id, 'cancelled', None) if result is None else (row_id, 'result', result))
     except Exception as e:
-        messagebox.showerror("Error", str(e))
+        events.put((row_id, 'error', str(e)))
 
-app = ttk.Window(title="NBA Over/Under Predictor", themename="darkly", size=(400, 400))
-app.resizable(False, False)
+def run_prediction():
+    stat_expr = build_stat_expr()
+    batch_text = batch_text_box.get("1.0", "end").strip()
+
+    if batch_text:
+        try:
+            queries = parse_batch(batch_text, stat_expr)
+        except ValueError as e:
+            messagebox.showerror("Input Error", str(e))
+            return
+    else:
+        player = player_entry.get().strip()
+        try:
+            line = float(line_entry.get())
+        except ValueError:
+            messagebox.showerror("Input Error", "Line must be a number.")
+            return
+        if not stat_expr:
+            messagebox.showerror("Input Error", "Select at least one stat (PTS, REB, AST).")
+            return
+        queries = [(player, stat_expr, line)]
+
+    # queue the batch, the window stays responsive while it runs
+    cancelled = threading.Event()
+    batches.append(cancelled)
+    refresh = refresh_var.get()
+    for player, query_stat_expr, line in queries:
+        row_id = results_view.insert("", "end", values=(player, query_stat_expr, line, "queued"))
+        pending[row_id] = executor.submit(_run_query, row_id, player, query_stat_expr, line, refresh, cancelled)
+    progress_counts['total'] += len(queries)
+    _update_progress()
+
+def cancel_all():
+    for cancelled in batches:
+        cancelled.set()
+    # queued queries never start, running ones stop at their next stage
+    for row_id, future in list(pending.items()):
+        if future.cancel():
+            events.put((row_id, 'cancelled', None))
+    status_label.config(text="cancelling...")
+
+def _finish(row_id, status, tag):
+    results_view.set(row_id, "status", status)
+    results_view.item(row_id, tags=(tag,))
+    pending.pop(row_id, None)
+    progress_counts['done'] += 1
+
+def _update_progress(current=""):
+    total, done = progress_counts['total'], progress_counts['done']
+    progress_bar.config(value=100 * done / total if total else 0)
+    if total and done == total:
+        status_label.config(text=f"{done}/{total} done")
+        batches.clear()
+    elif total:
+        status_label.config(text=f"{done}/{total} done{', ' + current if current else ''}")
+
+def poll_events():
+    current = ""
+    while True:
+        try:
+            row_id, kind, value = events.get_nowait()
+        except queue.Empty:
+            break
+        if not results_view.exists(row_id) or row_id not in pending:
+            continue
+        player = results_view.set(row_id, "player")
+        if kind == 'stage':
+            results_view.set(row_id, "status", STAGE_LABELS[value])
+            current = f"{value} {player}"
+        elif kind == 'result':
+            prediction = "OVER" if value['prob'] > 0.5 else "UNDER"
+            cached = " (cached)" if value['cached'] else ""
+            _finish(row_id, f"{prediction} {value['prob']:.2f}{cached}", prediction.lower())
+        elif kind == 'error':
+            _finish(row_id, f"error: {value}", 'error')
+        else:
+            _finish(row_id, "cancelled", 'cancelled')
+    _update_progress(current)
+    app.after(100, poll_events)
+
+def clear_results():
+    for row_id in results_view.get_children():
+        if row_id not in pending:
+            results_view.delete(row_id)
+    progress_counts['total'] = len(pending)
+    progress_counts['done'] = 0
+    _update_progress()
+
+def on_close():
+    cancel_all()
+    executor.shutdown(wait=False, cancel_futures=True)
+    app.destroy()
+
+app = ttk.Window(title="NBA Over/Under Predictor", themename="darkly", size=(520, 720))
+app.resizable(False, True)
 
 main = ttk.Frame(app, padding=15)
 main.pack(fill="both", expand=True)
@@ -69,15 +197,40 @@ line_group.pack(fill="x", pady=5)
 line_entry = ttk.Entry(line_group)
 line_entry.pack(fill="x")
 
+# batch input, used instead of the fields above when filled in
+batch_group = ttk.Labelframe(main, text="Batch (one 'player, line[, stat]' per line)", padding=10)
+batch_group.pack(fill="x", pady=5)
+batch_text_box = ttk.Text(batch_group, height=4)
+batch_text_box.pack(fill="x")
+
 # refresh
 refresh_var = ttk.BooleanVar()
 ttk.Checkbutton(main, text="Force Refresh Data/Model", variable=refresh_var).pack(anchor="w", pady=(5, 10))
 
-# run button
-ttk.Button(main, text="Run Prediction", command=run_prediction, bootstyle="primary").pack(fill="x")
-
-# result label
-result_label = ttk.Label(main, text="", font=("Segoe UI", 12, "bold"), anchor="center", justify="center")
-result_label.pack(pady=15)
-
-app.mainloop()
\ No newline at end of file
+# run / cancel buttons
+button_row = ttk.Frame(main)
+button_row.pack(fill="x")
+ttk.Button(button_row, text="Run Prediction", command=run_prediction, bootstyle="primary").pack(side="left", fill="x", expand=True)
+ttk.Button(button_row, text="Cancel", command=cancel_all, bootstyle="secondary").pack(side="left", padx=(5, 0))
+ttk.Button(button_row, text="Clear", command=clear_results, bootstyle="secondary").pack(side="left", padx=(5, 0))
+
+# progress
+progress_bar = ttk.Progressbar(main, maximum=100, bootstyle="info")
+progress_bar.pack(fill="x", pady=(10, 0))
+status_label = ttk.Label(main, text="", anchor="w")
+status_label.pack(fill="x")
+
+# results, one row per query
+results_view = ttk.Treeview(main, columns=("player", "stat", "line", "status"), show="headings", height=8)
+for column, heading, width in (("player", "Player", 170), ("stat", "Stat", 90), ("line", "Line", 60), ("status", "Result", 150)):
+    results_view.heading(column, text=heading)
+    results_view.column(column, width=width, anchor="w")
+results_view.tag_configure('over', foreground="#00bc8c")
+results_view.tag_configure('under', foreground="#e74c3c")
+results_view.tag_configure('error', foreground="#f39c12")
+results_view.tag_configure('cancelled', foreground="#888888")
+results_view.pack(fill="both", expand=True, pady=10)
+
+app.protocol("WM_DELETE_WINDOW", on_close)
+app.after(100, poll_events)
+app.mainloop()
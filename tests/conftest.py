@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# the modules in src are scripts imported by bare name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from schema import COUNT_STATS, PCT_STATS
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    runs a test from a scratch directory, so the scripts' ../data and ../models paths land in tmp_path
+
+    the registry resolves its directory once at import, so it's pointed at tmp_path/models too
+    """
+    import model_registry
+
+    run_dir = tmp_path / 'run'
+    run_dir.mkdir()
+    (tmp_path / 'data').mkdir()
+    models_dir = tmp_path / 'models'
+    models_dir.mkdir()
+    monkeypatch.chdir(run_dir)
+
+    monkeypatch.setenv('NBA_MODELS_DIR', str(models_dir))
+    monkeypatch.setattr(model_registry, 'MODELS_DIR', str(models_dir))
+    monkeypatch.setattr(model_registry, 'REGISTRY_DIR', str(models_dir / 'registry'))
+    monkeypatch.setattr(model_registry, 'INDEX_PATH', str(models_dir / 'registry' / 'index.json'))
+    monkeypatch.setattr(model_registry, '_index_cache', {})
+    return tmp_path
+
+def _game_log(n_games=40, seed=0) -> pd.DataFrame:
+    # a playergamelog-shaped log with every box score stat
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2023-10-24', periods=n_games, freq='2D')
+    log = pd.DataFrame({
+        'Player_ID': 7,
+        'Game_ID': [f"00223{g:05d}" for g in range(n_games)],
+        'GAME_DATE': dates.strftime('%b %d, %Y').str.upper(),
+        'SEASON': '2023-24',
+        'MATCHUP': rng.choice(['LAL vs. BOS', 'LAL @ DEN'], n_games),
+        'WL': rng.choice(['W', 'L'], n_games),
+        'MIN': rng.integers(20, 40, n_games),
+    })
+    for stat in COUNT_STATS:
+        log[stat] = rng.integers(0, 12, n_games)
+    for stat in PCT_STATS:
+        # a game without attempts has no percentage
+        log[stat] = np.where(rng.random(n_games) < 0.1, np.nan, rng.random(n_games).round(3))
+    return log
+
+@pytest.fixture
+def game_log():
+    """
+    builds synthetic player game logs, game_log(n_games, seed)
+    """
+    return _game_log
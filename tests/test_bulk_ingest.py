@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pandas as pd
+import pytest
+
+from bulk_ingest import ingest_players, Checkpoint
+from game_log_store import read_player_log
+
+SEASON = '2023-24'
+DAY = date(2023, 11, 5)
+
+class StubStats:
+    """
+    local stand-in for the stats api: answers every first request for a player with a 429,
+    keeps failing the players in `down`, and records when each request arrived
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.down = set()
+        self._seen = set()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                player_id = int(self.path.rsplit('/', 1)[-1])
+                with stub._lock:
+                    stub.requests.append((time.monotonic(), player_id))
+                    first = player_id not in stub._seen
+                    stub._seen.add(player_id)
+                if first or player_id in stub.down:
+                    self.send_response(429)
+                    self.end_headers()
+                    return
+                body = json.dumps(stub.game_log(player_id)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def game_log(player_id: int) -> list:
+        return [{'Player_ID': player_id, 'Game_ID': f"00223000{g:02d}", 'GAME_DATE': f"NOV {g + 1:02d}, 2023",
+                 'MATCHUP': 'LAL vs. BOS', 'MIN': 30, 'PTS': 20 + g, 'REB': 5, 'AST': 4}
+                for g in range(3)]
+
+    def fetch(self, player_id, season, date_from):
+        # the fetch callable ingest_players drives, like fetch_player_season against the real api
+        with urlopen(f"{self.url}/playergamelog/{player_id}") as response:
+            games = pd.DataFrame(json.load(response))
+        games['SEASON'] = season
+        return games
+
+    def count(self, player_id) -> int:
+        return sum(pid == player_id for _, pid in self.requests)
+
+@pytest.fixture
+def stub():
+    stub = StubStats()
+    yield stub
+    stub.server.shutdown()
+
+ROSTER = [{'id': i, 'full_name': f"Stub Player {i}"} for i in range(1, 5)]
+
+def test_retries_take_tokens_and_checkpoint_resumes(workdir, stub, monkeypatch):
+    # retry almost at once, so only the token bucket can hold the retries back
+    monkeypatch.setattr('bulk_ingest.random.uniform', lambda a, b: 0.01)
+    rate = 4.0
+    stub.down = {4}
+    checkpoint_path = str(workdir / 'data' / 'checkpoint.json')
+
+    result = ingest_players(ROSTER, seasons=[SEASON], incremental=False, workers=4, rate=rate, retries=1,
+                            checkpoint_path=checkpoint_path, fetch=stub.fetch, day=DAY)
+
+    # every player was throttled once and retried, player 4 stayed down through its only retry
+    assert result['completed'] == 3
+    assert result['failed'] == 1
+    assert result['skipped'] == 0
+    assert [stub.count(p['id']) for p in ROSTER] == [2, 2, 2, 2]
+    assert read_player_log('Stub Player 1')['PTS'].tolist() == [20, 21, 22]
+
+    # retries go through the bucket too: past the initial burst, requests arrive no faster than the rate
+    times = sorted(t for t, _ in stub.requests)
+    burst = int(rate)
+    for i in range(burst, len(times)):
+        assert times[i] - times[0] >= (i - burst + 1) / rate - 0.05
+
+    checkpoint = Checkpoint(checkpoint_path)
+    assert [checkpoint.is_done(p['id']) for p in ROSTER] == [True, True, True, False]
+    assert '429' in checkpoint.state['failed']['4']
+
+    # the rerun only fetches the player that failed, and clears the checkpoint once all succeeded
+    stub.down = set()
+    before = len(stub.requests)
+    result = ingest_players(ROSTER, seasons=[SEASON], incremental=False, workers=4, rate=rate, retries=1,
+                            checkpoint_path=checkpoint_path, fetch=stub.fetch, day=DAY)
+    assert result['completed'] == 1
+    assert result['failed'] == 0
+    assert result['skipped'] == 3
+    assert {pid for _, pid in stub.requests[before:]} == {4}
+    assert len(read_player_log('Stub Player 4')) == 3
+    assert not (workdir / 'data' / 'checkpoint.json').exists()
+
+def test_next_run_refreshes_players_done_before(workdir, stub, monkeypatch):
+    monkeypatch.setattr('bulk_ingest.random.uniform', lambda a, b: 0.01)
+    stub.down = {4}
+    checkpoint_path = str(workdir / 'data' / 'checkpoint.json')
+    run = dict(seasons=[SEASON], incremental=False, workers=4, rate=50.0, retries=1,
+               checkpoint_path=checkpoint_path, fetch=stub.fetch)
+
+    result = ingest_players(ROSTER, day=DAY, **run)
+    assert result['failed'] == 1
+    assert Checkpoint(checkpoint_path).is_done(1)
+
+    # the failure kept the checkpoint, but the next day's run still refreshes everyone
+    before = len(stub.requests)
+    result = ingest_players(ROSTER, day=date(2023, 11, 6), **run)
+    assert result['skipped'] == 0
+    assert result['completed'] == 3
+    assert {pid for _, pid in stub.requests[before:]} == {1, 2, 3, 4}
+
+    # so does a run over other seasons on the same day
+    before = len(stub.requests)
+    result = ingest_players(ROSTER, **dict(run, seasons=['2022-23']), day=date(2023, 11, 6))
+    assert result['skipped'] == 0
+    assert {pid for _, pid in stub.requests[before:]} == {1, 2, 3, 4}
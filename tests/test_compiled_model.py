@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from compiled_model import CompiledModel, export_model, load_model
+
+def training_data(n_rows=600, n_features=6, missing=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_rows, n_features)).astype(np.float32),
+                     columns=[f"f{j}" for j in range(n_features)])
+    y = (X['f0'] + 0.5 * X['f1'] - X['f2'] * X['f3'] + rng.normal(scale=0.5, size=n_rows) > 0).astype(int)
+    if missing:
+        X = X.mask(rng.random(X.shape) < missing)
+    return X, y
+
+def scoring_rows(X, missing=0.1, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = X.sample(400, replace=True, random_state=seed).reset_index(drop=True)
+    rows = rows + rng.normal(scale=0.05, size=rows.shape).astype(np.float32)
+    return rows.mask(rng.random(rows.shape) < missing)
+
+def compiled_copy(model, tmp_path) -> CompiledModel:
+    return CompiledModel(export_model(model, str(tmp_path / 'model.npz')))
+
+MODELS = {
+    # shallow trees step every (row, tree) pair, deep ones only those still on a split node
+    'forest_shallow': (lambda: RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0), 0.1, 1e-12),
+    'forest_deep': (lambda: RandomForestClassifier(n_estimators=20, random_state=0), 0.1, 1e-12),
+    'forest_no_missing_seen': (lambda: RandomForestClassifier(n_estimators=20, random_state=0), 0.0, 1e-12),
+    'xgboost': (lambda: XGBClassifier(n_estimators=50, max_depth=4, random_state=0, n_jobs=1), 0.1, 1e-6),
+    'xgboost_no_missing_seen': (lambda: XGBClassifier(n_estimators=50, max_depth=4, random_state=0, n_jobs=1), 0.0, 1e-6),
+}
+
+@pytest.mark.parametrize('name', list(MODELS))
+def test_compiled_matches_library(name, tmp_path):
+    make, train_missing, tolerance = MODELS[name]
+    X, y = training_data(missing=train_missing)
+    model = make().fit(X, y)
+    compiled = compiled_copy(model, tmp_path)
+
+    # scoring rows have missing values whether or not training did
+    rows = scoring_rows(X)
+    assert rows.isna().any().any()
+    expected = model.predict_proba(rows)
+    np.testing.assert_allclose(compiled.predict_proba(rows), expected, rtol=0, atol=tolerance)
+    np.testing.assert_allclose(compiled.predict_proba(rows.to_numpy()), expected, rtol=0, atol=tolerance)
+    assert (compiled.predict(rows) == model.predict(rows)).all()
+    assert list(compiled.feature_names_in_) == list(X.columns)
+
+def test_single_row_and_load_model(tmp_path):
+    X, y = training_data()
+    model = XGBClassifier(n_estimators=30, max_depth=3, random_state=0, n_jobs=1).fit(X, y)
+
+    import joblib
+    model_path = str(tmp_path / 'model.pkl')
+    joblib.dump(model, model_path)
+    export_model(model, str(tmp_path / 'model.npz'))
+
+    # the export is newer than the pickle, so it's what predictions load
+    compiled = load_model(model_path)
+    assert isinstance(compiled, CompiledModel)
+    row = X.iloc[[7]]
+    np.testing.assert_allclose(compiled.predict_proba(row.to_numpy()[0]), model.predict_proba(row), atol=1e-6)
+
+def test_rejects_other_models(tmp_path):
+    from sklearn.dummy import DummyClassifier
+    X, y = training_data()
+    with pytest.raises(TypeError):
+        export_model(DummyClassifier().fit(X, y), str(tmp_path / 'model.npz'))
@@ -0,0 +1,84 @@
+import os
+import threading
+
+import pytest
+from sklearn.dummy import DummyClassifier
+
+import model_registry
+from model_registry import register_model, lookup, list_models, gc, ModelHandle
+
+def fitted(constant=1):
+    return DummyClassifier(strategy='constant', constant=constant).fit([[0], [1]], [0, 1])
+
+def test_register_and_lookup(workdir):
+    first = register_model(fitted(), 7, 'PTS', 20.5, games=10, seasons=['2024-25', '2023-24'], data_hash='a')
+    second = register_model(fitted(), 7, 'PTS', 20.5, games=10, seasons=['2024-25'], data_hash='b')
+    multiline = register_model(fitted(), 7, 'PTS', None, games=10, data_hash='b')
+
+    assert (first['version'], second['version'], multiline['version']) == (1, 2, 1)
+    assert first['seasons'] == ['2023-24', '2024-25']
+    assert os.path.exists(second['model_path'])
+
+    # newest version of the exact slot, older ones by data hash or seasons
+    assert lookup(7, 'PTS', 20.5)['version'] == 2
+    assert lookup(7, 'PTS', 20.5, data_hash='a')['version'] == 1
+    assert lookup(7, 'PTS', 20.5, seasons=['2023-24', '2024-25'])['version'] == 1
+    assert lookup(7, 'PTS', 20.5, data_hash='c') is None
+
+    # line, window and family are all part of the slot
+    assert lookup(7, 'PTS', None)['model_path'] == multiline['model_path']
+    assert lookup(7, 'PTS', 21.5) is None
+    assert lookup(7, 'PTS', 20.5, games=5) is None
+    assert lookup(7, 'REB', 20.5) is None
+
+    assert [row['versions'] for row in list_models(7)] == [2, 1]
+
+def test_handle_swaps_to_new_version(workdir):
+    register_model(fitted(0), 'league', 'HOME_WIN', games=None, family='winner')
+    handle = ModelHandle('league', 'HOME_WIN', games=None, family='winner', check_interval=0)
+    assert handle.get().predict([[0]])[0] == 0
+
+    register_model(fitted(1), 'league', 'HOME_WIN', games=None, family='winner')
+    assert handle.get().predict([[0]])[0] == 1
+    assert handle.version == 2
+
+def test_gc_keeps_newest_versions(workdir):
+    entries = [register_model(fitted(), 7, 'PTS', games=10) for _ in range(3)]
+    orphan = os.path.join(model_registry.REGISTRY_DIR, 'orphan.pkl')
+    with open(orphan, 'wb'):
+        pass
+
+    assert gc(keep=2, dry_run=True)
+    assert all(os.path.exists(entry['model_path']) for entry in entries)
+
+    removed = gc(keep=2)
+    assert entries[0]['model_path'] in removed and orphan in removed
+    assert not os.path.exists(entries[0]['model_path'])
+    assert lookup(7, 'PTS')['version'] == 3
+    assert sorted(model_registry.load_index()['slots']['7|PTS|multiline|games=10']['versions']) == ['2', '3']
+
+    with pytest.raises(ValueError):
+        gc(keep=0)
+    assert lookup(7, 'PTS')['version'] == 3
+
+def test_gc_spares_versions_registered_while_it_runs(workdir, monkeypatch):
+    register_model(fitted(), 7, 'PTS', games=10)
+
+    # another registration starts right as gc walks the registry for orphans
+    registering = threading.Thread(target=register_model, args=(fitted(), 8, 'REB'), kwargs={'games': 10})
+    walk = os.walk
+
+    def walk_during_registration(top, *args, **kwargs):
+        if not registering.is_alive() and registering.ident is None:
+            registering.start()
+            # give it the chance to commit, which it only gets if gc let go of the lock
+            registering.join(timeout=1.0)
+        return walk(top, *args, **kwargs)
+
+    monkeypatch.setattr(model_registry.os, 'walk', walk_during_registration)
+    gc(keep=1)
+    registering.join()
+
+    entry = lookup(8, 'REB')
+    assert entry is not None
+    assert os.path.exists(entry['model_path'])
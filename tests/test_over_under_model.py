@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import over_under_model
+from model_registry import slot_key
+from over_under_model import PARAM_GRID, _fit, load_params, time_series_folds
+
+SLOT = slot_key(7, 'PTS', None, 10)
+
+def fit(n_rows, search='halving'):
+    # the first rows are the same every run, like a log that only grows
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(500, 3)), columns=['A', 'B', 'C']).head(n_rows)
+    y = (X['A'] + rng.normal(0, 0.5, 500)[:n_rows] > 0).astype(int)
+    order = np.arange(n_rows)
+    return _fit(X, y, time_series_folds(order), SLOT, search=search, groups=order, threads=1)
+
+def test_halving_search_starts_from_the_last_run(workdir, monkeypatch):
+    fit(200)
+    first = load_params(SLOT)
+    assert first['search'] == 'halving' and first['rows'] == 200
+
+    # a few new rows refit the previous winner without any search
+    def no_search(*args, **kwargs):
+        pytest.fail("searched although the training rows barely changed")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(over_under_model, '_halving_search', no_search)
+        patched.setattr(over_under_model, '_grid_search', no_search)
+        model = fit(210)
+
+    reused = load_params(SLOT)
+    assert (reused['search'], reused['rows'], reused['params']) == ('reuse', 210, first['params'])
+    assert {name: model.get_params()[name] for name in PARAM_GRID} == first['params']
+
+    # a bigger change only searches around the previous winner
+    seeds = []
+    halving_search = over_under_model._halving_search
+
+    def spy(*args, previous=None, **kwargs):
+        seeds.append(previous)
+        return halving_search(*args, previous=previous, **kwargs)
+
+    monkeypatch.setattr(over_under_model, '_halving_search', spy)
+    fit(280)
+    assert seeds == [first['params']]
+    assert load_params(SLOT)['search'] == 'local'
+
+    # and a much bigger data set searches the whole grid again
+    fit(500)
+    assert seeds[-1] is None
+    assert load_params(SLOT)['search'] == 'halving'
+
+def test_grid_search_seeds_the_first_halving_run(workdir):
+    model = fit(200, search='grid')
+    recorded = load_params(SLOT)
+    assert recorded['search'] == 'grid'
+    assert recorded['params'] == {name: model.get_params()[name] for name in PARAM_GRID}
+
+    fit(205)
+    assert load_params(SLOT)['search'] == 'reuse'
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+import game_log_store
+from game_log_store import write_player_log, append_player_log, load_rolling_state, rolling_state_path
+from player_features import RollingState, latest_features
+
+STAT_EXPRS = ['PTS', 'REB+AST', 'PTS+REB+AST', 'PF', 'FG3M+STL+BLK']
+
+def assert_same_features(state_features: dict, expected: dict):
+    assert list(state_features) == list(expected)
+    np.testing.assert_allclose(list(state_features.values()), list(expected.values()), rtol=1e-9, equal_nan=True)
+
+@pytest.mark.parametrize('games', [5, 10])
+def test_state_matches_latest_features(games, game_log):
+    log = game_log_store.normalize_log(game_log())
+
+    # built from the whole log, and moved forward one game at a time from an early one
+    built = RollingState.from_log(log, games)
+    stepped = RollingState.from_log(log.head(12), games)
+    for _, game in log.iloc[12:].iterrows():
+        stepped.update(game)
+
+    assert stepped.count == built.count == len(log)
+    for stat_expr in STAT_EXPRS:
+        expected = latest_features(log, stat_expr, games)
+        assert_same_features(built.features(stat_expr), expected)
+        assert_same_features(stepped.features(stat_expr), expected)
+
+def test_state_needs_a_full_window(game_log):
+    state = RollingState.from_log(game_log_store.normalize_log(game_log(4)), 5)
+    with pytest.raises(ValueError, match='Not enough recent games'):
+        state.features('PTS')
+    with pytest.raises(ValueError, match='Unknown stat'):
+        state.features('PTS+DUNKS')
+
+def test_store_moves_state_forward_without_reading_the_log(workdir, game_log, monkeypatch):
+    log = game_log()
+    write_player_log(7, 'Test Player', log.head(30))
+    assert load_rolling_state('Test Player', 10).count == 30
+    state_path = rolling_state_path(7, 10)
+    assert os.path.exists(state_path)
+
+    # a refresh refetches the last stored game and adds the newer ones
+    append_player_log(7, 'Test Player', log.iloc[29:])
+
+    def no_log_reads(*args, **kwargs):
+        raise AssertionError("the state should not be rebuilt from the log")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(game_log_store, 'read_player_log', no_log_reads)
+        state = load_rolling_state('Test Player', 10)
+    assert state.count == 40
+    full = game_log_store.read_player_log('Test Player')
+    for stat_expr in STAT_EXPRS:
+        assert_same_features(state.features(stat_expr), latest_features(full, stat_expr, 10))
+
+def test_corrected_game_rebuilds_state(workdir, game_log):
+    log = game_log()
+    write_player_log(7, 'Test Player', log.head(30))
+    load_rolling_state('Test Player', 10)
+
+    # a stat correction to a stored game can't be applied incrementally
+    corrected = log.iloc[25:].copy()
+    corrected.loc[corrected.index[0], 'PTS'] += 10
+    append_player_log(7, 'Test Player', corrected)
+    assert not os.path.exists(rolling_state_path(7, 10))
+
+    state = load_rolling_state('Test Player', 10)
+    full = game_log_store.read_player_log('Test Player')
+    assert full['PTS'].iloc[25] == log['PTS'].iloc[25] + 10
+    assert_same_features(state.features('PTS'), latest_features(full, 'PTS', 10))
@@ -0,0 +1,42 @@
+import joblib
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from game_log_store import write_player_log
+from model_registry import register_model
+from over_under_model import LINE_FEATURE, multiline_model_path
+from player_features import feature_columns
+from prediction_server import PredictionService
+
+@pytest.fixture
+def service(workdir, game_log):
+    write_player_log(7, 'Test Player', game_log())
+
+    # a multi-line PTS model for the stored player, fit on noise, only its inputs matter here
+    columns = feature_columns('PTS') + [LINE_FEATURE]
+    X = pd.DataFrame([[float(i + j) for j in range(len(columns))] for i in range(20)], columns=columns)
+    model = LogisticRegression().fit(X, [0, 1] * 10)
+    register_model(model, 7, 'PTS', None, games=10)
+    # the unversioned file left by the last training, whatever its window was
+    joblib.dump(model, multiline_model_path('Test Player', 'PTS'))
+    return PredictionService(max_wait_ms=1.0)
+
+def test_failed_queries_keep_their_slot(service):
+    results = service.predict_over_under([
+        {'player_name': 'Test Player', 'stat_expr': 'PTS', 'line': 20.5},
+        {'player_name': 'Nobody Here', 'stat_expr': 'PTS', 'line': 20.5},
+        {'player_name': 'Test Player', 'stat_expr': 'REB', 'line': 5.5},
+        {'player_name': 'Test Player', 'stat_expr': 'PTS'},
+        {'player_name': 'Test Player', 'stat_expr': 'PTS', 'line': 25.5, 'games': 30},
+        {'player_name': 'Test Player', 'stat_expr': 'PTS', 'line': 18.5},
+    ])
+
+    assert [r['player_name'] for r in results] == ['Test Player', 'Nobody Here'] + ['Test Player'] * 4
+    priced = [results[0], results[5]]
+    assert all(0 <= r['over_prob'] <= 1 and 'error' not in r for r in priced)
+    assert 'Nobody_Here' in results[1]['error']
+    assert 'REB' in results[2]['error']
+    assert results[3]['error'] == "missing 'line'"
+    # no model for a 30-game window, the unversioned file isn't a stand-in for it
+    assert 'games=30' in results[4]['error']
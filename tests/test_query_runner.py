@@ -0,0 +1,40 @@
+import pytest
+
+import query_runner
+from game_log_store import write_player_log, append_player_log, player_data_hash
+from query_runner import ResultCache, run_query
+
+@pytest.fixture
+def stages(monkeypatch):
+    # stands in for the api fetch, training and prediction, recording each call
+    calls = []
+    monkeypatch.setattr(query_runner, 'fetch_player_data', lambda name, **kwargs: calls.append(('fetch', name)))
+    monkeypatch.setattr(query_runner, 'generate_player_model', lambda name, **kwargs: calls.append(('train', name)))
+    monkeypatch.setattr(query_runner, 'predict_over_under', lambda name, **kwargs: calls.append(('predict', name)) or 0.7)
+    return calls
+
+def test_partial_name_hits_the_cache(workdir, game_log, stages):
+    log = game_log()
+    write_player_log(2544, 'LeBron James', log.head(30))
+    cache = ResultCache(str(workdir / 'data' / 'result_cache.json'))
+    cache.put(2544, 'PTS', 25.5, 10, player_data_hash('LeBron James'), 0.61)
+
+    for name in ('lebron', 'LeBron James', 'LEBRON JAMES'):
+        result = run_query(name, 'PTS', 25.5, cache=cache)
+        assert result == {'full_name': 'LeBron James', 'prob': 0.61, 'cached': True}
+    assert stages == []
+
+    # new games miss the cache, the query runs and its result answers the next one
+    append_player_log(2544, 'LeBron James', log.iloc[30:])
+    assert run_query('lebron', 'PTS', 25.5, cache=cache)['cached'] is False
+    assert [stage for stage, _ in stages] == ['fetch', 'train', 'predict']
+    assert all(name == 'LeBron James' for _, name in stages)
+
+    assert run_query('lebron', 'PTS', 25.5, cache=ResultCache(cache.path)) == {
+        'full_name': 'LeBron James', 'prob': 0.7, 'cached': True}
+    assert len(stages) == 3
+
+def test_unknown_player(workdir, stages):
+    with pytest.raises(ValueError, match='no player found'):
+        run_query('Nobody Here At All', 'PTS', 25.5, cache=ResultCache(str(workdir / 'data' / 'cache.json')))
+    assert stages == []
@@ -0,0 +1,69 @@
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from simulate_bracket import bracket_win_matrix, exact_bracket, monte_carlo_bracket
+from team_features import STATS, FEATURES
+
+@pytest.fixture
+def league():
+    # per-game averages for a few teams, and a winner model fit on their stat differences
+    rng = np.random.default_rng(0)
+    team_stats = pd.DataFrame(rng.normal(100, 10, (10, len(STATS))), columns=STATS)
+    team_stats.insert(0, 'TEAM_NAME', [f"Team {i}" for i in range(10)])
+
+    diffs = pd.DataFrame(rng.normal(0, 10, (400, len(FEATURES))), columns=FEATURES)
+    wins = (diffs.sum(axis=1) + rng.normal(0, 10, 400) > 0).astype(int)
+    return team_stats, LogisticRegression().fit(diffs, wins)
+
+def matches(n_teams):
+    return [(f"Team {i}", f"Team {i + 1}") for i in range(0, n_teams, 2)]
+
+def enumerated_bracket(win_matrix):
+    # every outcome of a four-team bracket, weighted by its probability
+    reach = np.zeros((3, 4))
+    reach[0] = 1
+    for upper_wins, lower_wins, final in product([True, False], repeat=3):
+        first = 0 if upper_wins else 1
+        second = 2 if lower_wins else 3
+        champion = first if final else second
+        p = (win_matrix[0, 1] if upper_wins else win_matrix[1, 0]) \
+            * (win_matrix[2, 3] if lower_wins else win_matrix[3, 2]) \
+            * (win_matrix[first, second] if final else win_matrix[second, first])
+        reach[1, [first, second]] += p
+        reach[2, champion] += p
+    return reach.T
+
+def test_exact_matches_every_enumerated_outcome(league):
+    team_stats, model = league
+    _, win_matrix = bracket_win_matrix(matches(4), team_stats, model)
+    exact = exact_bracket(matches(4), team_stats, model)
+    np.testing.assert_allclose(exact.to_numpy(), enumerated_bracket(win_matrix), atol=1e-12)
+
+def test_monte_carlo_converges_to_exact(league):
+    team_stats, model = league
+    exact = exact_bracket(matches(8), team_stats, model)
+    sampled = monte_carlo_bracket(matches(8), team_stats, model, n_draws=200_000, seed=1, batch_size=50_000)
+
+    assert list(sampled.columns) == list(exact.columns) == ['Quarterfinals', 'Semifinals', 'Final', 'Champion']
+    # every round has half the teams of the one before
+    np.testing.assert_allclose(exact.sum().to_numpy(), [8, 4, 2, 1])
+    # within five standard errors of the exact probabilities
+    tolerance = 5 * np.sqrt(exact * (1 - exact) / 200_000) + 1e-9
+    assert (np.abs(sampled - exact) <= tolerance).all().all()
+
+def test_forced_results_agree(league):
+    team_stats, model = league
+    forced = [("Team 1", "Team 0"), ("Team 3", "Team 1")]
+    exact = exact_bracket(matches(8), team_stats, model, forced=forced)
+    sampled = monte_carlo_bracket(matches(8), team_stats, model, n_draws=50_000, seed=2, forced=forced)
+
+    _, win_matrix = bracket_win_matrix(matches(8), team_stats, model, forced=forced)
+    assert exact.loc["Team 0", "Semifinals"] == sampled.loc["Team 0", "Semifinals"] == 0
+    assert exact.loc["Team 1", "Semifinals"] == sampled.loc["Team 1", "Semifinals"] == 1
+    # team 1 only reaches the final past team 2, it always loses to team 3
+    assert exact.loc["Team 1", "Final"] == pytest.approx(win_matrix[2, 3] * win_matrix[1, 2])
+    np.testing.assert_allclose(sampled.to_numpy(), exact.to_numpy(), atol=0.01)
@@ -0,0 +1,68 @@
+import json
+
+import joblib
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from game_log_store import write_player_log
+from model_registry import register_model
+from over_under_model import LINE_FEATURE, multiline_model_path
+from player_features import feature_columns
+from slate_runner import run_slate
+
+PLAYERS = {7: 'Test Player', 8: 'Other Player'}
+
+@pytest.fixture
+def slate(workdir, game_log, tmp_path):
+    # a multi-line PTS model for each stored player, fit on noise, only its inputs matter here
+    columns = feature_columns('PTS') + [LINE_FEATURE]
+    X = pd.DataFrame([[float(i + j) for j in range(len(columns))] for i in range(20)], columns=columns)
+    model = LogisticRegression().fit(X, [0, 1] * 10)
+    for player_id, name in PLAYERS.items():
+        log = game_log()
+        log['Player_ID'] = player_id
+        write_player_log(player_id, name, log)
+        register_model(model, player_id, 'PTS', None, games=10)
+        joblib.dump(model, multiline_model_path(name, 'PTS'))
+
+    rows = [{'player_name': name, 'stat_expr': 'PTS', 'line': line}
+            for line in (14.5, 18.5, 22.5, 26.5) for name in PLAYERS.values()]
+    # no model with a 5-game window, the unversioned file doesn't stand in for one
+    rows.append({'player_name': 'Test Player', 'stat_expr': 'PTS', 'line': 20.5, 'games': 5})
+    path = tmp_path / 'slate.jsonl'
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return str(path)
+
+def read_results(path) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_resume_after_a_crash(slate, tmp_path):
+    full = tmp_path / 'full.jsonl'
+    summary = run_slate(slate, str(full), workers=1)
+    assert (summary['rows'], summary['priced'], summary['errors']) == (9, 8, 1)
+    expected = {r['key']: r['prob_over'] for r in read_results(full) if 'prob_over' in r}
+    assert [r for r in read_results(full) if 'error' in r][0]['error'] == "no 5-game model for PTS, run with --train"
+
+    # the crashed run got three rows out, one of them an error, and died halfway through a fourth
+    lines = full.read_text().splitlines(keepends=True)
+    priced = [line for line in lines if 'prob_over' in line]
+    failed = json.loads(priced[2])
+    failed = {key: failed[key] for key in ('row', 'key', 'player_name', 'stat_expr', 'line', 'games')}
+    crashed = tmp_path / 'crashed.jsonl'
+    crashed.write_text(priced[0] + priced[1] + json.dumps({**failed, 'error': 'worker died'}) + '\n'
+                       + priced[3][:len(priced[3]) // 2])
+
+    summary = run_slate(slate, str(crashed), workers=1)
+    assert summary['skipped'] == 2
+    assert summary['priced'] == 6
+
+    results = read_results(crashed)
+    prices = [(r['key'], r['prob_over']) for r in results if 'prob_over' in r]
+    # every row priced exactly once, the same as an uninterrupted run
+    assert len(prices) == len(dict(prices))
+    assert dict(prices) == expected
+
+    # a third run has nothing left to price
+    assert run_slate(slate, str(crashed), workers=1)['priced'] == 0
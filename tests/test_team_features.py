@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import team_features
+from team_features import STATS, TeamFormState, team_form, incremental_team_form, form_features, form_cache_path
+
+def game_data(n_days=60, n_teams=10, seed=0) -> pd.DataFrame:
+    # every team plays at most once a day, across the turn of two seasons
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2024-03-01', periods=n_days, freq='4D')
+    rows = []
+    for day in days:
+        teams = rng.permutation(n_teams)[:rng.integers(2, n_teams // 2 + 1) * 2]
+        season = 24 if day >= pd.Timestamp('2024-10-01') else 23
+        for home, away in teams.reshape(-1, 2):
+            row = {'GAME_ID': f"002{season}{len(rows):05d}", 'GAME_DATE': day,
+                   'TEAM_ID_HOME': 1610612700 + home, 'TEAM_ID_AWAY': 1610612700 + away}
+            for stat in STATS:
+                row[f'{stat}_HOME'] = float(rng.integers(5, 120))
+                row[f'{stat}_AWAY'] = float(rng.integers(5, 120))
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(team_features, 'TEAM_CACHE_DIR', str(tmp_path / 'team_cache'))
+    return tmp_path / 'team_cache'
+
+def assert_same_form(form: pd.DataFrame, expected: pd.DataFrame):
+    assert list(form.columns) == list(expected.columns)
+    assert (form.index == expected.index).all()
+    np.testing.assert_allclose(form.to_numpy(float), expected.to_numpy(float), rtol=1e-12, equal_nan=True)
+
+@pytest.mark.parametrize('window', [None, 5])
+def test_new_games_extend_stored_form(cache_dir, window, monkeypatch):
+    games = game_data()
+    earlier = games[games['GAME_DATE'] < games['GAME_DATE'].iloc[len(games) * 2 // 3]]
+    assert_same_form(incremental_team_form(earlier, window, min_games=3), team_form(earlier, window, min_games=3))
+    assert os.path.exists(form_cache_path(window))
+
+    # the games fetched since only step the stored state, no full pass
+    with monkeypatch.context() as patched:
+        patched.setattr(team_features, 'team_form', lambda *args, **kwargs: pytest.fail("recomputed every game"))
+        form = incremental_team_form(games, window, min_games=3)
+    assert_same_form(form, team_form(games, window, min_games=3))
+
+def test_changed_games_recompute(cache_dir):
+    games = game_data()
+    incremental_team_form(games)
+
+    corrected = games.copy()
+    corrected.loc[10, 'PTS_HOME'] += 30
+    assert_same_form(incremental_team_form(corrected), team_form(corrected))
+
+    # nor can a stored game that's gone from the log
+    assert_same_form(incremental_team_form(games.drop(index=10)), team_form(games.drop(index=10)))
+
+def test_state_form_is_next_game_form(cache_dir):
+    games = game_data()
+    state = TeamFormState.from_games(games, window=5)
+    last = games.iloc[-1]
+
+    # stepping the last game into a state built without it lands on the same form
+    before = TeamFormState.from_games(games.iloc[:-1], window=5)
+    before.update(last)
+    for team_id in (last['TEAM_ID_HOME'], last['TEAM_ID_AWAY']):
+        np.testing.assert_allclose(before.form(team_id), state.form(team_id))
+
+    X, known = form_features(games, window=5, min_games=1)
+    expected = team_form(games, window=5)
+    assert (known == X.notna().all(axis=1).to_numpy()).all()
+    assert X.iloc[-1]['PTS_diff'] == pytest.approx(expected.iloc[-1]['PTS_HOME_FORM'] - expected.iloc[-1]['PTS_AWAY_FORM'])